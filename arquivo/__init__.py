@@ -1,9 +1,14 @@
 import itertools
-import operator
+import json
 from typing import Iterable
 
+import httpx
+
 from .client import *
+from .hedging import *
 from .models import *
+from .negative_cache import *
+from .sampling import *
 
 
 def pipe(data, *args):
@@ -22,18 +27,63 @@ def remove_redirects_status_codes(
     return filter(lambda e: 200 <= e.statusCode < 300, data)
 
 
-def remove_entries_close_in_time(
-    data: Iterable[VersionEntry],
+def sort_by_time(data: Iterable[VersionEntry]) -> list[VersionEntry]:
+    return sorted(data, key=lambda e: e.tstamp)
+
+
+def filter_versions(
+    data: Iterable[VersionEntry], sampling: SamplingPolicy = HOURLY
 ) -> Iterable[VersionEntry]:
-    return map(
-        next,
-        map(operator.itemgetter(1), itertools.groupby(data, lambda e: e.tstamp[:-4])),
+    return pipe(
+        data,
+        remove_error_status_codes,
+        remove_redirects_status_codes,
+        sort_by_time,
+        sampling.sample,
+    )
+
+
+CDX_FIELDS = (
+    "url",
+    "timestamp",
+    "status",
+    "digest",
+    "mime",
+    "length",
+    "offset",
+    "filename",
+)
+
+# Keeps 2xx captures, as the textsearch listing filtered by filter_versions,
+# the sampling policy may also let the server collapse them
+CDX_FILTERS = ("status:2..",)
+
+
+def cdx_version_entry(capture: dict) -> VersionEntry:
+    return VersionEntry.from_capture(
+        url=capture["url"],
+        tstamp=capture["timestamp"],
+        status_code=int(capture.get("status") or 0),
+        digest=capture.get("digest", ""),
+        mime_type=capture.get("mime", ""),
+        length=int(capture.get("length") or 0),
+        offset=int(capture.get("offset") or 0),
+        file_name=capture.get("filename", ""),
     )
 
 
 class Arquivo:
-    def __init__(self, arquivo_client: ArquivoClient):
+    def __init__(
+        self,
+        arquivo_client: ArquivoClient,
+        versions_backend: VersionsBackend = VersionsBackend.TEXT_SEARCH,
+        sampling: SamplingPolicy = HOURLY,
+        negative_cache: NegativeCache | None = None,
+    ):
         self.__client = arquivo_client
+        self.versions_backend = versions_backend
+        self.sampling = sampling
+        self.negative_cache = negative_cache
 
     def to_absolute_url(self, path: str) -> str:
         if path.startswith("/"):
@@ -44,20 +94,38 @@ class Arquivo:
     async def fetched_archived_url(
         self, version: VersionEntry
     ) -> Optional[ArchivedURL]:
+        replay = await self.fetch_replay(version)
+        return None if isinstance(replay, ReplayFailure) else replay
+
+    async def fetch_replay(self, version: VersionEntry) -> ArchivedURL | ReplayFailure:
+        """The replay of a capture, or why it could not be had"""
         try:
             resp = await self.__client.fetch_archived_url(
                 version.originalURL, version.tstamp
             )
-            archived_url = ArchivedURL(
-                **{
-                    "headers": list(resp.headers.items()),
-                    "content": resp.text,
-                }
-            )
-            return archived_url
+        except httpx.HTTPStatusError as e:
+            logger.warning(f"Fetch archived version entry: {e}")
+            return ReplayFailure(FailureKind.HTTP_STATUS, e.response.status_code)
+        except httpx.TimeoutException:
+            logger.warning(f"Fetch archived version entry timed out: {version.tstamp}")
+            return ReplayFailure(FailureKind.TIMEOUT)
+        except httpx.TransportError:
+            logger.exception("Fetch archived version entry")
+            return ReplayFailure(FailureKind.NETWORK)
         except:
             logger.exception("Fetch archived version entry")
-            return None
+            return ReplayFailure(FailureKind.ERROR)
+
+        # Responses read from the HTTP cache carry text/plain
+        content_type = resp.headers.get("content-type", "text/html")
+        if "html" not in content_type and "text/plain" not in content_type:
+            return ReplayFailure(FailureKind.NOT_HTML, resp.status_code)
+        return ArchivedURL(
+            **{
+                "headers": list(resp.headers.items()),
+                "content": resp.text,
+            }
+        )
 
     async def fetched_archived_path(self, path: str) -> Optional[ArchivedURL]:
         try:
@@ -76,6 +144,9 @@ class Arquivo:
     async def fetch_url_versions(
         self, url: str, since: str, until: str, retries: int = 3
     ) -> Iterable[VersionEntry]:
+        if self.versions_backend == VersionsBackend.CDX:
+            return await self.fetch_cdx_versions(url, since, until, retries)
+
         all_version_responses = []
         try:
             resp = await self.__client.fetch_url_versions(url, since, until)
@@ -101,9 +172,30 @@ class Arquivo:
         all_data = itertools.chain(
             *[resp.response_items for resp in all_version_responses]
         )
-        return pipe(
-            all_data,
-            remove_error_status_codes,
-            remove_redirects_status_codes,
-            remove_entries_close_in_time,
-        )
+        return filter_versions(all_data, self.sampling)
+
+    async def fetch_cdx_versions(
+        self, url: str, since: str, until: str, retries: int = 3
+    ) -> Iterable[VersionEntry]:
+        try:
+            resp = await self.__client.fetch_cdx(
+                url,
+                since,
+                until,
+                fields=CDX_FIELDS,
+                filters=CDX_FILTERS,
+                collapse=self.sampling.cdx_collapse(),
+            )
+        except Exception:
+            if retries > 0:
+                logger.warning(f"Retry ({retries}): CDX {url} {since}-{until}")
+                return await self.fetch_cdx_versions(url, since, until, retries - 1)
+            logger.exception(f"Fetch CDX versions {url} {since}-{until}")
+            return []
+
+        entries = [
+            cdx_version_entry(json.loads(line))
+            for line in resp.text.splitlines()
+            if line.strip()
+        ]
+        return filter_versions(entries, self.sampling)
@@ -1,5 +1,7 @@
 import asyncio
 import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from typing import Self, Optional
 
 import httpx
@@ -8,6 +10,8 @@ import logging
 import chardet
 from sqlite_utils import Database
 
+from .hedging import Hedging
+
 logger = logging.getLogger(__name__)
 
 
@@ -23,20 +27,85 @@ class ArquivoApiPath(StrEnum):
     TEXT_SEARCH = ("/textsearch",)
     BASE_URL = ("https://arquivo.pt",)
     NO_FRAME_REPLAY = "/noFrame/replay"
+    CDX = "/wayback/cdx"
+
+
+class VersionsBackend(StrEnum):
+    TEXT_SEARCH = "textsearch"
+    CDX = "cdx"
 
 
 def autodetect(content):
     return chardet.detect(content).get("encoding")
 
 
+def archived_url_path(url: str, ts: str) -> str:
+    return f"{ArquivoApiPath.NO_FRAME_REPLAY}/{ts}/{url}"
+
+
+def url_versions_params(
+    url: str, since: str, until: str, page_size: int = 2000
+) -> dict:
+    return {
+        "versionHistory": url,
+        "from": since,
+        "to": until,
+        "maxItems": page_size,
+    }
+
+
+def cdx_params(
+    url: str,
+    since: str,
+    until: str,
+    fields: tuple[str, ...] = (),
+    filters: tuple[str, ...] = (),
+    collapse: str | None = None,
+) -> dict:
+    params = {"url": url, "from": since, "to": until, "output": "json"}
+    if fields:
+        params["fl"] = ",".join(fields)
+    if filters:
+        params["filter"] = list(filters)
+    if collapse:
+        params["collapse"] = collapse
+    return params
+
+
+@dataclass
+class Flight:
+    """A request in progress and how many callers wait for its response, it
+    is cancelled only when all of them are"""
+
+    task: asyncio.Task
+    waiters: int = 0
+
+
 class ArquivoClient:
+    """Requests to arquivo.pt, at most 20 at once.
+
+    Identical requests share a single flight: while one is in progress the
+    others wait for its response, and the last `recent_size` responses are
+    reused, by requested and by final url, for `recent_seconds` without going
+    to the network. Version listings grow, a long running process must not
+    reuse them for long.
+
+    With `hedging`, slow replay requests get a duplicate, see `Hedging`. A
+    duplicate waits for a free slot as any other request."""
+
     DEFAULT_WAIT = 20
 
     client: httpx.AsyncClient
     wait_until: Optional[int]
     http_cache_db: Database
 
-    def __init__(self, _http_cache_db: Database = None):
+    def __init__(
+        self,
+        _http_cache_db: Database = None,
+        recent_size: int = 64,
+        recent_seconds: float = 600,
+        hedging: Hedging | None = None,
+    ):
         self.client = httpx.AsyncClient(
             timeout=httpx.Timeout(120),
             base_url=ArquivoApiPath.BASE_URL,
@@ -47,6 +116,12 @@ class ArquivoClient:
         self.__semaphore = asyncio.Semaphore(20)
         self.wait_until_lock = asyncio.Lock()
         self.http_cache_db = _http_cache_db
+        self.in_flight: dict[str, Flight] = {}
+        self.recent: OrderedDict[str, tuple[float, httpx.Response]] = OrderedDict()
+        self.recent_size = recent_size
+        self.recent_seconds = recent_seconds
+        self.shared = 0
+        self.hedging = hedging
 
     async def __aenter__(self) -> Self:
         return self
@@ -55,18 +130,35 @@ class ArquivoClient:
         await self.close()
 
     async def close(self):
+        if self.shared:
+            logger.info(f"{self.shared} requests shared another's response")
+        if self.hedging and self.hedging.requests:
+            logger.info(f"Hedging: {self.hedging}")
         await self.client.aclose()
 
-    def cache_response(self, resp: httpx.Response):
+    def cache_response(self, resp: httpx.Response, url: str | None = None):
         if self.http_cache_db:
             self.http_cache_db["requests"].insert(
-                {"url": str(resp.url), "content": resp.text}, pk="url", ignore=True
+                {"url": url or str(resp.url), "content": resp.text},
+                pk="url",
+                ignore=True,
             )
 
-    async def handle_resp(self, resp: httpx.Response):
+    def cached_response(self, url: str) -> httpx.Response | None:
+        if self.http_cache_db and self.http_cache_db["requests"].exists():
+            row = self.http_cache_db.execute(
+                "SELECT content FROM requests WHERE url = ?", [url]
+            ).fetchone()
+            if row:
+                return httpx.Response(
+                    httpx.codes.OK, text=row[0], request=httpx.Request("GET", url)
+                )
+        return None
+
+    async def handle_resp(self, resp: httpx.Response, url: str | None = None):
         try:
             resp.raise_for_status()
-            self.cache_response(resp)
+            self.cache_response(resp, url)
             return resp
         except httpx.HTTPStatusError as status_error:
             if status_error.response.status_code == httpx.codes.TOO_MANY_REQUESTS:
@@ -76,17 +168,135 @@ class ArquivoClient:
                     logger.info(f"Too Many Requests: wait until {self.wait_until}")
             raise status_error
 
+    def remember(self, url: str, resp: httpx.Response):
+        for key in dict.fromkeys((url, str(resp.url))):
+            self.recent[key] = (time.monotonic(), resp)
+            self.recent.move_to_end(key)
+        while len(self.recent) > self.recent_size:
+            self.recent.popitem(last=False)
+
+    async def send(self, request: httpx.Request) -> httpx.Response:
+        async with self.__semaphore:
+            return await self.client.send(request)
+
+    async def send_timed(
+        self, request: httpx.Request, sending: asyncio.Event
+    ) -> httpx.Response:
+        async with self.__semaphore:
+            sending.set()
+            started = time.monotonic()
+            try:
+                resp = await self.client.send(request)
+            finally:
+                # Cancelled requests took at least this long
+                self.hedging.observe(time.monotonic() - started)
+            if resp.status_code == httpx.codes.TOO_MANY_REQUESTS:
+                self.hedging.pause(self.DEFAULT_WAIT)
+            return resp
+
+    async def send_hedged(self, request: httpx.Request) -> httpx.Response:
+        """Sends a request and, when it is slower than most, a duplicate,
+        returning the first response and cancelling the other request"""
+        self.hedging.requests += 1
+        delay = self.hedging.delay()
+        sending = asyncio.Event()
+        first = asyncio.create_task(self.send_timed(request, sending))
+        tasks = {first}
+        hedge = None
+        try:
+            if delay is not None:
+                # The wait for a free slot does not count
+                await sending.wait()
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and self.hedging.allow():
+                    self.hedging.hedged += 1
+                    duplicate = self.client.build_request("GET", request.url)
+                    hedge = asyncio.create_task(
+                        self.send_timed(duplicate, asyncio.Event())
+                    )
+                    tasks.add(hedge)
+            while tasks:
+                done, tasks = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_COMPLETED
+                )
+                # Retrieves every exception, a failed request loses
+                answered = [task for task in done if task.exception() is None]
+                if answered:
+                    if hedge in answered and first not in answered:
+                        self.hedging.won += 1
+                    return answered[0].result()
+            raise first.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def get(
+        self,
+        url: str,
+        params: dict | None = None,
+        cache_url: str | None = None,
+        hedge: bool = False,
+    ) -> httpx.Response:
+        """GETs an url, joining the flight of an identical request in progress
+        or reusing a recent response. Idempotent requests may `hedge`"""
+        request = self.client.build_request("GET", url, params=params)
+        key = str(request.url)
+        if (recent := self.recent.get(key)) is not None:
+            fetched_at, resp = recent
+            if time.monotonic() - fetched_at < self.recent_seconds:
+                self.recent.move_to_end(key)
+                self.shared += 1
+                return resp
+            del self.recent[key]
+        if (flight := self.in_flight.get(key)) is not None:
+            self.shared += 1
+        else:
+            flight = Flight(
+                asyncio.create_task(self.fly(key, request, cache_url, hedge))
+            )
+            self.in_flight[key] = flight
+            flight.task.add_done_callback(lambda _: self.land(key, flight))
+
+        flight.waiters += 1
+        try:
+            # A waiter cancelled must not cancel the request of the others
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters:
+                # No one is left waiting for it
+                flight.task.cancel()
+
+    async def fly(
+        self, key: str, request: httpx.Request, cache_url: str | None, hedge: bool
+    ) -> httpx.Response:
+        if hedge and self.hedging:
+            resp = await self.send_hedged(request)
+        else:
+            resp = await self.send(request)
+        resp = await self.handle_resp(resp, cache_url)
+        self.remember(key, resp)
+        return resp
+
+    def land(self, key: str, flight: Flight):
+        if self.in_flight.get(key) is flight:
+            del self.in_flight[key]
+        # Marks a failure retrieved, its waiters may all have been cancelled
+        if not flight.task.cancelled():
+            flight.task.exception()
+
     """Fetches any url passed, useful for pagination with already built links,
     from previous responses"""
 
     async def fetch_url(self, url: str) -> httpx.Response:
-        async with self.__semaphore:
-            return await self.handle_resp(await self.client.get(url))
+        return await self.get(url)
 
     async def fetch_archived_url(self, url: str, ts: str) -> httpx.Response:
-        request_path = f"{ArquivoApiPath.NO_FRAME_REPLAY}/{ts}/{url}"
-        async with self.__semaphore:
-            return await self.handle_resp(await self.client.get(request_path))
+        """Captures never change, once fetched they are read from the cache"""
+        request_url = str(self.client.base_url.join(archived_url_path(url, ts)))
+        if cached := self.cached_response(request_url):
+            return cached
+        return await self.get(request_url, cache_url=request_url, hedge=True)
 
     async def fetch_url_versions(
         self,
@@ -96,15 +306,21 @@ class ArquivoClient:
         page_size: int = 2000,
         fields: tuple[str, ...] = (),
     ) -> httpx.Response:
-        params = {
-            "versionHistory": url,
-            "from": since,
-            "to": until,
-            "maxItems": page_size,
-        }
+        params = url_versions_params(url, since, until, page_size)
         if fields:
             params["fields"] = (",".join(fields),)
-        async with self.__semaphore:
-            return await self.handle_resp(
-                await self.client.get(ArquivoApiPath.TEXT_SEARCH, params=params)
-            )
+        return await self.get(ArquivoApiPath.TEXT_SEARCH, params=params)
+
+    async def fetch_cdx(
+        self,
+        url: str,
+        since: str,
+        until: str,
+        fields: tuple[str, ...] = (),
+        filters: tuple[str, ...] = (),
+        collapse: str | None = None,
+    ) -> httpx.Response:
+        """Lists captures through the wayback CDX server, one JSON object per
+        line, filtered and collapsed on the server side"""
+        params = cdx_params(url, since, until, fields, filters, collapse)
+        return await self.get(ArquivoApiPath.CDX, params=params)
@@ -0,0 +1,58 @@
+import time
+from collections import deque
+
+
+class Hedging:
+    """When to send a second, identical, replay request. Replay latency is
+    long tailed, a request still unanswered after the `quantile` of the
+    latest `window` latencies gets a duplicate, the first response wins and
+    the other request is cancelled.
+
+    Duplicates are capped at `budget` of the requests, are not sent until
+    `min_samples` latencies are known, and stop for a while after arquivo.pt
+    answers Too Many Requests."""
+
+    def __init__(
+        self,
+        quantile: float = 0.95,
+        window: int = 500,
+        min_samples: int = 50,
+        min_delay: float = 1.0,
+        budget: float = 0.05,
+    ):
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.budget = budget
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.paused_until = 0.0
+        self.requests = 0
+        self.hedged = 0
+        self.won = 0
+
+    def observe(self, seconds: float):
+        self.latencies.append(seconds)
+
+    def delay(self) -> float | None:
+        """Seconds to wait for a response before hedging, None when there
+        are not enough latencies yet"""
+        if len(self.latencies) < self.min_samples:
+            return None
+        latencies = sorted(self.latencies)
+        return max(latencies[int(self.quantile * (len(latencies) - 1))], self.min_delay)
+
+    def allow(self) -> bool:
+        return (
+            self.hedged < self.budget * self.requests
+            and time.monotonic() >= self.paused_until
+        )
+
+    def pause(self, seconds: float):
+        self.paused_until = time.monotonic() + seconds
+
+    def __str__(self) -> str:
+        rate = self.hedged / self.requests if self.requests else 0
+        return (
+            f"{self.hedged} of {self.requests} replay requests hedged "
+            f"({rate:.1%}), {self.won} answered first by the hedge"
+        )
@@ -0,0 +1,322 @@
+import json
+import logging
+import mmap
+import re
+import zlib
+from dataclasses import dataclass
+from email.parser import BytesHeaderParser
+from pathlib import Path
+from typing import Iterable, Optional, Self
+from urllib.parse import urlsplit
+
+from arquivo import (
+    HOURLY,
+    FailureKind,
+    ReplayFailure,
+    SamplingPolicy,
+    filter_versions,
+)
+from arquivo.client import ArquivoApiPath, autodetect
+from arquivo.models import ArchivedURL, VersionEntry
+
+logger = logging.getLogger(__name__)
+
+CDX_EXTENSIONS = (".cdx", ".cdxj")
+
+REPLAY_PATH = re.compile(r"^/(?:noFrame/replay|wayback)/(\d{1,14})(?:id_)?/(.+)$")
+
+
+def surt(url: str) -> str:
+    """Canonical sort key used by CDX indexes, `http://www.publico.pt/a?b`
+    becomes `pt,publico)/a?b`."""
+    if "://" not in url:
+        url = f"http://{url}"
+    parts = urlsplit(url.strip().lower())
+    host = re.sub(r"^www\d*\.", "", parts.hostname or "")
+    path = parts.path or "/"
+    key = ",".join(reversed(host.split("."))) + ")" + path
+    if parts.query:
+        key += f"?{parts.query}"
+    return key
+
+
+@dataclass
+class CdxRecord:
+    url: str
+    tstamp: str
+    mime_type: str
+    status_code: int
+    digest: str
+    length: int
+    offset: int
+    file_name: str
+
+    @classmethod
+    def parse(cls, line: bytes) -> Optional["CdxRecord"]:
+        """Parses a CDXJ line or a classic CDX line with the default
+        `N b a m s k r M S V g` fields."""
+        fields = line.decode("utf-8", errors="replace").split(" ", 2)
+        if len(fields) < 3:
+            return None
+
+        key, tstamp, rest = fields
+        if rest.startswith("{"):
+            data = json.loads(rest)
+            return cls(
+                url=data.get("url", ""),
+                tstamp=tstamp,
+                mime_type=data.get("mime", ""),
+                status_code=to_int(data.get("status")),
+                digest=data.get("digest", ""),
+                length=to_int(data.get("length")),
+                offset=to_int(data.get("offset")),
+                file_name=data.get("filename", ""),
+            )
+
+        values = rest.split(" ")
+        if len(values) < 9:
+            return None
+        url, mime_type, status, digest, _, _, length, offset, file_name = values[:9]
+        return cls(
+            url=url,
+            tstamp=tstamp,
+            mime_type=mime_type,
+            status_code=to_int(status),
+            digest=digest,
+            length=to_int(length),
+            offset=to_int(offset),
+            file_name=file_name,
+        )
+
+    def version_entry(self) -> VersionEntry:
+        return VersionEntry.from_capture(
+            url=self.url,
+            tstamp=self.tstamp,
+            status_code=self.status_code,
+            digest=self.digest,
+            mime_type=self.mime_type,
+            length=self.length,
+            offset=self.offset,
+            file_name=self.file_name,
+        )
+
+
+def to_int(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+class CdxIndex:
+    """A sorted CDX or CDXJ file memory mapped and searched in place, only the
+    lines of the requested url are ever parsed."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
+
+    def line_start(self, position: int) -> int:
+        if position == 0:
+            return 0
+        newline = self.mm.rfind(b"\n", 0, position)
+        return newline + 1
+
+    def lower_bound(self, key: bytes) -> int:
+        low, high = 0, len(self.mm)
+        while low < high:
+            middle = self.line_start((low + high) // 2)
+            end = self.mm.find(b"\n", middle)
+            end = len(self.mm) if end == -1 else end
+            if self.mm[middle:end].split(b" ", 1)[0] < key:
+                low = end + 1
+            else:
+                high = middle
+        return low
+
+    def lookup(self, url: str, since: str, until: str) -> Iterable[CdxRecord]:
+        key = surt(url).encode("utf-8")
+        since, until = since.ljust(14, "0"), until.ljust(14, "9")
+        position = self.lower_bound(key)
+        while position < len(self.mm):
+            end = self.mm.find(b"\n", position)
+            end = len(self.mm) if end == -1 else end
+            line = self.mm[position:end].rstrip(b"\r")
+            position = end + 1
+            if not line or line.startswith(b" CDX"):
+                continue
+            if line.split(b" ", 1)[0] != key:
+                break
+            record = CdxRecord.parse(line)
+            if record and since <= record.tstamp <= until:
+                yield record
+
+
+class WarcFile:
+    """Random access to the records of a WARC file, read through a memory map
+    at the offsets given by the CDX index."""
+
+    def __init__(self, path: Path):
+        self.file = open(path, "rb")
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
+
+    def read_record(self, offset: int, length: int) -> bytes:
+        end = offset + length if length else len(self.mm)
+        data = self.mm[offset:end]
+        if data[:2] == b"\x1f\x8b":
+            # Each record is its own gzip member, stop at the end of it
+            return zlib.decompressobj(wbits=31).decompress(data)
+        return data
+
+    def read_response(self, offset: int, length: int) -> tuple[list, bytes]:
+        record = self.read_record(offset, length)
+        warc_headers, _, block = record.partition(b"\r\n\r\n")
+        warc_fields = parse_headers(warc_headers)
+        if block_length := to_int(warc_fields.get("Content-Length")):
+            block = block[:block_length]
+
+        http_headers, _, body = block.partition(b"\r\n\r\n")
+        headers = parse_headers(http_headers)
+        if "chunked" in headers.get("Transfer-Encoding", "").lower():
+            body = dechunk(body)
+        encoding = headers.get("Content-Encoding", "").lower()
+        if encoding in ("gzip", "x-gzip"):
+            body = zlib.decompressobj(wbits=31).decompress(body)
+        elif encoding == "deflate":
+            body = zlib.decompress(body)
+        return list(headers.items()), body
+
+
+def parse_headers(data: bytes):
+    """Parses the header lines that follow a WARC version or HTTP status line"""
+    return BytesHeaderParser().parsebytes(data.partition(b"\r\n")[2])
+
+
+def dechunk(body: bytes) -> bytes:
+    chunks = []
+    position = 0
+    while True:
+        line_end = body.find(b"\r\n", position)
+        if line_end == -1:
+            break
+        size = int(body[position:line_end].split(b";")[0] or b"0", 16)
+        if size == 0:
+            break
+        chunks.append(body[line_end + 2 : line_end + 2 + size])
+        position = line_end + 2 + size + 2
+    return b"".join(chunks)
+
+
+def decode_body(headers: list[tuple[str, str]], body: bytes) -> str:
+    content_type = dict((k.lower(), v) for k, v in headers).get("content-type", "")
+    match = re.search(r"charset=([\w-]+)", content_type, re.IGNORECASE)
+    encoding = match.group(1) if match else autodetect(body)
+    try:
+        return body.decode(encoding or "utf-8", errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+
+class LocalArquivo:
+    """Drop in replacement for `Arquivo` reading captures from local CDX/CDXJ
+    indexes and the WARC files they point to, e.g. arquivo.pt bulk exports.
+
+    Every `*.cdx` and `*.cdxj` file under `cdx_dir` is used, they must be
+    sorted as produced by the usual indexers. WARC files are looked up by the
+    index filename, relative to `warc_dir`."""
+
+    def __init__(
+        self,
+        cdx_dir: Path,
+        warc_dir: Path | None = None,
+        sampling: SamplingPolicy = HOURLY,
+    ):
+        self.warc_dir = warc_dir or cdx_dir
+        self.sampling = sampling
+        # Local reads are cheap, failed ones are not remembered
+        self.negative_cache = None
+        self.indexes = [
+            CdxIndex(path)
+            for path in sorted(cdx_dir.rglob("*"))
+            if path.suffix in CDX_EXTENSIONS and path.stat().st_size > 0
+        ]
+        self.warcs: dict[str, WarcFile] = {}
+        logger.info(f"Local archive with {len(self.indexes)} CDX indexes")
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        for index in self.indexes:
+            index.close()
+        for warc in self.warcs.values():
+            warc.close()
+
+    def warc(self, file_name: str) -> WarcFile:
+        if file_name not in self.warcs:
+            self.warcs[file_name] = WarcFile(self.warc_dir / file_name)
+        return self.warcs[file_name]
+
+    def to_absolute_url(self, path: str) -> str:
+        if path.startswith("/"):
+            return f"{ArquivoApiPath.BASE_URL}{path}"
+        else:
+            return path
+
+    async def fetched_archived_url(
+        self, version: VersionEntry
+    ) -> Optional[ArchivedURL]:
+        try:
+            headers, body = self.warc(version.fileName).read_response(
+                version.offset, version.contentLength
+            )
+            return ArchivedURL(headers=headers, content=decode_body(headers, body))
+        except:
+            logger.exception("Read archived version entry")
+            return None
+
+    async def fetch_replay(self, version: VersionEntry) -> ArchivedURL | ReplayFailure:
+        archived_url = await self.fetched_archived_url(version)
+        if archived_url is None:
+            return ReplayFailure(FailureKind.ERROR)
+        return archived_url
+
+    async def fetched_archived_path(self, path: str) -> Optional[ArchivedURL]:
+        if match := REPLAY_PATH.match(path):
+            tstamp, url = match.groups()
+            versions = [
+                record.version_entry()
+                for index in self.indexes
+                for record in index.lookup(url, tstamp, tstamp)
+            ]
+            if versions:
+                return await self.fetched_archived_url(versions[0])
+        logger.warning(f"No local capture for {path}")
+        return None
+
+    async def fetch_url_versions(
+        self, url: str, since: str, until: str, retries: int = 3
+    ) -> Iterable[VersionEntry]:
+        records = sorted(
+            (
+                record
+                for index in self.indexes
+                for record in index.lookup(url, since, until)
+            ),
+            key=lambda record: record.tstamp,
+        )
+        return filter_versions(
+            (record.version_entry() for record in records), self.sampling
+        )
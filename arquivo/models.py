@@ -1,8 +1,11 @@
 from typing import List, Optional
+from urllib.parse import quote
 
 import pendulum
 from pydantic import BaseModel
 
+from .client import ArquivoApiPath
+
 
 class VersionEntry(BaseModel):
     title: str
@@ -23,6 +26,46 @@ class VersionEntry(BaseModel):
     offset: int
     statusCode: int
 
+    @classmethod
+    def from_capture(
+        cls,
+        url: str,
+        tstamp: str,
+        status_code: int,
+        digest: str = "",
+        mime_type: str = "",
+        length: int = 0,
+        offset: int = 0,
+        file_name: str = "",
+        collection: str = "",
+    ) -> "VersionEntry":
+        """Builds an entry from a capture listed outside /textsearch, with the
+        arquivo.pt links derived from its url and timestamp."""
+        base = ArquivoApiPath.BASE_URL
+        replay = f"{base}{ArquivoApiPath.NO_FRAME_REPLAY}/{tstamp}/{url}"
+        metadata = quote(f"{url}/{tstamp}", safe="")
+        return cls(
+            title="",
+            originalURL=url,
+            linkToArchive=f"{base}/wayback/{tstamp}/{url}",
+            tstamp=tstamp,
+            contentLength=length,
+            digest=digest,
+            mimeType=mime_type,
+            encoding=None,
+            linkToScreenshot=f"{base}/screenshot?url={quote(replay)}",
+            linkToNoFrame=replay,
+            linkToExtractedText=None,
+            linkToMetadata=f"{base}{ArquivoApiPath.TEXT_SEARCH}?metadata={metadata}",
+            linkToOriginalFile=(
+                f"{base}{ArquivoApiPath.NO_FRAME_REPLAY}/{tstamp}id_/{url}"
+            ),
+            fileName=file_name,
+            collection=collection,
+            offset=offset,
+            statusCode=status_code,
+        )
+
     @property
     def dt(self):
         dt = pendulum.from_format(self.tstamp, "YYYYMMDDHHmmss")
@@ -0,0 +1,142 @@
+import logging
+import time
+from dataclasses import dataclass
+from enum import StrEnum
+
+from sqlite_utils import Database
+
+logger = logging.getLogger(__name__)
+
+
+class FailureKind(StrEnum):
+    HTTP_STATUS = "http_status"
+    TIMEOUT = "timeout"
+    NETWORK = "network"
+    ERROR = "error"
+    NOT_HTML = "not_html"
+    # Replayed fine, the extractor read no facts from it
+    EMPTY = "empty"
+
+
+# Statuses of the client side that may succeed later
+TRANSIENT_CLIENT_STATUSES = (408, 425, 429)
+
+
+@dataclass(frozen=True)
+class ReplayFailure:
+    kind: FailureKind
+    status: int | None = None
+
+    @property
+    def permanent(self) -> bool:
+        """Whether retrying with the same extractor version is pointless"""
+        if self.kind == FailureKind.HTTP_STATUS:
+            return (
+                400 <= self.status < 500
+                and self.status not in TRANSIENT_CLIENT_STATUSES
+            )
+        return self.kind in (FailureKind.NOT_HTML, FailureKind.EMPTY)
+
+
+class NegativeCache:
+    """Replays of captures that produced no facts for an extractor version,
+    in the HTTP cache database, so later runs do not fetch them again.
+
+    Permanent failures, client errors, non HTML captures and pages the
+    extractor read nothing from, are never retried by the same extractor
+    version, its id changes with the version. Other failures are retried
+    after `retry_seconds`, doubled on each failure up to
+    `max_retry_seconds`."""
+
+    TABLE = "negative_replays"
+
+    def __init__(
+        self,
+        db: Database,
+        retry_seconds: float = 86400,
+        max_retry_seconds: float = 30 * 86400,
+        skip: bool = True,
+    ):
+        self.db = db
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self.skip = skip
+        self.retrying: set[tuple[str, str, str]] = set()
+        self.skipped = 0
+        self.recorded = 0
+        self.db.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.TABLE} ("
+            "url TEXT NOT NULL, "
+            "tstamp TEXT NOT NULL, "
+            "extractor_id TEXT NOT NULL, "
+            "kind TEXT NOT NULL, "
+            "status INTEGER, "
+            "failures INTEGER NOT NULL, "
+            "failed_at REAL NOT NULL, "
+            # NULL for permanent failures
+            "retry_at REAL, "
+            "PRIMARY KEY (url, tstamp, extractor_id))"
+        )
+
+    def is_dead_end(self, url: str, tstamp: str, extractor_id: str) -> bool:
+        """Whether the replay is known to produce no facts and is not due a
+        retry yet"""
+        row = self.db.execute(
+            f"SELECT retry_at FROM {self.TABLE} "
+            "WHERE url = ? AND tstamp = ? AND extractor_id = ?",
+            [url, tstamp, extractor_id],
+        ).fetchone()
+        if row is None:
+            return False
+        if self.skip and (row[0] is None or row[0] > time.time()):
+            self.skipped += 1
+            return True
+        self.retrying.add((url, tstamp, extractor_id))
+        return False
+
+    def record(self, url: str, tstamp: str, extractor_id: str, failure: ReplayFailure):
+        row = self.db.execute(
+            f"SELECT failures FROM {self.TABLE} "
+            "WHERE url = ? AND tstamp = ? AND extractor_id = ?",
+            [url, tstamp, extractor_id],
+        ).fetchone()
+        failures = (row[0] if row else 0) + 1
+        now = time.time()
+        retry_at = None
+        if not failure.permanent:
+            retry_at = now + min(
+                self.retry_seconds * 2 ** (failures - 1), self.max_retry_seconds
+            )
+        with self.db.conn:
+            self.db.execute(
+                f"INSERT OR REPLACE INTO {self.TABLE} "
+                "(url, tstamp, extractor_id, kind, status, failures, failed_at, "
+                "retry_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    url,
+                    tstamp,
+                    extractor_id,
+                    failure.kind.value,
+                    failure.status,
+                    failures,
+                    now,
+                    retry_at,
+                ],
+            )
+        self.retrying.discard((url, tstamp, extractor_id))
+        self.recorded += 1
+
+    def forget(self, url: str, tstamp: str, extractor_id: str):
+        """Drops a failure retried with success"""
+        if (url, tstamp, extractor_id) not in self.retrying:
+            return
+        self.retrying.discard((url, tstamp, extractor_id))
+        with self.db.conn:
+            self.db.execute(
+                f"DELETE FROM {self.TABLE} "
+                "WHERE url = ? AND tstamp = ? AND extractor_id = ?",
+                [url, tstamp, extractor_id],
+            )
+
+    def __str__(self) -> str:
+        return f"{self.skipped} dead end replays skipped, {self.recorded} recorded"
@@ -0,0 +1,116 @@
+import datetime
+import itertools
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+from .models import VersionEntry
+
+
+class SamplingPolicy:
+    """Chooses the captures of each day replayed, out of the captures of a
+    version listing sorted by time. Busy front pages are captured many times
+    a day, mostly showing the same headlines"""
+
+    def sample(self, data: Iterable[VersionEntry]) -> Iterator[VersionEntry]:
+        for _, day in itertools.groupby(data, lambda e: e.tstamp[:8]):
+            yield from self.sample_day(list(day))
+
+    def sample_day(self, captures: list[VersionEntry]) -> list[VersionEntry]:
+        raise NotImplementedError("Abstract Method")
+
+    def max_per_day(self) -> int | None:
+        """Captures a day chosen at most, None when it depends on them"""
+        return None
+
+    def cdx_collapse(self) -> str | None:
+        """The collapse the CDX server can apply without changing what the
+        policy chooses, None to list every capture"""
+        return None
+
+
+@dataclass(frozen=True)
+class Hourly(SamplingPolicy):
+    """The first capture of every hour, up to 24 a day"""
+
+    def sample_day(self, captures: list[VersionEntry]) -> list[VersionEntry]:
+        return [
+            next(hour)
+            for _, hour in itertools.groupby(captures, lambda e: e.tstamp[:10])
+        ]
+
+    def max_per_day(self) -> int | None:
+        return 24
+
+    def cdx_collapse(self) -> str | None:
+        # The first capture of each hour, by the yyyyMMddhh timestamp prefix
+        return "timestamp:10"
+
+
+@dataclass(frozen=True)
+class PerDay(SamplingPolicy):
+    """`count` captures a day, evenly spread from the first to the last"""
+
+    count: int
+
+    def sample_day(self, captures: list[VersionEntry]) -> list[VersionEntry]:
+        if len(captures) <= self.count:
+            return captures
+        if self.count == 1:
+            return captures[:1]
+        step = (len(captures) - 1) / (self.count - 1)
+        return [captures[round(i * step)] for i in range(self.count)]
+
+    def max_per_day(self) -> int | None:
+        return self.count
+
+
+@dataclass(frozen=True)
+class ClosestTo(SamplingPolicy):
+    """The capture of each day closest to a time of the day, in UTC as the
+    capture timestamps"""
+
+    at: datetime.time
+
+    def sample_day(self, captures: list[VersionEntry]) -> list[VersionEntry]:
+        target = self.at.hour * 3600 + self.at.minute * 60
+
+        def distance(entry: VersionEntry) -> int:
+            tstamp = entry.tstamp
+            seconds = int(tstamp[8:10]) * 3600 + int(tstamp[10:12]) * 60
+            return abs(seconds + int(tstamp[12:14]) - target)
+
+        return [min(captures, key=distance)]
+
+    def max_per_day(self) -> int | None:
+        return 1
+
+
+@dataclass(frozen=True)
+class DistinctDigests(SamplingPolicy):
+    """The first capture of each distinct content of the day, by digest"""
+
+    def sample_day(self, captures: list[VersionEntry]) -> list[VersionEntry]:
+        first = {}
+        for entry in captures:
+            first.setdefault(entry.digest or entry.tstamp, entry)
+        return list(first.values())
+
+
+HOURLY = Hourly()
+
+SAMPLING_SPECS = ("hourly", "per-day:N", "closest:HH:MM", "distinct-digest")
+
+
+def parse_sampling(spec: str) -> SamplingPolicy:
+    """A policy from its command line form, one of `SAMPLING_SPECS`, raising
+    ValueError for anything else"""
+    name, _, value = spec.partition(":")
+    if name == "hourly" and not value:
+        return HOURLY
+    if name == "distinct-digest" and not value:
+        return DistinctDigests()
+    if name == "per-day" and int(value) > 0:
+        return PerDay(int(value))
+    if name == "closest":
+        return ClosestTo(datetime.time.fromisoformat(value))
+    raise ValueError(f"Unknown sampling {spec}, expected one of {SAMPLING_SPECS}")
@@ -0,0 +1,83 @@
+"""Measures fact insert throughput of a backfill into an empty database with
+the previous rollback journal settings, the connection profile and the bulk
+load mode, the last one including the index rebuild at its end.
+
+Facts are inserted in batches of 2000 as an extraction does. Run from the
+repository root:
+
+    poetry run python -m benchmarks.bulk_load [facts]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from data import DesarquivoDb, Repository
+from data.db import apply_profile
+from data.models import Fact
+
+DEFAULT_FACTS = 100_000
+BATCH_SIZE = 2000
+ROLLBACK_PROFILE = ("PRAGMA journal_mode = DELETE", "PRAGMA synchronous = FULL")
+# Headline sized texts, the full text index cost grows with them
+TITLE = "Benfica vence o Porto no clássico e isola-se na liderança da jornada"
+SUMMARY = (
+    "O treinador destacou a exibição da equipa e a importância dos três pontos "
+    "para a classificação final, num jogo decidido nos últimos minutos"
+)
+
+
+def facts(count: int, max_date_id: int) -> list[Fact]:
+    return [
+        Fact.build(
+            content={"title": f"{i} {TITLE}", "summary": f"{SUMMARY} {i}"},
+            accessory_content=None,
+            source_url=f"https://arquivo.pt/wayback/{i}",
+            arquivo_url=f"https://arquivo.pt/noFrame/replay/{i}",
+            canonical_url="https://www.publico.pt",
+            screenshot_url=None,
+            version="1",
+            date_id=1 + i % max_date_id,
+            category_id="news_highlight",
+            source_id="desarquivo",
+            extractor_id="benchmark",
+        )
+        for i in range(count)
+    ]
+
+
+def load(path: Path, mode: str, count: int) -> float:
+    bulk_load = mode == "bulk"
+    with DesarquivoDb(False, path=str(path), bulk_load=bulk_load) as db:
+        if mode == "rollback":
+            apply_profile(db, ROLLBACK_PROFILE)
+        db["extractor_dim"].insert({"id": "benchmark", "name": "Benchmark"})
+        max_date_id = db.execute("SELECT max(id) FROM date_dim").fetchone()[0]
+        batch = facts(count, max_date_id)
+        repository = Repository(db, index_fts=not bulk_load)
+
+        started = time.perf_counter()
+        for i in range(0, len(batch), BATCH_SIZE):
+            repository.insert_facts(batch[i : i + BATCH_SIZE])
+    # Closing a bulk load rebuilds its indexes, part of its cost
+    elapsed = time.perf_counter() - started
+
+    with DesarquivoDb(False, path=str(path)) as db:
+        assert db.execute("SELECT count(*) FROM fact").fetchone()[0] == count
+        assert db.execute("SELECT count(*) FROM fact_fts").fetchone()[0] == count
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_FACTS
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("rollback", "profile", "bulk"):
+            elapsed = load(Path(tmp) / f"{mode}.db", mode, count)
+            print(
+                f"{mode:>8}: {count} facts in {elapsed:.1f}s, "
+                f"{count / elapsed:.0f} facts/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Measures replay fetches by sequential extractor loops against a simulated
+arquivo.pt with long tailed latency, with and without hedged requests.
+
+Latencies are scaled down, most replays answer in tens of milliseconds and
+a few take seconds. Nothing goes to the network. Run from the repository
+root:
+
+    poetry run python -m benchmarks.hedged_replays [replays] [loops]
+"""
+import asyncio
+import random
+import statistics
+import sys
+import time
+
+import httpx
+
+from arquivo import ArquivoApiPath, ArquivoClient, Hedging
+
+DEFAULT_REPLAYS = 400
+DEFAULT_LOOPS = 4
+# One in this many replays is slow
+SLOW_ONE_IN = 40
+SLOW_SECONDS = 2.0
+
+
+async def replay(request: httpx.Request) -> httpx.Response:
+    if random.randrange(SLOW_ONE_IN) == 0:
+        await asyncio.sleep(SLOW_SECONDS * random.uniform(0.5, 1.5))
+    else:
+        await asyncio.sleep(random.lognormvariate(-3.5, 0.4))
+    return httpx.Response(
+        200, text="<html></html>", headers={"content-type": "text/html"}
+    )
+
+
+async def scenario(name: str, hedging: Hedging | None, replays: int, loops: int):
+    random.seed(1)
+    arquivo_client = ArquivoClient(hedging=hedging)
+    await arquivo_client.client.aclose()
+    arquivo_client.client = httpx.AsyncClient(
+        transport=httpx.MockTransport(replay), base_url=ArquivoApiPath.BASE_URL
+    )
+    latencies = []
+
+    async def loop(n: int):
+        # An extractor replays its captures one after the other
+        for i in range(replays // loops):
+            started = time.perf_counter()
+            await arquivo_client.fetch_archived_url(
+                f"https://www.example.pt/{n}", f"2010{i:010d}"
+            )
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    async with arquivo_client:
+        await asyncio.gather(*(loop(n) for n in range(loops)))
+    elapsed = time.perf_counter() - started
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    hedged = f", {hedging}" if hedging else ""
+    print(
+        f"{name:>10}: {elapsed:.1f} s, p50 {quantiles[49] * 1000:.0f} ms, "
+        f"p99 {quantiles[98] * 1000:.0f} ms{hedged}"
+    )
+
+
+def main():
+    replays = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_REPLAYS
+    loops = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_LOOPS
+    print(f"{replays} replays by {loops} sequential loops")
+    asyncio.run(scenario("plain", None, replays, loops))
+    # The default minimum delay is for real latencies, these are scaled down
+    asyncio.run(
+        scenario("hedged", Hedging(min_samples=20, min_delay=0.05), replays, loops)
+    )
+
+
+if __name__ == "__main__":
+    main()
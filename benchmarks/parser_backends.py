@@ -0,0 +1,89 @@
+"""Checks the HTML parsers produce the same extraction results and compares
+their speed, running the layout plan of every source over a corpus of pages.
+
+The corpus is the replayed pages in an HTTP cache database or the `*.html`
+files of a folder. Run from the repository root:
+
+    poetry run python -m benchmarks.parser_backends [db_files/http_requests.db]
+
+The pages of every layout in `tests/fixtures/pages` are a small corpus that
+does not need a cache database, the tests check both parsers extract from them
+the results kept next to each page.
+"""
+import sys
+import time
+from pathlib import Path
+
+from sqlite_utils import Database
+
+from extractor import layout_plans
+from extractor.html import PARSERS, use_parser
+from extractor.layout import LayoutPlan
+
+DEFAULT_CORPUS = Path("db_files/http_requests.db")
+
+
+def load_corpus(path: Path) -> list[tuple[str, str]]:
+    if path.is_dir():
+        return [
+            (str(file), file.read_text(errors="replace"))
+            for file in sorted(path.glob("*.html"))
+        ]
+    db = Database(path)
+    return [
+        (row["url"], row["content"])
+        for row in db.query(
+            "SELECT url, content FROM requests WHERE url LIKE '%/noFrame/replay/%'"
+        )
+    ]
+
+
+def extract_all(plans: list[LayoutPlan], content: str) -> list:
+    return [
+        (
+            result.content.dict(),
+            result.accessory_content and result.accessory_content.dict(),
+        )
+        for plan in plans
+        for result in plan.extract(content)
+    ]
+
+
+def main():
+    corpus = load_corpus(Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CORPUS)
+    plans = layout_plans()
+    layouts = sum(len(plan.layouts) for plan in plans)
+    print(f"{len(corpus)} pages, {layouts} layouts")
+
+    results = {}
+    for parser in PARSERS:
+        try:
+            use_parser(parser)
+            started = time.perf_counter()
+            results[parser] = [extract_all(plans, content) for _, content in corpus]
+            elapsed = time.perf_counter() - started
+        except ImportError as e:
+            print(f"{parser:>12}: not installed ({e})")
+            continue
+        facts = sum(len(page) for page in results[parser])
+        print(
+            f"{parser:>12}: {elapsed:.2f}s, "
+            f"{elapsed / max(len(corpus), 1) * 1000:.1f} ms/page, {facts} results"
+        )
+
+    reference, *others = results
+    for parser in others:
+        mismatches = [
+            url
+            for (url, _), expected, got in zip(
+                corpus, results[reference], results[parser]
+            )
+            if expected != got
+        ]
+        print(f"{parser} vs {reference}: {len(mismatches)} pages differ")
+        for url in mismatches[:20]:
+            print(f"  {url}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Measures "on this day" lookup latency as the facts database grows.
+
+The queried category keeps the same facts at every size while the other
+categories grow, so a flat latency means lookups only touch matching rows.
+
+Run from the repository root:
+
+    poetry run python -m benchmarks.query_latency
+"""
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from data import DesarquivoDb, FactQueries
+
+SIZES = (10_000, 100_000, 1_000_000)
+QUERIED_CATEGORY = "news_highlight"
+QUERIED_FACTS = 20_000
+OTHER_CATEGORIES = ("sports_highlight", "music_high_rotation", "cinema_on_theaters")
+LOOKUPS = 200
+
+
+def fill(db, size: int, category: str | None = None, offset: int = 0):
+    db["extractor_dim"].insert({"id": "benchmark", "name": "Benchmark"}, ignore=True)
+    max_date_id = db.execute("SELECT max(id) FROM date_dim").fetchone()[0]
+    with db.conn:
+        db.conn.executemany(
+            "INSERT INTO fact (id, content, source_url, arquivo_url, canonical_url, "
+            "date_id, date_to_id, category_id, source_id, extractor_id) "
+            "VALUES (?, ?, '', '', '', ?, ?, ?, 'desarquivo', 'benchmark')",
+            (
+                (
+                    str(i),
+                    f'{{"title": "Title {i}", "summary": "Summary {i}"}}',
+                    date_id,
+                    date_id + random.randint(0, 6),
+                    category or random.choice(OTHER_CATEGORIES),
+                )
+                for i in range(offset, offset + size)
+                for date_id in (random.randint(1, max_date_id - 7),)
+            ),
+        )
+    db.execute("ANALYZE")
+
+
+def measure(queries: FactQueries) -> list[float]:
+    timings = []
+    for _ in range(LOOKUPS):
+        month, day = random.randint(1, 12), random.randint(1, 28)
+        start = time.perf_counter()
+        queries.on_this_day(month, day, category_id=QUERIED_CATEGORY)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in SIZES:
+            with DesarquivoDb(True, path=str(Path(tmp) / f"{size}.db")) as db:
+                fill(db, QUERIED_FACTS, QUERIED_CATEGORY)
+                fill(db, size, offset=QUERIED_FACTS)
+                timings = sorted(measure(FactQueries(db)))
+                p99 = timings[int(len(timings) * 0.99) - 1]
+                print(
+                    f"{size + QUERIED_FACTS:>10} facts: "
+                    f"p50 {statistics.median(timings):.2f} ms p99 {p99:.2f} ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
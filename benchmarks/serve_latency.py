@@ -0,0 +1,128 @@
+"""Measures the latency of `desarquivo serve` day lookups under concurrent
+load, without the response cache, with it and with conditional requests
+answered by 304.
+
+A temporary database is filled with benchmark facts, the service and its
+clients run in this process over localhost. Run from the repository root:
+
+    poetry run python -m benchmarks.serve_latency [facts] [requests] [clients]
+"""
+import asyncio
+import datetime
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.bulk_load import facts
+from core.httpd import start_server
+from data import DesarquivoDb, FactReader, Repository
+from desarquivo import facts_handler
+
+DEFAULT_FACTS = 50_000
+DEFAULT_REQUESTS = 5000
+DEFAULT_CLIENTS = 32
+# Lookups of popular days dominate, 9 in 10 requests are for these many days
+HOT_DAYS = 60
+
+
+def fill(path: Path, count: int):
+    with DesarquivoDb(False, path=str(path), bulk_load=True) as db:
+        db["extractor_dim"].insert({"id": "benchmark", "name": "Benchmark"})
+        max_date_id = db.execute("SELECT max(id) FROM date_dim").fetchone()[0]
+        repository = Repository(db, index_fts=False)
+        batch = facts(count, max_date_id)
+        for i in range(0, len(batch), 2000):
+            repository.insert_facts(batch[i : i + 2000])
+
+
+def day_path() -> str:
+    hot = random.random() < 0.9
+    day = datetime.date(2024, 1, 1) + datetime.timedelta(
+        days=random.randrange(HOT_DAYS if hot else 366)
+    )
+    return f"/facts?month={day.month}&day={day.day}"
+
+
+async def get(port: int, path: str, etag: str | None = None) -> tuple[int, str]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    headers = f"If-None-Match: {etag}\r\n" if etag else ""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n{headers}\r\n".encode())
+    response = await reader.read()
+    writer.close()
+    head, _, _ = response.partition(b"\r\n\r\n")
+    lines = head.decode().split("\r\n")
+    status = int(lines[0].split()[1])
+    etag = next(
+        (line.split(":", 1)[1].strip() for line in lines if line.startswith("ETag")),
+        None,
+    )
+    return status, etag
+
+
+async def load(port: int, paths: list[str], clients: int, etags: dict | None):
+    latencies = []
+    statuses = {}
+    pending = iter(paths)
+
+    async def client():
+        for path in pending:
+            started = time.perf_counter()
+            status, etag = await get(port, path, etags and etags.get(path))
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+            if etags is not None and etag:
+                etags[path] = etag
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return latencies, statuses, time.perf_counter() - started
+
+
+async def scenario(path: Path, name: str, cache_size: int, conditional: bool, args):
+    requests, clients = args
+    reader = FactReader(str(path), cache_size=cache_size)
+    server = await start_server(facts_handler(reader), port=0)
+    port = server.sockets[0].getsockname()[1]
+    random.seed(1)
+    paths = [day_path() for _ in range(requests)]
+    etags = {} if conditional else None
+    if conditional or cache_size:
+        # Warms the cache, and the etags the clients hold
+        await load(port, paths, clients, etags)
+
+    latencies, statuses, elapsed = await load(port, paths, clients, etags)
+    server.close()
+    await server.wait_closed()
+    reader.close()
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{name:>12}: p50 {quantiles[49] * 1000:.1f} ms, "
+        f"p99 {quantiles[98] * 1000:.1f} ms, {requests / elapsed:.0f} req/s, "
+        f"statuses {statuses}"
+    )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_FACTS
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_REQUESTS
+    clients = int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_CLIENTS
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "facts.db"
+        fill(path, count)
+        print(f"{count} facts, {requests} day lookups by {clients} clients")
+        for name, cache_size, conditional in (
+            ("no cache", 0, False),
+            ("cache", 512, False),
+            ("conditional", 512, True),
+        ):
+            asyncio.run(
+                scenario(path, name, cache_size, conditional, (requests, clients))
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,28 @@
 import logging
-import logging.config
-import pendulum
 
 import click
 
 
+class DefaultCommandGroup(click.Group):
+    """Group that falls back to a default command when the first argument is
+    not one of its sub commands, so `desarquivo -m 12` keeps running the
+    extraction while `desarquivo query ...` picks a sub command."""
+
+    def __init__(self, *args, default_command: str, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.default_command = default_command
+
+    def parse_args(self, ctx, args):
+        if not args or (
+            args[0] not in self.commands and args[0] not in ctx.help_option_names
+        ):
+            args = [self.default_command, *args]
+        return super().parse_args(ctx, args)
+
+
 def validate_day_month(day, month):
+    import pendulum
+
     try:
         # Using 2024 as a year that has february with 29 days
         parsed_date = pendulum.from_format(f"2024-{month}-{day}", "YYYY-M-D")
@@ -23,12 +40,14 @@ def validate_day(ctx, param, value: int):
 
 
 def validate_month(ctx, param, value: int):
-    if not 0 < value < 13:
+    if value is not None and not 0 < value < 13:
         raise click.BadParameter(f"""Got value '{value}': Invalid month""")
     return value
 
 
 def setup_logs(level=logging.DEBUG):
+    import logging.config
+
     log_config = {
         "version": 1,
         "disable_existing_loggers": False,
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+REASONS = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: dict[str, str]
+    headers: dict[str, str]
+
+
+@dataclass
+class Response:
+    status: int = 200
+    body: bytes = b""
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+
+def json_response(data, status: int = 200, headers: dict | None = None) -> Response:
+    return Response(
+        status=status,
+        body=json.dumps(data, ensure_ascii=False).encode(),
+        headers={"Content-Type": "application/json; charset=utf-8", **(headers or {})},
+    )
+
+
+def not_found() -> Response:
+    return json_response({"error": "not found"}, status=404)
+
+
+async def read_request(reader: asyncio.StreamReader) -> Request | None:
+    request_line = await reader.readline()
+    try:
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        return None
+
+    headers = {}
+    while line := await reader.readline():
+        if line in (b"\r\n", b"\n"):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    url = urlsplit(target)
+    query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+    return Request(method.upper(), url.path, query, headers)
+
+
+def write_response(writer: asyncio.StreamWriter, response: Response, head: bool):
+    headers = {
+        **response.headers,
+        "Content-Length": str(len(response.body)),
+        "Connection": "close",
+    }
+    reason = REASONS.get(response.status, "")
+    lines = [f"HTTP/1.1 {response.status} {reason}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+    if not head and response.status != 304:
+        writer.write(response.body)
+
+
+async def start_server(
+    handler: Handler, host: str = "127.0.0.1", port: int = 8765
+) -> asyncio.Server:
+    """A small HTTP/1.1 server answering GET and HEAD requests with `handler`,
+    one request per connection, for local status and read endpoints"""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await read_request(reader)
+            if request is None:
+                response = json_response({"error": "bad request"}, status=400)
+            elif request.method not in ("GET", "HEAD"):
+                response = json_response({"error": "method not allowed"}, status=405)
+            else:
+                try:
+                    response = await handler(request)
+                except Exception:
+                    logger.exception(f"Failed handling {request.path}")
+                    response = json_response({"error": "internal error"}, status=500)
+            write_response(
+                writer, response, head=request is not None and request.method == "HEAD"
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info(f"Listening on http://{host}:{port}")
+    return server
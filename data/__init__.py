@@ -1 +1,5 @@
 from .db import *
+from .query import *
+from .shards import *
+from .queue import *
+from .read import *
@@ -1,51 +1,231 @@
+import json
 import logging
+import time
+from dataclasses import dataclass
+from datetime import date as Date
 from pathlib import Path
 from typing import Iterable
 
 from sqlite_utils import Database
+from sqlite_utils.db import jsonify_if_needed
+from sqlite_utils.utils import hash_record
 
 from data.models import *
 
 logger = logging.getLogger(__name__)
 
+# Longest validity interval, in days, a single fact row may cover
+FACT_MAX_INTERVAL_DAYS = 31
+
+
+def fact_covers_day(day: str) -> str:
+    """SQL condition on a fact aliased `f` whose interval covers the day with
+    the id `day`, a column or a parameter. Bounding date_id by the longest
+    interval keeps the lookup of a day a short range of the date index"""
+    return (
+        f"f.date_id BETWEEN {day} - {FACT_MAX_INTERVAL_DAYS - 1} AND {day} "
+        f"AND f.date_to_id >= {day}"
+    )
+
+
+# Columns hashed into a fact id
+FACT_HASH_COLUMNS = ("content", "date_id")
+
+# Columns of a fact row, in insert order
+FACT_ROW_COLUMNS = (
+    "id",
+    "content",
+    "accessory_content",
+    "source_url",
+    "arquivo_url",
+    "screenshot_url",
+    "canonical_url",
+    "version",
+    "date_id",
+    "date_to_id",
+    "category_id",
+    "source_id",
+    "extractor_id",
+    "location_id",
+)
+
+# Columns an existing fact takes from a fact with its id, the same content
+# on the same first day, its interval only grows
+FACT_UPDATED_COLUMNS = tuple(
+    column
+    for column in FACT_ROW_COLUMNS
+    if column not in ("id", "content", "date_id", "date_to_id")
+)
+
+# Inserts a fact row, updating the fact with its id only when a column
+# differs, unchanged facts are not written and inserted_at is kept
+FACT_UPSERT = (
+    f"INSERT INTO fact ({', '.join(FACT_ROW_COLUMNS)}) "
+    f"VALUES ({', '.join(':' + column for column in FACT_ROW_COLUMNS)}) "
+    "ON CONFLICT (id) DO UPDATE SET "
+    + ", ".join(f"{column} = excluded.{column}" for column in FACT_UPDATED_COLUMNS)
+    + ", date_to_id = max(fact.date_to_id, excluded.date_to_id), "
+    "updated_at = CURRENT_TIMESTAMP "
+    "WHERE excluded.date_to_id > fact.date_to_id OR ("
+    + ", ".join(f"fact.{column}" for column in FACT_UPDATED_COLUMNS)
+    + ") IS NOT ("
+    + ", ".join(f"excluded.{column}" for column in FACT_UPDATED_COLUMNS)
+    + ")"
+)
+
+# Keeps IN (...) lists below SQLite's default bound parameter limit
+SQLITE_MAX_VARIABLES = 500
+
+# Connection settings applied on every open. WAL lets queries run during an
+# extraction and with it NORMAL syncs are safe, a crash loses no committed
+# transaction once checkpointed. WAL databases must stay on a local disk, its
+# shared memory index is not shared between machines
+SQLITE_PROFILE = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+)
+
+# A bulk load keeps its journal in memory and never syncs, a crash during it
+# can corrupt the database, meant for first loads that can be started over
+SQLITE_BULK_LOAD_PROFILE = (
+    "PRAGMA journal_mode = MEMORY",
+    "PRAGMA synchronous = OFF",
+)
+
+# Read only connections cannot change the journal, they keep the caches
+SQLITE_READ_PROFILE = SQLITE_PROFILE[2:]
+
+# Indexes only queries read, dropped during a bulk load and created again at
+# its end. fact_interval_content_idx stays, inserting facts reads it
+BULK_LOAD_DEFERRED_INDEXES = (
+    "fact_interval_idx",
+    "fact_date_category_idx",
+    "fact_category_date_idx",
+    "fact_title_idx",
+    "fact_artist_idx",
+    "fact_inserted_at_idx",
+    "fact_updated_at_idx",
+)
+
+# Columns added after the first release, applied to existing databases
+MIGRATION_COLUMNS = {
+    "fact": [
+        ("date_to_id", "INTEGER NOT NULL DEFAULT 0", "date_id"),
+        (
+            "title",
+            "TEXT GENERATED ALWAYS AS (json_extract(content, '$.title')) VIRTUAL",
+            None,
+        ),
+        (
+            "artist",
+            "TEXT GENERATED ALWAYS AS (json_extract(content, '$.artist')) VIRTUAL",
+            None,
+        ),
+    ],
+}
+
 
 class DesarquivoDb:
-    def __init__(self, recreate_db: bool):
+    """Opens the facts database, creating or migrating its schema.
+
+    With `bulk_load` the database is set up for a first time backfill,
+    journaling is relaxed and the query indexes are dropped until the
+    database is closed, when they are created again, facts missing from the
+    full text index are indexed and statistics are gathered. Facts should
+    then be inserted with a `Repository` that does not index them."""
+
+    def __init__(
+        self,
+        recreate_db: bool,
+        path: str = "db_files/facts.db",
+        bulk_load: bool = False,
+    ):
         self.recreate_db = recreate_db
+        self.path = path
+        self.bulk_load = bulk_load
 
     def __enter__(self):
         def __tracer(sql, params):
             logger.debug("SQL: %s - params: %s", sql, params)
 
-        self.db = Database(
-            f"db_files/facts.db", tracer=__tracer, recreate=self.recreate_db
-        )
+        self.db = Database(self.path, tracer=__tracer, recreate=self.recreate_db)
+        apply_profile(self.db, SQLITE_PROFILE)
         if self.recreate_db:
-            self.db.enable_wal()
             self.db.execute("PRAGMA foreign_keys = ON;")
             self.db.execute("PRAGMA auto_vacuum = FULL;")
-            for p in sorted(Path("./data/sql/").glob("*.sql")):
-                with open(p, "r") as file:
-                    self.db.executescript(file.read())
+        self.migrate()
+        self.run_scripts()
+        if self.bulk_load:
+            self.start_bulk_load()
         return self.db
 
+    def run_scripts(self):
+        for p in sorted(Path("./data/sql/").glob("*.sql")):
+            with open(p, "r") as file:
+                self.db.executescript(file.read())
+
+    def start_bulk_load(self):
+        logger.info("Bulk load: deferring query indexes and full text indexing")
+        apply_profile(self.db, SQLITE_BULK_LOAD_PROFILE)
+        for index in BULK_LOAD_DEFERRED_INDEXES:
+            self.db.execute(f"DROP INDEX IF EXISTS {index}")
+
+    def finish_bulk_load(self):
+        started = time.monotonic()
+        with self.db.conn:
+            self.db.execute(
+                "INSERT INTO fact_fts (fact_id, title, summary, artist, song) "
+                "SELECT id, json_extract(content, '$.title'), "
+                "json_extract(content, '$.summary'), "
+                "json_extract(content, '$.artist'), "
+                "json_extract(content, '$.song') "
+                "FROM fact WHERE id NOT IN (SELECT fact_id FROM fact_fts)"
+            )
+        self.run_scripts()
+        self.db.execute("ANALYZE")
+        apply_profile(self.db, SQLITE_PROFILE)
+        logger.info(f"Bulk load: indexes rebuilt in {time.monotonic() - started:.1f}s")
+
+    def migrate(self):
+        for table, columns in MIGRATION_COLUMNS.items():
+            if not self.db[table].exists():
+                continue
+            existing = {
+                row[1] for row in self.db.execute(f"PRAGMA table_xinfo({table})")
+            }
+            for column, definition, fill_from in columns:
+                if column in existing:
+                    continue
+                logger.info(f"Migrating {table}: adding column {column}")
+                with self.db.conn:
+                    self.db.execute(
+                        f"ALTER TABLE {table} ADD COLUMN {column} {definition}"
+                    )
+                    if fill_from:
+                        self.db.execute(f"UPDATE {table} SET {column} = {fill_from}")
+
     def __exit__(self, exc_type, exc_val, exc_tb):
+        # Also after a failure, facts loaded until then need their indexes
+        if self.bulk_load:
+            self.finish_bulk_load()
         self.db.close()
 
 
 class HttpCacheDb:
-    def __init__(self, recreate_db: bool):
+    def __init__(self, recreate_db: bool, path: str = "db_files/http_requests.db"):
         self.recreate_db = recreate_db
+        self.path = path
 
     def __enter__(self):
         def __tracer(sql, params):
             logger.debug("SQL: %s - params: %s", sql, params)
 
-        self.db = Database(
-            f"db_files/http_requests.db", tracer=__tracer, recreate=self.recreate_db
-        )
+        self.db = Database(self.path, tracer=__tracer, recreate=self.recreate_db)
+        apply_profile(self.db, SQLITE_PROFILE)
         if self.recreate_db:
-            self.db.enable_wal()
             self.db.execute("PRAGMA foreign_keys = ON;")
             self.db.execute("PRAGMA auto_vacuum = FULL;")
 
@@ -55,11 +235,50 @@ class HttpCacheDb:
         self.db.close()
 
 
+def apply_profile(db: Database, pragmas: Iterable[str]):
+    for pragma in pragmas:
+        db.execute(pragma)
+
+
+@dataclass
+class InsertStats:
+    new: int = 0
+    unchanged: int = 0
+    updated: int = 0
+
+    def __add__(self, other: "InsertStats") -> "InsertStats":
+        return InsertStats(
+            self.new + other.new,
+            self.unchanged + other.unchanged,
+            self.updated + other.updated,
+        )
+
+    def __str__(self) -> str:
+        return f"{self.new} new, {self.unchanged} unchanged, {self.updated} updated"
+
+
 class Repository:
-    def __init__(self, db: Database):
+    """Reads and writes dimensions and facts. Without `index_fts` inserted
+    facts are left out of the full text index, for bulk loads that index
+    them all at once.
+
+    Dates and extractors found are cached for the life of the repository,
+    extractors look a date up for every capture they read."""
+
+    def __init__(self, db: Database, index_fts: bool = True):
         self.db = db
+        self.index_fts = index_fts
+        self.dates: dict[tuple[int, int, int], DateDim] = {}
+        self.extractors: dict[str, ExtractorDim] = {}
 
     def fetch_date(self, year: int, month: int, day: int) -> DateDim | None:
+        if date_dim := self.dates.get((year, month, day)):
+            return date_dim
+        if date_dim := self.query_date(year, month, day):
+            self.dates[(year, month, day)] = date_dim
+        return date_dim
+
+    def query_date(self, year: int, month: int, day: int) -> DateDim | None:
         records = self.db.table("date_dim").rows_where(
             "year = :year AND month = :month AND day = :day",
             {"year": year, "month": month, "day": day},
@@ -71,6 +290,90 @@ class Repository:
         else:
             return None
 
+    def fetch_dates(self, start: Date, end: Date) -> list[DateDim]:
+        records = self.db.query(
+            "SELECT * FROM date_dim "
+            "WHERE (year, month, day) BETWEEN (:sy, :sm, :sd) AND (:ey, :em, :ed) "
+            "ORDER BY id",
+            {
+                "sy": start.year,
+                "sm": start.month,
+                "sd": start.day,
+                "ey": end.year,
+                "em": end.month,
+                "ed": end.day,
+            },
+        )
+        return [DateDim(**record) for record in records]
+
+    def fetch_missing_days(
+        self,
+        extractor_id: str,
+        month: int,
+        day: int | None,
+        start_year: int,
+        end_year: int,
+        category_id: str | None = None,
+    ) -> list[DateDim]:
+        """Days of the month, or the single day, of the years given that no
+        fact of the extractor, and category when given, covers"""
+        return self.fetch_days_by_coverage(
+            False, extractor_id, month, day, start_year, end_year, category_id
+        )
+
+    def fetch_covered_days(
+        self,
+        extractor_id: str,
+        month: int,
+        day: int | None,
+        start_year: int,
+        end_year: int,
+        category_id: str | None = None,
+    ) -> list[DateDim]:
+        """Days of the month, or the single day, of the years given that a
+        fact of the extractor, and category when given, covers"""
+        return self.fetch_days_by_coverage(
+            True, extractor_id, month, day, start_year, end_year, category_id
+        )
+
+    def fetch_days_by_coverage(
+        self,
+        covered: bool,
+        extractor_id: str,
+        month: int,
+        day: int | None,
+        start_year: int,
+        end_year: int,
+        category_id: str | None = None,
+    ) -> list[DateDim]:
+        # The unary + keeps SQLite on the date index, a short range per day,
+        # instead of every fact of the extractor
+        query = (
+            "SELECT d.* FROM date_dim d "
+            "WHERE d.month = :month AND d.year BETWEEN :start_year AND :end_year "
+            f"AND {'' if covered else 'NOT '}EXISTS ("
+            "  SELECT 1 FROM fact f "
+            "  WHERE +f.extractor_id = :extractor_id "
+            f"  AND {fact_covers_day('d.id')}"
+        )
+        if category_id is not None:
+            query += " AND f.category_id = :category_id"
+        query += ")"
+        if day is not None:
+            query += " AND d.day = :day"
+        records = self.db.query(
+            query + " ORDER BY d.id",
+            {
+                "extractor_id": extractor_id,
+                "category_id": category_id,
+                "month": month,
+                "day": day,
+                "start_year": start_year,
+                "end_year": end_year,
+            },
+        )
+        return [DateDim(**record) for record in records]
+
     def fetch_category(self, _id: str) -> CategoryDim | None:
         records = self.db.table("category_dim").rows_where(
             "id = :id", {"id": _id}, limit=1
@@ -92,16 +395,21 @@ class Repository:
             return None
 
     def fetch_extractor(self, _id: str, name: str) -> ExtractorDim:
+        if extractor_dim := self.extractors.get(_id):
+            return extractor_dim
+
         records = self.db.table("extractor_dim").rows_where(
             "id = :id", {"id": _id}, limit=1
         )
 
         if record := next(records, None):
-            return ExtractorDim(**record)
+            extractor_dim = ExtractorDim(**record)
         else:
             new_record = {"id": _id, "name": name}
             self.db.table("extractor_dim").insert({"id": _id, "name": name})
-            return ExtractorDim(**new_record)
+            extractor_dim = ExtractorDim(**new_record)
+        self.extractors[_id] = extractor_dim
+        return extractor_dim
 
     def fetch_location(self, _id: str) -> LocationDim | None:
         records = self.db.table("location_dim").rows_where(
@@ -113,19 +421,222 @@ class Repository:
         else:
             return None
 
-    def insert_fact(self, fact: Fact) -> str:
-        data = fact.dict(exclude={"id"})
-        last_pk = (
-            self.db.table("fact")
-            .insert(data, hash_id="id", hash_id_columns=("content",), replace=True)
-            .last_pk
+    def fetch_facts(self, date_id: int) -> list[Fact]:
+        records = self.db.query(
+            f"SELECT * FROM fact f WHERE {fact_covers_day(':date_id')}",
+            {"date_id": date_id},
+        )
+        return [Fact.parse_obj(decode_fact_record(record)) for record in records]
+
+    def insert_facts(self, facts: Iterable[Fact]) -> InsertStats:
+        """Inserts facts, folding each one into an existing fact with the same
+        content whose validity interval it overlaps or immediately follows.
+
+        Facts an existing fact already covers are skipped without writing, so
+        extracting covered days again writes nothing. A fact with the id of an
+        existing one updates it only when one of its columns differs."""
+        stats = InsertStats()
+        with self.db.conn:
+            intervals = coalesce_fact_intervals(fact_row(fact) for fact in facts)
+            known = self.fetch_known_intervals(intervals)
+            data = []
+            for row in intervals:
+                known_intervals = known.get(fact_key(row))
+                if known_intervals is None:
+                    # No fact with its content around to fold into
+                    data.append(row)
+                    continue
+                if is_covered(row, known_intervals):
+                    stats.unchanged += 1
+                    continue
+                extended = self.extend_fact_interval(row)
+                if extended is None:
+                    data.append(row)
+                elif extended:
+                    stats.updated += 1
+                else:
+                    stats.unchanged += 1
+
+            for row in data:
+                row["id"] = hash_record(row, FACT_HASH_COLUMNS)
+            existing_ids = self.fetch_existing_fact_ids([row["id"] for row in data])
+            new_data = [row for row in data if row["id"] not in existing_ids]
+
+            changes = self.db.conn.total_changes
+            self.db.conn.executemany(
+                FACT_UPSERT, ({**row, "content": row["content_json"]} for row in data)
+            )
+            updated = self.db.conn.total_changes - changes - len(new_data)
+            stats.new += len(new_data)
+            stats.updated += updated
+            stats.unchanged += len(data) - len(new_data) - updated
+            if self.index_fts:
+                self.index_facts(new_data)
+        return stats
+
+    def fetch_known_intervals(self, rows: list[dict]) -> dict[tuple, list[tuple]]:
+        """The intervals of the existing facts with the content of the rows
+        that overlap or touch their dates, the ones `extend_fact_interval`
+        could fold them into, by extractor, category and content. A single
+        query joins the rows, passed as JSON, through the index the interval
+        extension seeks, CROSS JOIN keeps them as the outer loop"""
+        windows = {}
+        for row in rows:
+            key = fact_key(row)
+            low, high = windows.get(key, (row["date_id"], row["date_to_id"]))
+            windows[key] = (min(low, row["date_id"]), max(high, row["date_to_id"]))
+        if not windows:
+            return {}
+
+        records = self.db.execute(
+            "SELECT f.extractor_id, f.category_id, f.content, f.date_id, f.date_to_id "
+            "FROM json_each(:windows) w CROSS JOIN fact f "
+            "WHERE f.extractor_id = w.value ->> 0 AND f.category_id = w.value ->> 1 "
+            "AND substr(f.content, 1, 64) = substr(w.value ->> 2, 1, 64) "
+            "AND f.date_to_id BETWEEN (w.value ->> 3) - 1 "
+            "AND (w.value ->> 4) + :span "
+            "AND f.date_id <= (w.value ->> 4) + 1 AND +f.content = w.value ->> 2",
+            {
+                "windows": json.dumps(
+                    [[*key, *window] for key, window in windows.items()]
+                ),
+                "span": FACT_MAX_INTERVAL_DAYS,
+            },
+        )
+        known = {}
+        for extractor_id, category_id, content, date_id, date_to_id in records:
+            known.setdefault((extractor_id, category_id, content), []).append(
+                (date_id, date_to_id)
+            )
+        return known
+
+    def fetch_existing_fact_ids(self, ids: list[str]) -> set[str]:
+        existing_ids = set()
+        for i in range(0, len(ids), SQLITE_MAX_VARIABLES):
+            chunk = ids[i : i + SQLITE_MAX_VARIABLES]
+            placeholders = ", ".join("?" * len(chunk))
+            existing_ids.update(
+                row[0]
+                for row in self.db.execute(
+                    f"SELECT id FROM fact WHERE id IN ({placeholders})", chunk
+                )
+            )
+        return existing_ids
+
+    def index_facts(self, rows: Iterable[dict]):
+        """Adds facts to the full text index, a fact is indexed once when first
+        inserted as interval extensions leave its content unchanged."""
+        self.db.conn.executemany(
+            "INSERT INTO fact_fts (fact_id, title, summary, artist, song) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                (
+                    row["id"],
+                    row["content"].get("title"),
+                    row["content"].get("summary"),
+                    row["content"].get("artist"),
+                    row["content"].get("song"),
+                )
+                for row in rows
+            ),
         )
-        return last_pk
 
-    def insert_facts(self, facts: Iterable[Fact]) -> int:
-        previous_count = self.db.table("fact").count
-        data = (fact.dict(exclude={"id"}) for fact in facts)
-        self.db.table("fact").insert_all(
-            data, hash_id="id", hash_id_columns=("content", "date_id"), replace=True
+    def extend_fact_interval(self, row: dict) -> bool | None:
+        """Folds a row into an existing fact with the same content, None when
+        there is none to fold into, otherwise whether the fact's interval
+        changed."""
+        # The content prefix seeks fact_interval_content_idx, the unary plus
+        # keeps SQLite from propagating the content into the prefix term and
+        # scanning every fact of the 31 days window instead
+        existing = next(
+            self.db.query(
+                "SELECT id, date_id, date_to_id FROM fact "
+                "WHERE extractor_id = :extractor_id AND category_id = :category_id "
+                "AND substr(content, 1, 64) = substr(:content, 1, 64) "
+                "AND date_to_id BETWEEN :date_id - 1 AND :date_to_id + :span "
+                "AND date_id <= :date_to_id + 1 AND +content = :content "
+                "LIMIT 1",
+                {
+                    "extractor_id": row["extractor_id"],
+                    "category_id": row["category_id"],
+                    "date_id": row["date_id"],
+                    "date_to_id": row["date_to_id"],
+                    "content": row["content_json"],
+                    "span": FACT_MAX_INTERVAL_DAYS,
+                },
+            ),
+            None,
         )
-        return self.db.table("fact").count - previous_count
+        if existing is None:
+            return None
+
+        date_id = min(existing["date_id"], row["date_id"])
+        date_to_id = max(existing["date_to_id"], row["date_to_id"])
+        if date_to_id - date_id >= FACT_MAX_INTERVAL_DAYS:
+            return None
+
+        if (date_id, date_to_id) == (existing["date_id"], existing["date_to_id"]):
+            return False
+        self.db.execute(
+            "UPDATE fact SET date_id = ?, date_to_id = ?, "
+            "updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+            [date_id, date_to_id, existing["id"]],
+        )
+        return True
+
+
+def fact_key(row: dict) -> tuple:
+    return row["extractor_id"], row["category_id"], row["content_json"]
+
+
+def is_covered(row: dict, intervals: list[tuple]) -> bool:
+    """Whether every day of the row is in one of the intervals of the facts
+    with its content, facts longer than FACT_MAX_INTERVAL_DAYS are split"""
+    day = row["date_id"]
+    for date_id, date_to_id in sorted(intervals):
+        if date_id > day:
+            break
+        day = max(day, date_to_id + 1)
+        if day > row["date_to_id"]:
+            return True
+    return False
+
+
+def decode_fact_record(record: dict) -> dict:
+    for column in ("content", "accessory_content"):
+        if record[column] is not None:
+            record[column] = json.loads(record[column])
+    return record
+
+
+def fact_row(fact: Fact) -> dict:
+    """A fact as a fact table row, read from its attributes without copying
+    the model. The content is serialized once, `content_json`, for matching
+    and inserting while `content` stays a dict for the id and the index."""
+    row = {column: getattr(fact, column) for column in FACT_ROW_COLUMNS[1:]}
+    row["date_to_id"] = row["date_to_id"] or row["date_id"]
+    row["content_json"] = jsonify_if_needed(row["content"])
+    row["accessory_content"] = jsonify_if_needed(row["accessory_content"])
+    return row
+
+
+def coalesce_fact_intervals(rows: Iterable[dict]) -> list[dict]:
+    """Merges rows with the same content on contiguous days into a single row
+    spanning them, keeping the first row seen for each interval."""
+    closed = []
+    open_intervals = {}
+    for row in sorted(rows, key=lambda r: r["date_id"]):
+        row["date_to_id"] = row["date_to_id"] or row["date_id"]
+        key = fact_key(row)
+        current = open_intervals.get(key)
+        if (
+            current is not None
+            and row["date_id"] <= current["date_to_id"] + 1
+            and row["date_to_id"] - current["date_id"] < FACT_MAX_INTERVAL_DAYS
+        ):
+            current["date_to_id"] = max(current["date_to_id"], row["date_to_id"])
+        else:
+            if current is not None:
+                closed.append(current)
+            open_intervals[key] = row
+    return closed + list(open_intervals.values())
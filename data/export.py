@@ -0,0 +1,184 @@
+import logging
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlite_utils import Database
+
+logger = logging.getLogger(__name__)
+
+EXPORT_QUERY = """
+SELECT
+    f.id,
+    date(printf('%04d-%02d-%02d', d.year, d.month, d.day)) AS date_from,
+    date(printf('%04d-%02d-%02d', dt.year, dt.month, dt.day)) AS date_to,
+    d.year,
+    d.month,
+    d.day,
+    d.day_of_week,
+    f.category_id,
+    c.name AS category_name,
+    f.source_id,
+    s.name AS source_name,
+    f.extractor_id,
+    e.name AS extractor_name,
+    f.location_id,
+    f.version,
+    json_extract(f.content, '$.title') AS title,
+    json_extract(f.content, '$.summary') AS summary,
+    json_extract(f.content, '$.artist') AS artist,
+    json_extract(f.content, '$.song') AS song,
+    json_extract(f.accessory_content, '$.more_link') AS more_link,
+    json_extract(f.accessory_content, '$.poster_image_link') AS poster_image_link,
+    f.source_url,
+    f.arquivo_url,
+    f.canonical_url,
+    f.screenshot_url,
+    f.inserted_at,
+    f.updated_at
+FROM fact f
+JOIN date_dim d ON d.id = f.date_id
+JOIN date_dim dt ON dt.id = f.date_to_id
+JOIN category_dim c ON c.id = f.category_id
+JOIN source_dim s ON s.id = f.source_id
+JOIN extractor_dim e ON e.id = f.extractor_id
+"""
+
+EXPORT_SCHEMA = pa.schema(
+    [
+        ("id", pa.string()),
+        ("date_from", pa.date32()),
+        ("date_to", pa.date32()),
+        ("year", pa.int16()),
+        ("month", pa.int8()),
+        ("day", pa.int8()),
+        ("day_of_week", pa.int8()),
+        ("category_id", pa.string()),
+        ("category_name", pa.string()),
+        ("source_id", pa.string()),
+        ("source_name", pa.string()),
+        ("extractor_id", pa.string()),
+        ("extractor_name", pa.string()),
+        ("location_id", pa.string()),
+        ("version", pa.string()),
+        ("title", pa.string()),
+        ("summary", pa.string()),
+        ("artist", pa.string()),
+        ("song", pa.string()),
+        ("more_link", pa.string()),
+        ("poster_image_link", pa.string()),
+        ("source_url", pa.string()),
+        ("arquivo_url", pa.string()),
+        ("canonical_url", pa.string()),
+        ("screenshot_url", pa.string()),
+        ("inserted_at", pa.timestamp("s")),
+        ("updated_at", pa.timestamp("s")),
+    ]
+)
+
+# Partition columns are encoded in the directory names, not in the files
+PARTITION_COLUMNS = ("year", "category_id")
+
+
+@dataclass
+class ExportResult:
+    rows: int
+    files: int
+    seconds: float
+
+
+class ParquetExporter:
+    """Streams the joined facts into a hive partitioned Parquet dataset,
+    `year=YYYY/category_id=ID/facts.parquet`, holding one chunk in memory.
+
+    The partitions are written to a staging directory beside the output and
+    replace the ones of earlier exports only once every file is closed, so a
+    re-export leaves no stale partitions behind and a failed one keeps the
+    previous dataset."""
+
+    def __init__(self, db: Database, output: Path, chunk_size: int = 50_000):
+        self.db = db
+        self.output = output
+        self.chunk_size = chunk_size
+        self.file_schema = pa.schema(
+            [f for f in EXPORT_SCHEMA if f.name not in PARTITION_COLUMNS]
+        )
+
+    def export(self) -> ExportResult:
+        started = time.monotonic()
+        self.output.mkdir(parents=True, exist_ok=True)
+        staging = Path(
+            tempfile.mkdtemp(prefix=f".{self.output.name}.", dir=self.output.parent)
+        )
+        try:
+            rows, files = self.write(staging)
+            self.replace_partitions(staging)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        return ExportResult(rows, files, time.monotonic() - started)
+
+    def write(self, root: Path) -> tuple[int, int]:
+        writers: dict[tuple, pq.ParquetWriter] = {}
+        rows = 0
+        cursor = self.db.execute(EXPORT_QUERY)
+        columns = [description[0] for description in cursor.description]
+        try:
+            while chunk := cursor.fetchmany(self.chunk_size):
+                rows += len(chunk)
+                for partition, records in partition_chunk(chunk, columns).items():
+                    if partition not in writers:
+                        writers[partition] = self.open_writer(root, partition)
+                    writers[partition].write_table(self.to_table(records))
+                logger.info(f"Exported {rows} facts")
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+        return rows, len(writers)
+
+    def replace_partitions(self, staging: Path):
+        # Only the partition directories belong to the dataset, anything else
+        # kept in the output directory is left alone
+        partition = f"{PARTITION_COLUMNS[0]}=*"
+        for path in self.output.glob(partition):
+            shutil.rmtree(path)
+        for path in staging.glob(partition):
+            path.rename(self.output / path.name)
+
+    def open_writer(self, root: Path, partition: tuple) -> pq.ParquetWriter:
+        path = root.joinpath(
+            *(f"{name}={value}" for name, value in zip(PARTITION_COLUMNS, partition))
+        )
+        path.mkdir(parents=True, exist_ok=True)
+        return pq.ParquetWriter(
+            path / "facts.parquet", self.file_schema, compression="zstd"
+        )
+
+    def to_table(self, records: dict[str, list]) -> pa.Table:
+        arrays = [
+            to_array(records[field.name], field.type) for field in self.file_schema
+        ]
+        return pa.Table.from_arrays(arrays, schema=self.file_schema)
+
+
+def partition_chunk(chunk: list[tuple], columns: list[str]) -> dict[tuple, dict]:
+    indexes = [columns.index(name) for name in PARTITION_COLUMNS]
+    partitions = {}
+    for row in chunk:
+        key = tuple(row[i] for i in indexes)
+        records = partitions.setdefault(key, {name: [] for name in columns})
+        for name, value in zip(columns, row):
+            records[name].append(value)
+    return partitions
+
+
+def to_array(values: list, arrow_type: pa.DataType) -> pa.Array:
+    # SQLite hands dates and timestamps back as text, cast them on arrow's side
+    if pa.types.is_date(arrow_type) or pa.types.is_timestamp(arrow_type):
+        return pa.array(values, pa.string()).cast(arrow_type)
+    return pa.array(values, arrow_type)
@@ -0,0 +1,205 @@
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from sqlite_utils import Database
+
+from data.db import SQLITE_MAX_VARIABLES, coalesce_fact_intervals, fact_key
+
+logger = logging.getLogger(__name__)
+
+DIMENSION_TABLES = ("source_dim", "location_dim", "category_dim", "extractor_dim")
+
+FACT_COLUMNS = (
+    "id",
+    "content",
+    "accessory_content",
+    "source_url",
+    "arquivo_url",
+    "screenshot_url",
+    "canonical_url",
+    "inserted_at",
+    "updated_at",
+    "version",
+    "category_id",
+    "source_id",
+    "extractor_id",
+    "location_id",
+)
+
+
+@dataclass
+class MergeResult:
+    source: Path
+    facts: int
+    new_facts: int
+    # Facts folded into another with the same content they overlap or touch
+    folded: int
+    seconds: float
+
+    @property
+    def rate(self) -> float:
+        return self.facts / max(self.seconds, 1e-6)
+
+
+class FactsMerger:
+    """Folds other facts databases into this one with set based statements.
+
+    Facts are deduplicated on their hash id keeping the earliest inserted_at,
+    the widest interval and the version of the latest update. Facts with the
+    same content whose intervals overlap or touch are then folded into one,
+    as `Repository.insert_facts` does. Dates are matched by year, month and
+    day so differing date_dim ids in the source databases are remapped.
+
+    Facts the merge adds or changes get updated_at set to the time of the
+    merge, as updates of `Repository.insert_facts` do, so incremental day
+    shard builds rewrite their days."""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    def merge(self, source: Path) -> MergeResult:
+        started = time.monotonic()
+        self.db.execute("ATTACH DATABASE ? AS source", [str(source)])
+        try:
+            source_columns = {
+                row[1] for row in self.db.execute("PRAGMA source.table_xinfo(fact)")
+            }
+            # Databases from before date intervals cover a single day per fact
+            date_to_column = "date_id"
+            if "date_to_id" in source_columns:
+                date_to_column = "date_to_id"
+
+            with self.db.conn:
+                for table in DIMENSION_TABLES:
+                    self.db.execute(
+                        f"INSERT OR IGNORE INTO main.{table} (id, name) "
+                        f"SELECT id, name FROM source.{table}"
+                    )
+                self.db.execute(
+                    "INSERT OR IGNORE INTO main.date_dim "
+                    "(year, month, day, day_of_week) "
+                    "SELECT year, month, day, day_of_week FROM source.date_dim"
+                )
+
+                self.db.execute("DROP TABLE IF EXISTS temp.merged_fact_ids")
+                self.db.execute(
+                    "CREATE TEMP TABLE merged_fact_ids AS "
+                    "SELECT id FROM source.fact "
+                    "WHERE id NOT IN (SELECT id FROM main.fact)"
+                )
+
+                columns = ", ".join(FACT_COLUMNS)
+                selected = ", ".join(f"f.{column}" for column in FACT_COLUMNS)
+                self.db.execute(
+                    f"INSERT INTO main.fact ({columns}, date_id, date_to_id) "
+                    f"SELECT {selected}, md.id, mdt.id FROM source.fact f "
+                    "JOIN source.date_dim sd ON sd.id = f.date_id "
+                    f"JOIN source.date_dim sdt ON sdt.id = f.{date_to_column} "
+                    "JOIN main.date_dim md "
+                    "ON (md.year, md.month, md.day) = (sd.year, sd.month, sd.day) "
+                    "JOIN main.date_dim mdt "
+                    "ON (mdt.year, mdt.month, mdt.day) "
+                    "= (sdt.year, sdt.month, sdt.day) "
+                    "WHERE true "
+                    "ON CONFLICT (id) DO UPDATE SET "
+                    "inserted_at = min(fact.inserted_at, excluded.inserted_at), "
+                    "date_to_id = max(fact.date_to_id, excluded.date_to_id), "
+                    "updated_at = CURRENT_TIMESTAMP, "
+                    "version = CASE WHEN coalesce(excluded.updated_at, '') "
+                    "> coalesce(fact.updated_at, '') "
+                    "THEN excluded.version ELSE fact.version END "
+                    "WHERE excluded.inserted_at < fact.inserted_at "
+                    "OR excluded.date_to_id > fact.date_to_id "
+                    "OR coalesce(excluded.updated_at, '') "
+                    "> coalesce(fact.updated_at, '')"
+                )
+                self.db.execute(
+                    "UPDATE main.fact SET updated_at = CURRENT_TIMESTAMP "
+                    "WHERE id IN (SELECT id FROM temp.merged_fact_ids)"
+                )
+                self.db.execute(
+                    "INSERT INTO fact_fts (fact_id, title, summary, artist, song) "
+                    "SELECT id, json_extract(content, '$.title'), "
+                    "json_extract(content, '$.summary'), "
+                    "json_extract(content, '$.artist'), "
+                    "json_extract(content, '$.song') "
+                    "FROM main.fact "
+                    "WHERE id IN (SELECT id FROM temp.merged_fact_ids)"
+                )
+                facts = self.db.execute("SELECT count(*) FROM source.fact").fetchone()[
+                    0
+                ]
+                new_facts = self.db.execute(
+                    "SELECT count(*) FROM temp.merged_fact_ids"
+                ).fetchone()[0]
+                self.db.execute("DROP TABLE temp.merged_fact_ids")
+                folded = self.fold_overlapping()
+        finally:
+            self.db.execute("DETACH DATABASE source")
+
+        result = MergeResult(
+            source, facts, new_facts, folded, time.monotonic() - started
+        )
+        logger.info(
+            f"Merged {result.facts} facts ({result.new_facts} new, "
+            f"{result.folded} folded) from {source} "
+            f"in {result.seconds:.1f}s, {result.rate:.0f} facts/s"
+        )
+        return result
+
+    def fold_overlapping(self) -> int:
+        """Folds the facts with the content of a source fact whose intervals
+        overlap or touch into the one starting first, returning how many
+        were folded. Only contents with more than one fact are read."""
+        groups: dict[tuple, list[dict]] = {}
+        for row in self.db.query(
+            "SELECT id, extractor_id, category_id, content, date_id, "
+            "date_to_id, inserted_at FROM ("
+            "  SELECT *, count(*) OVER ("
+            "    PARTITION BY extractor_id, category_id, content"
+            "  ) AS facts FROM main.fact "
+            "  WHERE (extractor_id, category_id, content) IN ("
+            "    SELECT extractor_id, category_id, content FROM source.fact"
+            "  )"
+            ") WHERE facts > 1"
+        ):
+            row["content_json"] = row["content"]
+            groups.setdefault(fact_key(row), []).append(row)
+
+        folded_ids = []
+        for rows in groups.values():
+            original = {
+                row["id"]: (row["date_to_id"], row["inserted_at"]) for row in rows
+            }
+            kept = coalesce_fact_intervals(rows)
+            kept_ids = {row["id"] for row in kept}
+            folded = [row for row in rows if row["id"] not in kept_ids]
+            for row in kept:
+                # Keeps the earliest inserted_at of the facts folded into it
+                inserted_at = min(
+                    [row["inserted_at"]]
+                    + [
+                        other["inserted_at"]
+                        for other in folded
+                        if row["date_id"] <= other["date_id"] <= row["date_to_id"]
+                    ]
+                )
+                if (row["date_to_id"], inserted_at) == original[row["id"]]:
+                    continue
+                self.db.execute(
+                    "UPDATE main.fact SET date_to_id = ?, inserted_at = ?, "
+                    "updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                    [row["date_to_id"], inserted_at, row["id"]],
+                )
+            folded_ids += [row["id"] for row in folded]
+
+        for i in range(0, len(folded_ids), SQLITE_MAX_VARIABLES):
+            ids = folded_ids[i : i + SQLITE_MAX_VARIABLES]
+            placeholders = ", ".join("?" * len(ids))
+            self.db.execute(
+                f"DELETE FROM fact_fts WHERE fact_id IN ({placeholders})", ids
+            )
+            self.db.execute(f"DELETE FROM main.fact WHERE id IN ({placeholders})", ids)
+        return len(folded_ids)
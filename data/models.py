@@ -1,3 +1,5 @@
+import os
+
 import httpx
 from pydantic import BaseModel, validator
 
@@ -5,6 +7,10 @@ from enum import Enum
 
 from arquivo import ArquivoApiPath
 
+# Facts are built from content models already validated by the extractors,
+# set DESARQUIVO_VALIDATE=1 to validate them again while debugging
+VALIDATE_FACTS = os.environ.get("DESARQUIVO_VALIDATE", "") not in ("", "0")
+
 
 class CategoryID(str, Enum):
     music_high_rotation = "music_high_rotation"
@@ -57,11 +63,19 @@ class Fact(BaseModel):
     screenshot_url: str | None
     version: str
     date_id: int
+    date_to_id: int | None = None
     category_id: str
     source_id: str
     extractor_id: str
     location_id: str | None = None
 
+    @classmethod
+    def build(cls, **data) -> "Fact":
+        """A fact from trusted values, without validation unless VALIDATE_FACTS"""
+        if VALIDATE_FACTS:
+            return cls(**data)
+        return cls.construct(**data)
+
 
 def trim(content: str) -> str:
     return content.strip()
@@ -0,0 +1,131 @@
+import logging
+from dataclasses import dataclass
+from typing import Iterator
+
+from sqlite_utils import Database
+
+from data.db import decode_fact_record, fact_covers_day
+
+logger = logging.getLogger(__name__)
+
+FACT_COLUMNS = (
+    "f.id, f.content, f.accessory_content, f.source_url, f.arquivo_url, "
+    "f.canonical_url, f.screenshot_url, f.category_id, f.extractor_id, "
+    "f.date_id, f.date_to_id, f.title, f.artist"
+)
+
+
+@dataclass
+class FactFilter:
+    """Filters for a facts query, every field is optional.
+
+    With both month and day set the query is an "on this day" lookup and
+    facts are matched against every day their interval covers, otherwise facts
+    are matched by their first day. Text is matched against the full text index
+    of titles, summaries, artists and songs, ignoring case and accents."""
+
+    month: int | None = None
+    day: int | None = None
+    start_year: int | None = None
+    end_year: int | None = None
+    category_id: str | None = None
+    extractor_id: str | None = None
+    text: str | None = None
+    limit: int | None = None
+
+
+class FactQueries:
+    def __init__(self, db: Database):
+        self.db = db
+
+    def on_this_day(self, month: int, day: int, **filters) -> list[dict]:
+        return list(self.find(FactFilter(month=month, day=day, **filters)))
+
+    def by_category(self, category_id: str, **filters) -> list[dict]:
+        return list(self.find(FactFilter(category_id=category_id, **filters)))
+
+    def by_extractor(self, extractor_id: str, **filters) -> list[dict]:
+        return list(self.find(FactFilter(extractor_id=extractor_id, **filters)))
+
+    def by_years(self, start_year: int, end_year: int, **filters) -> list[dict]:
+        return list(
+            self.find(FactFilter(start_year=start_year, end_year=end_year, **filters))
+        )
+
+    def search(self, text: str, **filters) -> list[dict]:
+        return list(self.find(FactFilter(text=text, **filters)))
+
+    def find(self, fact_filter: FactFilter) -> Iterator[dict]:
+        sql, params = build_query(fact_filter)
+        for record in self.db.query(sql, params):
+            yield decode_fact_record(record)
+
+
+def build_query(fact_filter: FactFilter) -> tuple[str, dict]:
+    conditions = []
+    params = {}
+
+    if fact_filter.month is not None and fact_filter.day is not None:
+        join = f"JOIN fact f ON {fact_covers_day('d.id')}"
+    else:
+        join = "JOIN fact f ON f.date_id = d.id"
+        # Bounds the fact side too, letting SQLite range scan its date indexes
+        if fact_filter.start_year is not None:
+            conditions.append(
+                "f.date_id >= (SELECT min(id) FROM date_dim WHERE year >= :start_year)"
+            )
+        if fact_filter.end_year is not None:
+            conditions.append(
+                "f.date_id <= (SELECT max(id) FROM date_dim WHERE year <= :end_year)"
+            )
+
+    for column, value in (
+        ("d.month", fact_filter.month),
+        ("d.day", fact_filter.day),
+        ("f.category_id", fact_filter.category_id),
+        ("f.extractor_id", fact_filter.extractor_id),
+    ):
+        if value is not None:
+            name = column.split(".")[1]
+            conditions.append(f"{column} = :{name}")
+            params[name] = value
+
+    # Text without any word to search for filters nothing out
+    if fact_filter.text and (text := fts_query(fact_filter.text)):
+        conditions.append(
+            "f.id IN (SELECT fact_id FROM fact_fts WHERE fact_fts MATCH :text)"
+        )
+        params["text"] = text
+
+    if fact_filter.start_year is not None:
+        conditions.append("d.year >= :start_year")
+        params["start_year"] = fact_filter.start_year
+    if fact_filter.end_year is not None:
+        conditions.append("d.year <= :end_year")
+        params["end_year"] = fact_filter.end_year
+
+    sql = f"SELECT d.year, d.month, d.day, {FACT_COLUMNS} FROM date_dim d {join}"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY d.id, f.category_id"
+    if fact_filter.limit is not None:
+        sql += " LIMIT :limit"
+        params["limit"] = fact_filter.limit
+
+    return sql, params
+
+
+def fts_query(text: str) -> str:
+    """Turns free text into an FTS5 query matching every word, a trailing `*`
+    on a word is kept as a prefix match. Words without letters or digits are
+    dropped, the tokenizer finds nothing to match in them, so text made only
+    of those gives an empty query."""
+    terms = []
+    for word in text.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if not any(char.isalnum() for char in word):
+            continue
+        word = word.replace('"', '""')
+        terms.append(f'"{word}"*' if prefix else f'"{word}"')
+    return " ".join(terms)
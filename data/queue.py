@@ -0,0 +1,246 @@
+import json
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Iterable
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS job (
+    id INTEGER PRIMARY KEY,
+    extractor TEXT NOT NULL,
+    url TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_expires_at REAL,
+    heartbeat_at REAL,
+    error TEXT,
+    UNIQUE (extractor, url, year, month, day)
+);
+
+CREATE INDEX IF NOT EXISTS job_status_idx ON job (status, lease_expires_at);
+
+CREATE TABLE IF NOT EXISTS job_fact (
+    id INTEGER PRIMARY KEY,
+    job_id INTEGER NOT NULL,
+    fact TEXT NOT NULL,
+    FOREIGN KEY (job_id) REFERENCES job(id)
+);
+"""
+
+
+class JobStatus:
+    PENDING = "pending"
+    LEASED = "leased"
+    DONE = "done"
+    FAILED = "failed"
+
+
+@dataclass
+class EnqueueStats:
+    new: int = 0
+    requeued: int = 0
+    # Units pending or leased by a run still in progress
+    skipped: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.new} new, {self.requeued} requeued, "
+            f"{self.skipped} already queued"
+        )
+
+
+@dataclass
+class JobUnit:
+    """One unit of extraction work, an extractor over one url for one month of
+    one year. Extractors without urls use an empty url and day 0 means the
+    whole month."""
+
+    extractor: str
+    url: str
+    year: int
+    month: int
+    day: int
+    id: int | None = None
+
+
+class JobQueue:
+    """Extraction units on a SQLite table shared by a coordinator and any
+    number of worker processes, on one machine or on a shared volume.
+
+    Workers lease a unit for `lease_seconds` and keep it through heartbeats,
+    units whose lease expires go back to other workers until `max_attempts`.
+
+    The queue keeps a rollback journal, WAL needs shared memory only
+    processes of one machine see. Across machines the volume must honour
+    POSIX file locks, as NFS with locking enabled does, and their clocks
+    must agree within a fraction of the lease."""
+
+    def __init__(self, path: str, lease_seconds: float = 300, max_attempts: int = 3):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode = DELETE")
+        self.conn.execute("PRAGMA synchronous = FULL")
+        self.conn.executescript(QUEUE_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def enqueue(self, units: Iterable[JobUnit]) -> EnqueueStats:
+        """Queues units, those done or failed in a previous run are queued
+        again with their attempts reset, those still pending or leased are
+        left as they are"""
+        stats = EnqueueStats()
+        with self.transaction():
+            for u in units:
+                key = [u.extractor, u.url, u.year, u.month, u.day]
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO job (extractor, url, year, month, day) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    key,
+                )
+                if cursor.rowcount == 1:
+                    stats.new += 1
+                    continue
+                cursor = self.conn.execute(
+                    "UPDATE job SET status = ?, worker = NULL, attempts = 0, "
+                    "lease_expires_at = NULL, heartbeat_at = NULL, error = NULL "
+                    "WHERE extractor = ? AND url = ? AND year = ? AND month = ? "
+                    "AND day = ? AND status IN (?, ?)",
+                    [JobStatus.PENDING, *key, JobStatus.DONE, JobStatus.FAILED],
+                )
+                if cursor.rowcount == 1:
+                    stats.requeued += 1
+                else:
+                    stats.skipped += 1
+        return stats
+
+    def lease(self, worker: str) -> JobUnit | None:
+        now = time.time()
+        with self.transaction():
+            row = self.conn.execute(
+                "UPDATE job SET status = :leased, worker = :worker, "
+                "attempts = attempts + 1, heartbeat_at = :now, "
+                "lease_expires_at = :now + :lease "
+                "WHERE id = ("
+                "  SELECT id FROM job WHERE attempts < :max_attempts AND ("
+                "    status = :pending "
+                "    OR (status = :leased AND lease_expires_at < :now)"
+                "  ) ORDER BY id LIMIT 1"
+                ") RETURNING id, extractor, url, year, month, day",
+                {
+                    "leased": JobStatus.LEASED,
+                    "pending": JobStatus.PENDING,
+                    "worker": worker,
+                    "now": now,
+                    "lease": self.lease_seconds,
+                    "max_attempts": self.max_attempts,
+                },
+            ).fetchone()
+        return JobUnit(**row) if row else None
+
+    def heartbeat(self, unit: JobUnit, worker: str) -> bool:
+        now = time.time()
+        cursor = self.conn.execute(
+            "UPDATE job SET heartbeat_at = ?, lease_expires_at = ? "
+            "WHERE id = ? AND worker = ? AND status = ?",
+            [now, now + self.lease_seconds, unit.id, worker, JobStatus.LEASED],
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, unit: JobUnit, worker: str, facts: Iterable[str]) -> bool:
+        """Stores the unit's facts, serialized as JSON, and marks it done. Does
+        nothing when the lease was lost to another worker meanwhile."""
+        with self.transaction():
+            cursor = self.conn.execute(
+                "UPDATE job SET status = ?, error = NULL "
+                "WHERE id = ? AND worker = ? AND status = ?",
+                [JobStatus.DONE, unit.id, worker, JobStatus.LEASED],
+            )
+            if cursor.rowcount != 1:
+                return False
+            self.conn.executemany(
+                "INSERT INTO job_fact (job_id, fact) VALUES (?, ?)",
+                ((unit.id, fact) for fact in facts),
+            )
+        return True
+
+    def fail(self, unit: JobUnit, worker: str, error: str):
+        self.conn.execute(
+            "UPDATE job SET "
+            "status = CASE WHEN attempts < ? THEN ? ELSE ? END, error = ? "
+            "WHERE id = ? AND worker = ? AND status = ?",
+            [
+                self.max_attempts,
+                JobStatus.PENDING,
+                JobStatus.FAILED,
+                error,
+                unit.id,
+                worker,
+                JobStatus.LEASED,
+            ],
+        )
+
+    def expire_exhausted(self) -> int:
+        """Marks as failed the units whose last allowed lease expired"""
+        cursor = self.conn.execute(
+            "UPDATE job SET status = ?, error = 'lease expired' "
+            "WHERE status = ? AND lease_expires_at < ? AND attempts >= ?",
+            [JobStatus.FAILED, JobStatus.LEASED, time.time(), self.max_attempts],
+        )
+        return cursor.rowcount
+
+    def take_facts(self, limit: int = 2000) -> tuple[int | None, list[dict]]:
+        rows = self.conn.execute(
+            "SELECT id, fact FROM job_fact ORDER BY id LIMIT ?", [limit]
+        ).fetchall()
+        if not rows:
+            return None, []
+        return rows[-1]["id"], [json.loads(row["fact"]) for row in rows]
+
+    def ack_facts(self, last_id: int):
+        self.conn.execute("DELETE FROM job_fact WHERE id <= ?", [last_id])
+
+    def counts(self) -> dict[str, int]:
+        return {
+            row["status"]: row["total"]
+            for row in self.conn.execute(
+                "SELECT status, count(*) AS total FROM job GROUP BY status"
+            )
+        }
+
+    def has_open_jobs(self) -> bool:
+        counts = self.counts()
+        return bool(counts.get(JobStatus.PENDING) or counts.get(JobStatus.LEASED))
+
+    def transaction(self):
+        return _Transaction(self.conn)
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE transaction, takes the write lock up front so concurrent
+    leases wait on the busy timeout instead of failing to upgrade"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
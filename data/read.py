@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import astuple, dataclass
+from queue import Queue
+from typing import Iterator
+
+from sqlite_utils import Database
+
+from data.db import SQLITE_READ_PROFILE, apply_profile
+from data.query import FactFilter, FactQueries
+
+logger = logging.getLogger(__name__)
+
+# Facts a response holds at most, lookups without a limit get this one
+MAX_RESPONSE_FACTS = 1000
+
+
+def connect_read_only(path: str) -> sqlite3.Connection:
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+
+
+class ReadPool:
+    """Read only connections to the facts database, each used by one thread
+    at a time. The writer keeps committing meanwhile, WAL readers do not
+    block it nor each other."""
+
+    def __init__(self, path: str, size: int = 4):
+        self.dbs: Queue[Database] = Queue()
+        for _ in range(size):
+            db = Database(connect_read_only(path), recursive_triggers=False)
+            apply_profile(db, SQLITE_READ_PROFILE)
+            self.dbs.put(db)
+        self.size = size
+
+    @contextmanager
+    def connection(self) -> Iterator[Database]:
+        db = self.dbs.get()
+        try:
+            yield db
+        finally:
+            self.dbs.put(db)
+
+    def close(self):
+        for _ in range(self.size):
+            self.dbs.get().close()
+
+
+@dataclass
+class CachedFacts:
+    etag: str
+    body: bytes
+    facts: int
+
+
+def fact_filter_from_query(query: dict[str, str]) -> FactFilter:
+    """The filter of a facts lookup from its query string, raising ValueError
+    on values that are not valid"""
+    numbers = {
+        name: int(query[name])
+        for name in ("month", "day", "start_year", "end_year", "limit")
+        if query.get(name)
+    }
+    if not 0 < numbers.get("month", 1) < 13 or not 0 < numbers.get("day", 1) < 32:
+        raise ValueError("Invalid month or day")
+    if not 0 < numbers.get("limit", 1) <= MAX_RESPONSE_FACTS:
+        raise ValueError(f"limit must be between 1 and {MAX_RESPONSE_FACTS}")
+    return FactFilter(
+        month=numbers.get("month"),
+        day=numbers.get("day"),
+        start_year=numbers.get("start_year"),
+        end_year=numbers.get("end_year"),
+        category_id=query.get("category") or None,
+        extractor_id=query.get("extractor") or None,
+        text=query.get("q") or None,
+        limit=numbers.get("limit", MAX_RESPONSE_FACTS),
+    )
+
+
+class FactReader:
+    """Answers fact lookups from a pool of read only connections, keeping the
+    responses of the most recent `cache_size` distinct lookups, mostly days.
+
+    The cache is emptied whenever the database changed since it was filled,
+    as told by `PRAGMA data_version` of a connection of its own, which moves
+    on every commit of another connection. Responses carry an ETag of their
+    body, for conditional requests."""
+
+    def __init__(self, path: str, pool_size: int = 4, cache_size: int = 512):
+        self.pool = ReadPool(path, pool_size)
+        self.watch = connect_read_only(path)
+        self.data_version = self.read_data_version()
+        self.cache: OrderedDict[tuple, CachedFacts] = OrderedDict()
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def read_data_version(self) -> int:
+        return self.watch.execute("PRAGMA data_version").fetchone()[0]
+
+    def invalidate_if_changed(self):
+        data_version = self.read_data_version()
+        if data_version != self.data_version:
+            self.data_version = data_version
+            if self.cache:
+                self.cache.clear()
+                self.invalidations += 1
+
+    async def find(self, fact_filter: FactFilter) -> CachedFacts:
+        self.invalidate_if_changed()
+        key = astuple(fact_filter)
+        if cached := self.cache.get(key):
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        data_version = self.data_version
+        cached = await asyncio.to_thread(self.query, fact_filter)
+        # A commit during the query may not be in its result
+        self.invalidate_if_changed()
+        if data_version == self.data_version and self.cache_size:
+            self.cache[key] = cached
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return cached
+
+    def query(self, fact_filter: FactFilter) -> CachedFacts:
+        with self.pool.connection() as db:
+            facts = list(FactQueries(db).find(fact_filter))
+        body = json.dumps(
+            {"facts": facts}, ensure_ascii=False, separators=(",", ":")
+        ).encode()
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        return CachedFacts(etag=etag, body=body, facts=len(facts))
+
+    def status(self) -> dict:
+        return {
+            "cached": len(self.cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "data_version": self.data_version,
+        }
+
+    def close(self):
+        self.pool.close()
+        self.watch.close()
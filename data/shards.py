@@ -0,0 +1,118 @@
+import json
+import logging
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+from sqlite_utils import Database
+
+from data.query import FactQueries
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+
+SHARD_FACT_FIELDS = ("title", "summary", "artist", "song")
+SHARD_LINK_FIELDS = ("more_link", "poster_image_link")
+
+
+@dataclass
+class ShardsResult:
+    days: int
+    watermark: str | None
+
+
+class DayShardBuilder:
+    """Writes one JSON document per calendar day, `MM-DD.json`, with the facts
+    of every year and category for that day.
+
+    A manifest keeps the newest fact timestamp seen, later builds only rewrite
+    the days covered by facts inserted or updated since then."""
+
+    def __init__(self, db: Database, output: Path):
+        self.db = db
+        self.output = output
+        self.queries = FactQueries(db)
+
+    def build(self, full: bool = False) -> ShardsResult:
+        self.output.mkdir(parents=True, exist_ok=True)
+        manifest = self.read_manifest()
+        watermark = self.db.execute(
+            "SELECT max(max(inserted_at), coalesce(max(updated_at), '')) FROM fact"
+        ).fetchone()[0]
+
+        if full or not manifest.get("watermark"):
+            days = self.all_days()
+        else:
+            days = self.touched_days(manifest["watermark"])
+
+        for month, day in days:
+            write_atomically(
+                self.output / f"{month:02d}-{day:02d}.json",
+                json.dumps(
+                    self.day_document(month, day),
+                    ensure_ascii=False,
+                    separators=(",", ":"),
+                ),
+            )
+        logger.info(f"Wrote {len(days)} day shards to {self.output}")
+
+        write_atomically(
+            self.output / MANIFEST_FILE, json.dumps({"watermark": watermark})
+        )
+        return ShardsResult(len(days), watermark)
+
+    def read_manifest(self) -> dict:
+        try:
+            with open(self.output / MANIFEST_FILE, "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+    def all_days(self) -> list[tuple[int, int]]:
+        return [
+            tuple(row)
+            for row in self.db.execute(
+                "SELECT DISTINCT month, day FROM date_dim ORDER BY month, day"
+            )
+        ]
+
+    def touched_days(self, watermark: str) -> list[tuple[int, int]]:
+        # Timestamps have second resolution, >= rewrites the watermark second
+        # again rather than missing facts written right after the last build
+        return [
+            tuple(row)
+            for row in self.db.execute(
+                "SELECT DISTINCT d.month, d.day FROM fact f "
+                "JOIN date_dim d ON d.id BETWEEN f.date_id AND f.date_to_id "
+                "WHERE f.inserted_at >= :watermark OR f.updated_at >= :watermark "
+                "ORDER BY d.month, d.day",
+                {"watermark": watermark},
+            )
+        ]
+
+    def day_document(self, month: int, day: int) -> dict:
+        years = {}
+        for fact in self.queries.on_this_day(month, day):
+            categories = years.setdefault(str(fact["year"]), {})
+            item = {
+                field: fact["content"][field]
+                for field in SHARD_FACT_FIELDS
+                if field in fact["content"]
+            }
+            for field in SHARD_LINK_FIELDS:
+                if fact["accessory_content"] and field in fact["accessory_content"]:
+                    item[field] = fact["accessory_content"][field]
+            item["arquivo_url"] = fact["arquivo_url"]
+            categories.setdefault(fact["category_id"], []).append(item)
+        return {"month": month, "day": day, "years": years}
+
+
+def write_atomically(path: Path, content: str):
+    with tempfile.NamedTemporaryFile(
+        "w", dir=path.parent, prefix=f".{path.name}.", delete=False
+    ) as file:
+        file.write(content)
+    os.chmod(file.name, 0o644)
+    os.replace(file.name, path)
@@ -1,19 +1,19 @@
-CREATE TABLE source_dim (
+CREATE TABLE IF NOT EXISTS source_dim (
     id TEXT PRIMARY KEY,
     name TEXT NOT NULL UNIQUE
 );
 
-CREATE TABLE location_dim (
+CREATE TABLE IF NOT EXISTS location_dim (
     id TEXT PRIMARY KEY,
     name TEXT NOT NULL UNIQUE
 );
 
-CREATE TABLE category_dim (
+CREATE TABLE IF NOT EXISTS category_dim (
     id TEXT PRIMARY KEY,
     name TEXT NOT NULL UNIQUE
 );
 
-CREATE TABLE date_dim (
+CREATE TABLE IF NOT EXISTS date_dim (
     id INTEGER PRIMARY KEY,
     year INTEGER NOT NULL,
     month INTEGER NOT NULL,
@@ -22,12 +22,12 @@ CREATE TABLE date_dim (
     UNIQUE (year, month, day)
 );
 
-CREATE TABLE extractor_dim (
+CREATE TABLE IF NOT EXISTS extractor_dim (
     id TEXT PRIMARY KEY,
     name TEXT NOT NULL UNIQUE
 );
 
-CREATE TABLE fact (
+CREATE TABLE IF NOT EXISTS fact (
     id TEXT PRIMARY KEY,
     content TEXT NOT NULL,
     accessory_content TEXT,
@@ -39,13 +39,17 @@ CREATE TABLE fact (
     updated_at DATETIME,
     version TEXT,
     date_id INTEGER NOT NULL,
+    date_to_id INTEGER NOT NULL,
     category_id TEXT NOT NULL,
     source_id TEXT NOT NULL,
     extractor_id TEXT NOT NULL,
     location_id TEXT,
+    title TEXT GENERATED ALWAYS AS (json_extract(content, '$.title')) VIRTUAL,
+    artist TEXT GENERATED ALWAYS AS (json_extract(content, '$.artist')) VIRTUAL,
     FOREIGN KEY (date_id) REFERENCES date_dim(id),
+    FOREIGN KEY (date_to_id) REFERENCES date_dim(id),
     FOREIGN KEY (category_id) REFERENCES category_dim(id),
     FOREIGN KEY (source_id) REFERENCES source_dim(id),
     FOREIGN KEY (location_id) REFERENCES location_dim(id),
     FOREIGN KEY (extractor_id) REFERENCES extractor_dim(id)
-);
\ No newline at end of file
+);
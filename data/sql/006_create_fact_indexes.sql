@@ -0,0 +1 @@
+CREATE INDEX IF NOT EXISTS fact_interval_idx ON fact (extractor_id, category_id, date_to_id);
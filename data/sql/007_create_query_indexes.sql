@@ -0,0 +1,5 @@
+CREATE INDEX IF NOT EXISTS date_dim_month_day_idx ON date_dim (month, day, year);
+CREATE INDEX IF NOT EXISTS fact_date_category_idx ON fact (date_id, category_id, date_to_id);
+CREATE INDEX IF NOT EXISTS fact_category_date_idx ON fact (category_id, date_id);
+CREATE INDEX IF NOT EXISTS fact_title_idx ON fact (title);
+CREATE INDEX IF NOT EXISTS fact_artist_idx ON fact (artist);
@@ -0,0 +1,19 @@
+CREATE VIRTUAL TABLE IF NOT EXISTS fact_fts USING fts5 (
+    fact_id UNINDEXED,
+    title,
+    summary,
+    artist,
+    song,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '3'
+);
+
+INSERT INTO fact_fts (fact_id, title, summary, artist, song)
+SELECT
+    id,
+    json_extract(content, '$.title'),
+    json_extract(content, '$.summary'),
+    json_extract(content, '$.artist'),
+    json_extract(content, '$.song')
+FROM fact
+WHERE NOT EXISTS (SELECT 1 FROM fact_fts);
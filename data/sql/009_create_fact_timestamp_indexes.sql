@@ -0,0 +1,2 @@
+CREATE INDEX IF NOT EXISTS fact_inserted_at_idx ON fact (inserted_at);
+CREATE INDEX IF NOT EXISTS fact_updated_at_idx ON fact (updated_at);
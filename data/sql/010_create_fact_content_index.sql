@@ -0,0 +1,2 @@
+CREATE INDEX IF NOT EXISTS fact_interval_content_idx
+ON fact (extractor_id, category_id, substr(content, 1, 64), date_to_id);
@@ -1,67 +1,789 @@
+from __future__ import annotations
+
 import datetime
+import json
+import logging
+from pathlib import Path
+from typing import TYPE_CHECKING
 
 import click
 
-from arquivo import *
 from core import *
-from data import *
-from extractor import setup_extractors
-from extractor.core import *
 
-setup_logs()
+# Commands import what they use when run, `--help` and a single extractor
+# run do not pay for the parsers, http clients and models of all of them
+if TYPE_CHECKING:
+    from arquivo import SamplingPolicy, VersionsBackend
+    from data import DesarquivoDb, FactReader, JobQueue, Repository
+    from extractor.core import ExtractionParams
+    from extractor.plan import ExtractionPlan
 
 logger = logging.getLogger(__name__)
 
+# The values of arquivo.VersionsBackend and the keys of extractor.html.PARSERS,
+# literal so that listing the choices imports neither
+VERSIONS_BACKENDS = ("textsearch", "cdx")
+PARSERS = ("pyquery", "selectolax")
 
-async def run(params: ExtractionParams, _db, _http_cache_db):
-    async with ArquivoClient(_http_cache_db) as arquivo_client:
-        arquivo = Arquivo(arquivo_client=arquivo_client)
-        repository = Repository(_db)
-        await ExtractionJob(arquivo, repository, params).run()
 
+async def run(
+    extractions: list[ExtractionParams],
+    repository: Repository,
+    _http_cache_db,
+    versions_backend: VersionsBackend,
+    sampling: SamplingPolicy,
+    retry_dead_ends: bool,
+    hedge: bool,
+):
+    from arquivo import Arquivo, ArquivoClient, Hedging, NegativeCache
+    from extractor.core import ExtractionJob
+
+    negative_cache = NegativeCache(_http_cache_db, skip=not retry_dead_ends)
+    async with ArquivoClient(
+        _http_cache_db, hedging=Hedging() if hedge else None
+    ) as arquivo_client:
+        arquivo = Arquivo(
+            arquivo_client=arquivo_client,
+            versions_backend=versions_backend,
+            sampling=sampling,
+            negative_cache=negative_cache,
+        )
+        for params in extractions:
+            await ExtractionJob(arquivo, repository, params).run()
+    logger.info(f"Negative cache: {negative_cache}")
 
-@click.command()
-@click.option("-d", "--day", type=int, callback=validate_day)
-@click.option("-m", "--month", type=int, required=True, callback=validate_month)
+
+async def run_local(
+    extractions: list[ExtractionParams],
+    repository: Repository,
+    cdx_dir: Path,
+    warc_dir: Path,
+    sampling: SamplingPolicy,
+):
+    from arquivo.local import LocalArquivo
+    from extractor.core import ExtractionJob
+
+    async with LocalArquivo(cdx_dir, warc_dir, sampling) as arquivo:
+        for params in extractions:
+            await ExtractionJob(arquivo, repository, params).run()
+
+
+@click.group(cls=DefaultCommandGroup, default_command="extract")
+def cli():
+    """Extracts facts for past days from arquivo.pt and other sources
+    saving them on a facts database."""
+    setup_logs()
+
+
+def extraction_options(command):
+    """Options selecting what to extract, shared by the extraction commands"""
+    options = [
+        click.option("-d", "--day", type=int, callback=validate_day),
+        click.option("-m", "--month", type=int, required=True, callback=validate_month),
+        click.option(
+            "-sy",
+            "--start-year",
+            type=int,
+            default=lambda: datetime.date.today().year - 20,
+        ),
+        click.option(
+            "-ey",
+            "--end-year",
+            type=int,
+            default=lambda: datetime.date.today().year - 1,
+        ),
+        click.option(
+            "-e",
+            "--extractor",
+            multiple=True,
+            default=None,
+            help="The extractor class names to include",
+        ),
+    ]
+    for option in reversed(options):
+        command = option(command)
+    return command
+
+
+def select_parser(ctx, param, value: str) -> str:
+    if value == "selectolax":
+        try:
+            import selectolax
+        except ImportError:
+            raise click.BadParameter(
+                "selectolax is not installed, install it with "
+                "`poetry install --extras fast-html`"
+            )
+    from extractor.html import use_parser
+
+    use_parser(value)
+    return value
+
+
+parser_option = click.option(
+    "--parser",
+    type=click.Choice(PARSERS),
+    default="pyquery",
+    callback=select_parser,
+    help="The HTML parser used by the layouts",
+)
+
+
+def parse_year_weights(ctx, param, values: tuple[str, ...]) -> dict[int, float]:
+    try:
+        return {
+            int(year): float(weight)
+            for year, weight in (value.split("=") for value in values)
+        }
+    except ValueError:
+        raise click.BadParameter("Expected YEAR=WEIGHT, e.g. 2008=2")
+
+
+def select_sampling(ctx, param, value: str) -> SamplingPolicy:
+    from arquivo import parse_sampling
+
+    try:
+        return parse_sampling(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+sampling_option = click.option(
+    "--sampling",
+    default="hourly",
+    callback=select_sampling,
+    help="The captures of each day replayed: hourly, per-day:N, "
+    "closest:HH:MM (UTC) or distinct-digest",
+)
+
+hedge_option = click.option(
+    "--hedge",
+    is_flag=True,
+    help="Sends a duplicate of replay requests slower than 95% of the recent "
+    "ones, the first response is used",
+)
+
+bulk_load_option = click.option(
+    "--bulk-load",
+    is_flag=True,
+    help="For first time backfills, defers query and full text indexes to "
+    "the end and relaxes journaling, a crash can corrupt the database",
+)
+
+
+@cli.command()
+@extraction_options
+@parser_option
+@sampling_option
+@hedge_option
+@bulk_load_option
+@click.option("--recreate-db/--no-recreate-db'", default=False)
 @click.option(
-    "-sy", "--start-year", type=int, default=lambda: datetime.date.today().year - 20
+    "--local-archive",
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+    help="Folder with CDX/CDXJ indexes to read captures from instead of arquivo.pt",
 )
 @click.option(
-    "-ey", "--end-year", type=int, default=lambda: datetime.date.today().year - 1
+    "--warc-dir",
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+    help="Folder with the WARC files of the local indexes",
 )
-@click.option("--recreate-db/--no-recreate-db'", default=False)
 @click.option(
-    "-e",
-    "--extractor",
+    "--versions-backend",
+    type=click.Choice(VERSIONS_BACKENDS),
+    default=VERSIONS_BACKENDS[0],
+    help="The arquivo.pt API used to list the versions of an url",
+)
+@click.option(
+    "--plan",
+    is_flag=True,
+    help="Only estimates the requests, bytes and time the extraction needs",
+)
+@click.option(
+    "--retry-dead-ends",
+    is_flag=True,
+    help="Fetches again the captures known to fail or produce no facts",
+)
+@click.option(
+    "--gaps",
+    is_flag=True,
+    help="Only extracts the days each extractor has no facts for",
+)
+@click.option(
+    "-c", "--category", help="With --gaps, the category whose gaps are extracted"
+)
+@click.option(
+    "--year-weight",
     multiple=True,
-    default=None,
-    help="The extractor class names to include",
+    callback=parse_year_weights,
+    help="With --gaps, YEAR=WEIGHT, gaps of heavier years go first, "
+    "then the most recent ones. Can be repeated",
 )
-def cli(
+@click.option(
+    "--max-days", type=int, help="With --gaps, the most wanted days per extractor"
+)
+def extract(
     day: int | None,
     month: int,
     start_year: int | None,
     end_year: int | None,
     recreate_db: bool,
     extractor: list[str],
+    local_archive: Path | None,
+    warc_dir: Path | None,
+    versions_backend: str,
+    plan: bool,
+    parser: str,
+    sampling: SamplingPolicy,
+    bulk_load: bool,
+    gaps: bool,
+    category: str | None,
+    year_weight: dict[int, float],
+    max_days: int | None,
+    retry_dead_ends: bool,
+    hedge: bool,
 ):
-    """Extracts facts for past days from arquivo.pt and other sources
-    saving them on a facts database."""
+    """Extracts facts for past days into the facts database (default command)."""
+
+    import asyncio
+
+    from arquivo import VersionsBackend
+    from data import DesarquivoDb, HttpCacheDb, Repository
+    from extractor import select_extractors
+    from extractor.core import ExtractionParams
 
     if day and month:
         validate_day_month(day, month)
 
-    with DesarquivoDb(recreate_db) as _db, HttpCacheDb(False) as _http_cache_db:
-        all_extractors = setup_extractors()
-        if extractor is not None:
-            all_extractors = [
-                _extractor
-                for _extractor in all_extractors
-                if _extractor.__name__ in extractor
-            ]
-
+    recreate_db = recreate_db and not plan
+    bulk_load = bulk_load and not plan
+    with DesarquivoDb(recreate_db, bulk_load=bulk_load) as _db, HttpCacheDb(
+        False
+    ) as _http_cache_db:
+        all_extractors = select_extractors(extractor)
         params = ExtractionParams(month, day, start_year, end_year, all_extractors)
-        asyncio.run(run(params, _db, _http_cache_db))
+        repository = Repository(_db, index_fts=not bulk_load)
+        extractions = [params]
+        if gaps:
+            from extractor.gaps import gap_extractions
+
+            extractions = gap_extractions(
+                repository, params, category, year_weight, max_days
+            )
+        if plan:
+            from extractor.plan import ExtractionPlan, ExtractionPlanner
+
+            planner = ExtractionPlanner(
+                repository,
+                _http_cache_db,
+                VersionsBackend(versions_backend),
+                sampling,
+            )
+            print_plan(
+                ExtractionPlan(
+                    [
+                        extractor_plan
+                        for extraction in extractions
+                        for extractor_plan in planner.plan(extraction).extractors
+                    ]
+                )
+            )
+        elif local_archive is not None:
+            asyncio.run(
+                run_local(extractions, repository, local_archive, warc_dir, sampling)
+            )
+        else:
+            asyncio.run(
+                run(
+                    extractions,
+                    repository,
+                    _http_cache_db,
+                    VersionsBackend(versions_backend),
+                    sampling,
+                    retry_dead_ends,
+                    hedge,
+                )
+            )
+
+
+def print_plan(plan: ExtractionPlan):
+    for p in plan.extractors:
+        estimated = " (estimated)" if p.estimated else ""
+        click.echo(
+            f"{p.extractor}: {p.listings} version listings "
+            f"({p.listings_cached} seen in cache), replays "
+            f"{p.replays_cached} cached / {p.replays_network} network{estimated}, "
+            f"{p.api_requests} api requests, "
+            f"{p.days_with_facts}/{p.days} days with facts"
+        )
+    click.echo(
+        f"Total: {plan.cached_requests} cache hits, "
+        f"{plan.network_requests} network requests, "
+        f"~{plan.network_bytes / 1_000_000:.1f} MB, "
+        f"ETA ~{datetime.timedelta(seconds=round(plan.seconds))}"
+    )
+
+
+@cli.command()
+@click.option("-d", "--day", type=int, callback=validate_day)
+@click.option("-m", "--month", type=int, callback=validate_month)
+@click.option("-sy", "--start-year", type=int)
+@click.option("-ey", "--end-year", type=int)
+@click.option("-c", "--category", help="The category id to include")
+@click.option("-e", "--extractor", help="The extractor id to include")
+@click.option("-q", "--text", help="Keywords to search in the facts")
+@click.option("-l", "--limit", type=int)
+def query(
+    day: int | None,
+    month: int | None,
+    start_year: int | None,
+    end_year: int | None,
+    category: str | None,
+    extractor: str | None,
+    text: str | None,
+    limit: int | None,
+):
+    """Queries the facts database printing one JSON fact per line."""
+
+    from data import DesarquivoDb, FactFilter, FactQueries
+
+    if day and month:
+        validate_day_month(day, month)
+
+    fact_filter = FactFilter(
+        month=month,
+        day=day,
+        start_year=start_year,
+        end_year=end_year,
+        category_id=category,
+        extractor_id=extractor,
+        text=text,
+        limit=limit,
+    )
+    with DesarquivoDb(False) as _db:
+        for fact in FactQueries(_db).find(fact_filter):
+            click.echo(json.dumps(fact, ensure_ascii=False))
+
+
+@cli.command()
+@click.argument("output", type=click.Path(file_okay=False, path_type=Path))
+@click.option("--chunk-size", type=int, default=50_000)
+def export(output: Path, chunk_size: int):
+    """Exports the facts, joined with their dimensions, to a Parquet dataset
+    partitioned by year and category."""
+
+    from data import DesarquivoDb
+
+    try:
+        from data.export import ParquetExporter
+    except ImportError:
+        raise click.ClickException(
+            "Parquet export requires pyarrow, install it with "
+            "`poetry install --extras export`"
+        )
+
+    with DesarquivoDb(False) as _db:
+        result = ParquetExporter(_db, output, chunk_size).export()
+
+    rate = result.rows / max(result.seconds, 1e-6)
+    click.echo(
+        f"Exported {result.rows} facts to {result.files} files "
+        f"in {result.seconds:.1f}s ({rate:.0f} facts/s)"
+    )
+
+
+@cli.command()
+@click.argument("output", type=click.Path(file_okay=False, path_type=Path))
+@click.option("--full/--incremental", default=False)
+def shards(output: Path, full: bool):
+    """Writes one JSON document per calendar day with the facts of every year,
+    rewriting only the days touched since the previous build."""
+
+    from data import DayShardBuilder, DesarquivoDb
+
+    with DesarquivoDb(False) as _db:
+        result = DayShardBuilder(_db, output).build(full)
+
+    click.echo(f"Wrote {result.days} day shards to {output}")
+
+
+@cli.command()
+@extraction_options
+@click.option("--queue", default="db_files/jobs.db", help="The job queue database")
+@click.option("--lease", type=float, default=300, help="Seconds a unit is leased for")
+@bulk_load_option
+def coordinator(
+    day: int | None,
+    month: int,
+    start_year: int | None,
+    end_year: int | None,
+    extractor: list[str],
+    queue: str,
+    lease: float,
+    bulk_load: bool,
+):
+    """Queues an extraction for `desarquivo worker` processes and writes the
+    facts they produce into the facts database."""
+
+    from data import DesarquivoDb, JobQueue, Repository
+    from extractor import select_extractors
+    from extractor.core import ExtractionParams
+    from extractor.worker import Coordinator
+
+    if day and month:
+        validate_day_month(day, month)
+
+    params = ExtractionParams(
+        month, day, start_year, end_year, select_extractors(extractor)
+    )
+    with DesarquivoDb(False, bulk_load=bulk_load) as _db, JobQueue(
+        queue, lease_seconds=lease
+    ) as _queue:
+        repository = Repository(_db, index_fts=not bulk_load)
+        counts = Coordinator(_queue, repository, params).run()
+
+    click.echo(f"Extraction finished: {counts}")
+
+
+async def run_worker(
+    _queue: JobQueue,
+    _db,
+    _http_cache_db,
+    worker_id: str | None,
+    versions_backend: VersionsBackend,
+    sampling: SamplingPolicy,
+    retry_dead_ends: bool,
+    hedge: bool,
+):
+    from arquivo import Arquivo, ArquivoClient, Hedging, NegativeCache
+    from data import Repository
+    from extractor import setup_extractors
+    from extractor.worker import Worker
+
+    async with ArquivoClient(
+        _http_cache_db, hedging=Hedging() if hedge else None
+    ) as arquivo_client:
+        arquivo = Arquivo(
+            arquivo_client=arquivo_client,
+            versions_backend=versions_backend,
+            sampling=sampling,
+            negative_cache=NegativeCache(_http_cache_db, skip=not retry_dead_ends),
+        )
+        repository = Repository(_db)
+        await Worker(_queue, arquivo, repository, setup_extractors(), worker_id).run()
+
+
+@cli.command()
+@click.option("--queue", default="db_files/jobs.db", help="The job queue database")
+@click.option("--lease", type=float, default=300, help="Seconds a unit is leased for")
+@click.option("--worker-id", help="Defaults to hostname:pid")
+@click.option(
+    "--db",
+    default="db_files/facts.db",
+    help="A facts database on a local disk, workers only read its dimensions",
+)
+@click.option(
+    "--http-cache",
+    default="db_files/http_requests.db",
+    help="The HTTP cache database, on a local disk",
+)
+@click.option(
+    "--versions-backend",
+    type=click.Choice(VERSIONS_BACKENDS),
+    default=VERSIONS_BACKENDS[0],
+    help="The arquivo.pt API used to list the versions of an url",
+)
+@click.option(
+    "--retry-dead-ends",
+    is_flag=True,
+    help="Fetches again the captures known to fail or produce no facts",
+)
+@parser_option
+@sampling_option
+@hedge_option
+def worker(
+    queue: str,
+    lease: float,
+    worker_id: str | None,
+    db: str,
+    http_cache: str,
+    versions_backend: str,
+    retry_dead_ends: bool,
+    parser: str,
+    sampling: SamplingPolicy,
+    hedge: bool,
+):
+    """Runs extraction units queued by `desarquivo coordinator` until none is
+    left, start as many as wanted. Workers of other machines share only the
+    queue database, see `JobQueue`, and keep their own facts database and
+    HTTP cache."""
+
+    import asyncio
+
+    from arquivo import VersionsBackend
+    from data import DesarquivoDb, HttpCacheDb, JobQueue
+
+    with DesarquivoDb(False, path=db) as _db, HttpCacheDb(
+        False, path=http_cache
+    ) as _http_cache_db, JobQueue(queue, lease_seconds=lease) as _queue:
+        asyncio.run(
+            run_worker(
+                _queue,
+                _db,
+                _http_cache_db,
+                worker_id,
+                VersionsBackend(versions_backend),
+                sampling,
+                retry_dead_ends,
+                hedge,
+            )
+        )
+
+
+def parse_times(ctx, param, values: tuple[str, ...]) -> list[datetime.time]:
+    try:
+        return [datetime.time.fromisoformat(value) for value in values]
+    except ValueError as e:
+        raise click.BadParameter(f"Expected HH:MM times: {e}")
+
+
+async def serve_scheduler(
+    desarquivo_db: DesarquivoDb,
+    _http_cache_db,
+    extractors: list,
+    times: list[datetime.time],
+    years: int,
+    jitter: float,
+    max_concurrent: int,
+    host: str,
+    port: int,
+    run_now: bool,
+    versions_backend: VersionsBackend,
+    sampling: SamplingPolicy,
+    hedge: bool,
+):
+    import asyncio
+    import os
+    import signal
+
+    from arquivo import Arquivo, ArquivoClient, Hedging, NegativeCache
+    from core.httpd import Request, json_response, not_found, start_server
+    from data import Repository
+    from extractor.scheduler import Scheduler
+    from extractor.tmdb import TMDBClient, TMDBV1
+
+    async with ArquivoClient(
+        _http_cache_db, hedging=Hedging() if hedge else None
+    ) as arquivo_client:
+        if tmdb_key := os.environ.get("TMDB_KEY"):
+            TMDBV1.shared_client = TMDBClient(api_key=tmdb_key)
+        scheduler = Scheduler(
+            Arquivo(
+                arquivo_client=arquivo_client,
+                versions_backend=versions_backend,
+                sampling=sampling,
+                negative_cache=NegativeCache(_http_cache_db),
+            ),
+            Repository(desarquivo_db.db),
+            extractors,
+            times,
+            years=years,
+            jitter=jitter,
+            max_concurrent=max_concurrent,
+            refresh=desarquivo_db.run_scripts,
+        )
+
+        async def handle(request: Request):
+            if request.path == "/health":
+                return json_response({"status": "ok"})
+            if request.path == "/status":
+                return json_response(scheduler.status())
+            return not_found()
+
+        server = await start_server(handle, host, port)
+        serving = asyncio.create_task(scheduler.serve(run_now))
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, serving.cancel)
+        try:
+            await serving
+        except asyncio.CancelledError:
+            logger.info("Scheduler stopped")
+        finally:
+            server.close()
+            await server.wait_closed()
+            if TMDBV1.shared_client is not None:
+                await TMDBV1.shared_client.close()
+                TMDBV1.shared_client = None
+
+
+@cli.command("serve-scheduler")
+@click.option(
+    "-e",
+    "--extractor",
+    multiple=True,
+    default=None,
+    help="The extractor class names to include",
+)
+@click.option(
+    "--at",
+    "times",
+    multiple=True,
+    default=["03:00"],
+    callback=parse_times,
+    help="Local HH:MM time of a daily extraction, can be repeated",
+)
+@click.option("--years", type=int, default=20, help="Past years extracted each day")
+@click.option(
+    "--jitter", type=float, default=300, help="Maximum random delay of a run, seconds"
+)
+@click.option(
+    "--max-concurrent", type=int, default=2, help="Extractors running at once"
+)
+@click.option("--host", default="127.0.0.1", help="Address of the status endpoint")
+@click.option("--port", type=int, default=8765, help="Port of the status endpoint")
+@click.option("--run-now", is_flag=True, help="Also extracts today when starting")
+@click.option(
+    "--versions-backend",
+    type=click.Choice(VERSIONS_BACKENDS),
+    default=VERSIONS_BACKENDS[0],
+    help="The arquivo.pt API used to list the versions of an url",
+)
+@parser_option
+@sampling_option
+@hedge_option
+def serve_scheduler_command(
+    extractor: list[str],
+    times: list[datetime.time],
+    years: int,
+    jitter: float,
+    max_concurrent: int,
+    host: str,
+    port: int,
+    run_now: bool,
+    versions_backend: str,
+    parser: str,
+    sampling: SamplingPolicy,
+    hedge: bool,
+):
+    """Runs as a daemon extracting the facts of the current day on a daily
+    calendar, keeping clients, caches and databases open between runs and
+    serving /health and /status on a local port."""
+
+    import asyncio
+
+    from arquivo import VersionsBackend
+    from data import DesarquivoDb, HttpCacheDb
+    from extractor import select_extractors
+
+    desarquivo_db = DesarquivoDb(False)
+    with desarquivo_db, HttpCacheDb(False) as _http_cache_db:
+        asyncio.run(
+            serve_scheduler(
+                desarquivo_db,
+                _http_cache_db,
+                select_extractors(extractor),
+                times,
+                years,
+                jitter,
+                max_concurrent,
+                host,
+                port,
+                run_now,
+                VersionsBackend(versions_backend),
+                sampling,
+                hedge,
+            )
+        )
+
+
+def facts_handler(reader: FactReader):
+    """Routes the requests of the facts service"""
+    from core.httpd import Request, Response, json_response, not_found
+    from data import fact_filter_from_query
+
+    async def handle(request: Request) -> Response:
+        if request.path == "/health":
+            return json_response({"status": "ok"})
+        if request.path == "/status":
+            return json_response(reader.status())
+        if request.path != "/facts":
+            return not_found()
+
+        try:
+            fact_filter = fact_filter_from_query(request.query)
+        except ValueError as e:
+            return json_response({"error": str(e)}, status=400)
+        facts = await reader.find(fact_filter)
+        headers = {
+            "Content-Type": "application/json; charset=utf-8",
+            "ETag": facts.etag,
+            "Cache-Control": "no-cache",
+        }
+        if request.headers.get("if-none-match") == facts.etag:
+            return Response(status=304, headers=headers)
+        return Response(body=facts.body, headers=headers)
+
+    return handle
+
+
+async def serve_facts(reader: FactReader, host: str, port: int):
+    import asyncio
+    import signal
+
+    from core.httpd import start_server
+
+    server = await start_server(facts_handler(reader), host, port)
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopped.set)
+    await stopped.wait()
+    server.close()
+    await server.wait_closed()
+
+
+@cli.command()
+@click.option("--db", default="db_files/facts.db", help="The facts database")
+@click.option("--host", default="127.0.0.1")
+@click.option("--port", type=int, default=8766)
+@click.option("--pool-size", type=int, default=4, help="Read only connections")
+@click.option("--cache-size", type=int, default=512, help="Lookups kept in memory")
+def serve(db: str, host: str, port: int, pool_size: int, cache_size: int):
+    """Serves fact lookups over HTTP, `/facts` takes the `query` filters as
+    month, day, start_year, end_year, category, extractor, q and limit."""
+
+    import asyncio
+
+    from data import FactReader
+
+    reader = FactReader(db, pool_size=pool_size, cache_size=cache_size)
+    try:
+        asyncio.run(serve_facts(reader, host, port))
+    finally:
+        reader.close()
+
+
+@cli.command()
+@click.argument(
+    "sources", nargs=-1, required=True, type=click.Path(exists=True, path_type=Path)
+)
+@click.option("--into", default="db_files/facts.db", help="The database merged into")
+def merge(sources: tuple[Path, ...], into: str):
+    """Merges other facts databases into one, deduplicating facts."""
+
+    from data import DesarquivoDb
+    from data.merge import FactsMerger
+
+    with DesarquivoDb(False, path=into) as _db:
+        merger = FactsMerger(_db)
+        for source in sources:
+            result = merger.merge(source)
+            click.echo(
+                f"{source}: {result.facts} facts, {result.new_facts} new, "
+                f"{result.folded} folded, "
+                f"{result.seconds:.1f}s ({result.rate:.0f} facts/s)"
+            )
 
 
 if __name__ == "__main__":
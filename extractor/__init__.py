@@ -1,17 +1,48 @@
-from .core import *
-from .radio_comercial import *
-from .rtp import *
-from .publico import *
-from .tmdb import *
-from .record import *
-from .ojogo import *
-
-
-def setup_extractors():
-    def get_subclasses(cls):
-        for subclass in cls.__subclasses__():
-            yield from get_subclasses(subclass)
-            yield subclass
-
-    all_subclasses = get_subclasses(Extractor)
-    return list(all_subclasses)
+import importlib
+import logging
+from typing import Iterable
+
+logger = logging.getLogger(__name__)
+
+# Extractor class names and the modules defining them. Modules are imported
+# only when their extractor is selected, each pulls its parser and clients
+EXTRACTORS = {
+    "RadioComercialV1": "radio_comercial",
+    "RTPV1": "rtp",
+    "PublicoV1": "publico",
+    "TMDBV1": "tmdb",
+    "RecordV1": "record",
+    "OJOGOV1": "ojogo",
+}
+
+
+def load_extractor(name: str) -> type:
+    module = importlib.import_module(f"{__name__}.{EXTRACTORS[name]}")
+    return getattr(module, name)
+
+
+def layout_plans() -> list:
+    """The layout plans of every extractor module, to run them over saved
+    pages"""
+    from extractor.layout import LayoutPlan
+
+    return [
+        plan
+        for module in dict.fromkeys(EXTRACTORS.values())
+        for plan in vars(importlib.import_module(f"{__name__}.{module}")).values()
+        if isinstance(plan, LayoutPlan)
+    ]
+
+
+def setup_extractors() -> list:
+    return [load_extractor(name) for name in EXTRACTORS]
+
+
+def select_extractors(names: Iterable[str]) -> list:
+    """The extractor classes with the given class names, all when none given"""
+    if not names:
+        return setup_extractors()
+    for name in names:
+        if name not in EXTRACTORS:
+            logger.warning(f"Unknown extractor {name}, known are {list(EXTRACTORS)}")
+    return [load_extractor(name) for name in EXTRACTORS if name in names]
@@ -1,27 +1,55 @@
+import datetime
 import sys
 from abc import ABC
-from typing import Generator
+from typing import AsyncGenerator, Callable, Generator, Iterable
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import logging
 
 from pydantic import BaseModel
 
-from arquivo import Arquivo, VersionEntry
-from data import Repository, Fact, ExtractorDim
+from arquivo import (
+    Arquivo,
+    ArchivedURL,
+    FailureKind,
+    ReplayFailure,
+    VersionEntry,
+)
+from data import Repository, Fact, DateDim, ExtractorDim, InsertStats
 
 logger = logging.getLogger(__name__)
 
 
 @dataclass
 class ExtractionParams:
-    """Params for an extraction job"""
+    """Params for an extraction job.
+
+    With `days` the extraction is limited to those days, the gaps found in
+    the facts, given most wanted first."""
 
     month: int
     day: int | None
     start_year: int
     end_year: int
     extractors: list
+    days: list[datetime.date] | None = None
+    day_set: frozenset[datetime.date] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.day_set = frozenset(self.days or ())
+
+    def wants(self, dt: datetime.datetime) -> bool:
+        """Whether a capture taken at `dt` is of a day extracted"""
+        if dt.month != self.month or (self.day is not None and dt.day != self.day):
+            return False
+        return self.days is None or dt.date() in self.day_set
+
+    def years(self) -> list[int]:
+        """The years extracted, those of the gaps in the order of their most
+        wanted day"""
+        if self.days is not None:
+            return list(dict.fromkeys(day.year for day in self.days))
+        return list(range(self.start_year, self.end_year + 1))
 
 
 class Extractor(ABC):
@@ -41,7 +69,70 @@ class Extractor(ABC):
     async def extract(self) -> Generator[Fact, None, None]:
         raise NotImplementedError("Abstract Method")
 
-    def extractor_specification(self) -> ExtractorDim:
+    async def replayed_facts(
+        self,
+        version: VersionEntry,
+        read_facts: Callable[[VersionEntry, ArchivedURL, DateDim], Iterable[Fact]],
+    ) -> AsyncGenerator[Fact, None]:
+        """The facts read from the replay of a capture.
+
+        Captures of days missing from the date dimension are not fetched,
+        `read_facts` is given the date of the others.
+        Replays known to produce no facts for this extractor are skipped,
+        those that fail or produce none are remembered in the negative cache
+        of the archive, when it has one."""
+        dt = version.dt
+        date_dim = self.repository.fetch_date(dt.year, dt.month, dt.day)
+        if not date_dim:
+            return
+
+        negative_cache = self.arquivo.negative_cache
+        key = (version.originalURL, version.tstamp, self.extractor_dim.id)
+        if negative_cache and negative_cache.is_dead_end(*key):
+            return
+
+        replay = await self.arquivo.fetch_replay(version)
+        if isinstance(replay, ReplayFailure):
+            failure, facts = replay, []
+        else:
+            facts = list(read_facts(version, replay, date_dim))
+            failure = None if facts else ReplayFailure(FailureKind.EMPTY)
+
+        if negative_cache and failure:
+            negative_cache.record(*key, failure)
+        elif negative_cache:
+            negative_cache.forget(*key)
+        for fact in facts:
+            yield fact
+
+    @classmethod
+    def versions_windows(
+        cls,
+        params: ExtractionParams,
+        urls: list["ExtractionTargetURL"] | None = None,
+    ) -> list[tuple[str, str, str]]:
+        """The (url, since, until) version histories an extraction lists, one
+        per year for each of the urls applicable that year. Extractors pass
+        their own `urls`, which a worker narrows to the url of its unit, the
+        planner lists those of the class."""
+        if urls is None:
+            urls = getattr(cls, "urls", [])
+        return [
+            (url.value, str(year), str(year))
+            for year in params.years()
+            for url in urls
+            if url.applicable(year)
+        ]
+
+    @classmethod
+    def api_requests(cls, params: ExtractionParams) -> int:
+        """Requests made to other services than arquivo.pt by an extraction"""
+        return 0
+
+    @classmethod
+    def extractor_specification(cls) -> ExtractorDim:
+        """The extractor dimension row, read without an instance by the plans
+        that must not register it"""
         raise NotImplementedError("Abstract Method")
 
 
@@ -53,7 +144,7 @@ class ExtractionJob:
         self.repo = repo
         self.arquivo = arquivo
 
-    async def run(self):
+    async def run(self) -> InsertStats:
         logger.info(f"Extracting facts for {self.params}")
 
         extractors = (
@@ -61,15 +152,20 @@ class ExtractionJob:
             for extractor_cls in self.params.extractors
         )
 
+        total = InsertStats()
         for extractor in extractors:
             facts = []
+            stats = InsertStats()
             async for fact in extractor.extract():
                 facts.append(fact)
                 if len(facts) >= 2000:
-                    self.repo.insert_facts(facts)
+                    stats += self.repo.insert_facts(facts)
                     facts = []
 
-            self.repo.insert_facts(facts)
+            stats += self.repo.insert_facts(facts)
+            logger.info(f"{extractor.__class__.__name__} facts: {stats}")
+            total += stats
+        return total
 
 
 @dataclass
@@ -115,4 +211,4 @@ def arquivo_fact_builder(
         "source_id": source,
         "extractor_id": extractor_id,
     }
-    return Fact(**data)
+    return Fact.build(**data)
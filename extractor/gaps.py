@@ -0,0 +1,60 @@
+import datetime
+import logging
+from typing import Iterable
+
+from data import Repository
+from extractor.core import ExtractionParams
+
+logger = logging.getLogger(__name__)
+
+
+def prioritize_days(
+    days: Iterable[datetime.date], year_weights: dict[int, float] | None = None
+) -> list[datetime.date]:
+    """Days by the weight of their year, 1 unless given, then most recent
+    first"""
+    year_weights = year_weights or {}
+    return sorted(
+        days, key=lambda day: (-year_weights.get(day.year, 1), -day.toordinal())
+    )
+
+
+def gap_extractions(
+    repository: Repository,
+    params: ExtractionParams,
+    category_id: str | None = None,
+    year_weights: dict[int, float] | None = None,
+    max_days: int | None = None,
+) -> list[ExtractionParams]:
+    """One extraction per extractor limited to the days of `params` it has no
+    facts for, the `max_days` most wanted of them when given. Extractors
+    without gaps are left out."""
+    extractions = []
+    for extractor_cls in params.extractors:
+        missing = repository.fetch_missing_days(
+            extractor_cls.extractor_specification().id,
+            params.month,
+            params.day,
+            params.start_year,
+            params.end_year,
+            category_id,
+        )
+        days = prioritize_days(
+            (datetime.date(d.year, d.month, d.day) for d in missing), year_weights
+        )[:max_days]
+        logger.info(
+            f"{extractor_cls.__name__}: {len(missing)} days without facts, "
+            f"extracting {len(days)}"
+        )
+        if days:
+            extractions.append(
+                ExtractionParams(
+                    params.month,
+                    params.day,
+                    params.start_year,
+                    params.end_year,
+                    [extractor_cls],
+                    days,
+                )
+            )
+    return extractions
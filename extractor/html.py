@@ -0,0 +1,299 @@
+import functools
+import logging
+import re
+from typing import Iterator
+
+from lxml import etree
+from pyquery import PyQuery
+from pyquery.cssselectpatch import JQueryTranslator
+
+logger = logging.getLogger(__name__)
+
+COMBINATORS = re.compile(r"[\s>+~,](?![^(\[]*[)\]])")
+
+TRANSLATOR = JQueryTranslator(xhtml=False)
+
+# Text is extracted as `PyQuery.text()` does, pyquery.text is followed here
+# for both parsers rather than reaching into its private helpers. Blocks are
+# marked by None and line breaks by True in the text arrays
+INLINE_TAGS = set(
+    "a abbr acronym b bdo big br button cite code dfn em i img input kbd label "
+    "map object q samp script select small span strong sub sup textarea time "
+    "tt var".split()
+)
+SEPARATORS = {"br"}
+HTML_WHITESPACE = re.compile("[\x20\x09\x0C\u200B\x0A\x0D]+")
+
+
+@functools.cache
+def compiled_selector(selector: str) -> etree.XPath:
+    """The selector translated and compiled once per process, with the same
+    descendant-or-self semantics and pseudo classes as `PyQuery.__call__`"""
+    return etree.XPath(
+        TRANSLATOR.css_to_xpath(selector.replace("[@", "["), "descendant-or-self::")
+    )
+
+
+class Selection:
+    """Nodes of a parsed page with the subset of the pyquery API the layouts
+    use, selecting descendants with CSS, `text()`, `attr()`, `eq()`,
+    `children()`, iteration and slicing.
+
+    Subclasses implement it over a parser, `parse` picks the one chosen for
+    the run. Results follow pyquery, selections include the context node
+    itself when it matches and text is extracted as `PyQuery.text()` does."""
+
+    def __init__(self, nodes):
+        self.nodes = list(nodes)
+
+    @classmethod
+    def parse(cls, content: str) -> "Selection":
+        raise NotImplementedError("Abstract Method")
+
+    def select(self, node, selector: str) -> list:
+        raise NotImplementedError("Abstract Method")
+
+    def node_text(self, node) -> str:
+        raise NotImplementedError("Abstract Method")
+
+    def node_attr(self, node, name: str) -> str | None:
+        raise NotImplementedError("Abstract Method")
+
+    def node_children(self, node) -> list:
+        raise NotImplementedError("Abstract Method")
+
+    def node_own_text(self, node) -> str | None:
+        raise NotImplementedError("Abstract Method")
+
+    def __call__(self, selector: "str | Selection") -> "Selection":
+        if isinstance(selector, Selection):
+            return selector
+        return self.__class__(
+            match for node in self.nodes for match in self.select(node, selector)
+        )
+
+    def text(self) -> str:
+        return " ".join(self.node_text(node) for node in self.nodes)
+
+    def attr(self, name: str) -> str | None:
+        return self.node_attr(self.nodes[0], name) if self.nodes else None
+
+    def eq(self, index: int) -> "Selection":
+        if -len(self.nodes) <= index < len(self.nodes):
+            return self.__class__([self.nodes[index]])
+        return self.__class__([])
+
+    def children(self) -> "Selection":
+        return self.__class__(
+            child for node in self.nodes for child in self.node_children(node)
+        )
+
+    def own_text(self) -> str | None:
+        """Text of the first node before any of its children, lxml's `.text`"""
+        return self.node_own_text(self.nodes[0]) if self.nodes else None
+
+    def __iter__(self) -> Iterator["Selection"]:
+        return (self.__class__([node]) for node in self.nodes)
+
+    def __getitem__(self, index: int | slice) -> "Selection":
+        if isinstance(index, slice):
+            return self.__class__(self.nodes[index])
+        return self.__class__([self.nodes[index]])
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.nodes!r})"
+
+
+class PyQuerySelection(Selection):
+    """The reference parser, lxml through pyquery"""
+
+    @classmethod
+    def parse(cls, content: str) -> Selection:
+        return cls(PyQuery(content))
+
+    def select(self, node, selector: str) -> list:
+        return compiled_selector(selector)(node)
+
+    def node_text(self, node) -> str:
+        if node.tag == "textarea":
+            return PyQuery(node).html(escape=False)
+        return join_text(lxml_text_array(node, top=True))
+
+    def node_attr(self, node, name: str) -> str | None:
+        return node.get(name)
+
+    def node_children(self, node) -> list:
+        return node.getchildren()
+
+    def node_own_text(self, node) -> str | None:
+        return node.text
+
+
+class SelectolaxSelection(Selection):
+    """A faster parser, lexbor through selectolax, an optional dependency"""
+
+    @classmethod
+    def parse(cls, content: str) -> Selection:
+        from selectolax.lexbor import LexborHTMLParser
+
+        return cls([LexborHTMLParser(content).root])
+
+    def select(self, node, selector: str) -> list:
+        # lexbor selects as querySelectorAll, descendants only. The node
+        # itself can only match a selector without combinators, checked
+        # against its siblings as lexbor has no single node matching
+        matches = node.css(selector)
+        parent = node.parent
+        if (
+            parent is not None
+            and parent.tag != "-document"
+            and (not COMBINATORS.search(selector))
+        ):
+            if any(match.mem_id == node.mem_id for match in parent.css(selector)):
+                matches.insert(0, node)
+        return matches
+
+    def node_text(self, node) -> str:
+        return join_text(lexbor_text_array(node, top=True))
+
+    def node_attr(self, node, name: str) -> str | None:
+        attributes = node.attributes
+        if name not in attributes:
+            return None
+        return attributes[name] or ""
+
+    def node_children(self, node) -> list:
+        return list(node.iter())
+
+    def node_own_text(self, node) -> str | None:
+        texts = []
+        for child in node.iter(include_text=True):
+            if child.tag != "-text":
+                break
+            texts.append(child.text_content)
+        return "".join(texts) if texts else None
+
+
+def join_text(parts: list) -> str:
+    """The text of a text array, runs of text with their whitespace squashed
+    and blocks and line breaks as new lines"""
+    parts = strip_block_marks(squash_block_marks(merge_text_runs(parts)))
+    return "".join(
+        "\n" if part is None or part is True else part for part in parts
+    ).strip()
+
+
+def squash_block_marks(parts: list) -> list:
+    squashed, last_block = [], False
+    for part in parts:
+        if part is not None:
+            squashed.append(part)
+            last_block = False
+        elif not last_block:
+            squashed.append(None)
+            last_block = True
+    return squashed
+
+
+def strip_block_marks(parts: list) -> list:
+    """Drops the marks before the first and after the last text"""
+    if not parts:
+        return parts
+    for start, part in enumerate(parts):
+        if isinstance(part, str):
+            break
+    # Walks back from the last part down to the first text
+    for end, part in enumerate(parts[: start - 1 if start > 0 else None : -1]):
+        if isinstance(part, str):
+            break
+    return parts[start : -end if end > 0 else None]
+
+
+def merge_text_runs(parts: list) -> list:
+    merged, run = [], []
+
+    def flush():
+        if run:
+            text = HTML_WHITESPACE.sub(" ", "".join(run)).strip()
+            if text:
+                merged.append(text)
+            run.clear()
+
+    for part in parts:
+        if isinstance(part, str):
+            run.append(part)
+        else:
+            flush()
+            merged.append(part)
+    flush()
+    return merged
+
+
+def lxml_text_array(node, top: bool = False) -> list:
+    """pyquery.text.extract_text_array, the text of lxml nodes is split in
+    their text and the tails of their children"""
+    # Comments and processing instructions
+    if callable(node.tag):
+        return []
+
+    parts = []
+    if node.tag in SEPARATORS:
+        parts.append(True)
+    elif node.tag not in INLINE_TAGS:
+        parts.append(None)
+    if node.text is not None:
+        parts.append(node.text)
+    for child in node.getchildren():
+        parts.extend(lxml_text_array(child))
+        if child.tail is not None:
+            parts.append(child.tail)
+    if node.tag not in INLINE_TAGS and node.tag not in SEPARATORS:
+        parts.append(None)
+    if top:
+        parts = strip_block_marks(squash_block_marks(parts))
+    return parts
+
+
+def lexbor_text_array(node, top: bool = False) -> list:
+    """`lxml_text_array` over lexbor nodes, text nodes are siblings of the
+    elements where lxml keeps them as text and tails"""
+    if node.tag == "-comment":
+        return []
+
+    parts = []
+    if node.tag in SEPARATORS:
+        parts.append(True)
+    elif node.tag not in INLINE_TAGS:
+        parts.append(None)
+    for child in node.iter(include_text=True):
+        if child.tag == "-text":
+            parts.append(child.text_content)
+        else:
+            parts.extend(lexbor_text_array(child))
+    if node.tag not in INLINE_TAGS and node.tag not in SEPARATORS:
+        parts.append(None)
+    if top:
+        parts = strip_block_marks(squash_block_marks(parts))
+    return parts
+
+
+PARSERS: dict[str, type[Selection]] = {
+    "pyquery": PyQuerySelection,
+    "selectolax": SelectolaxSelection,
+}
+
+_parser: type[Selection] = PyQuerySelection
+
+
+def use_parser(name: str):
+    """Sets the parser of every following `parse`, for the whole run"""
+    global _parser
+    _parser = PARSERS[name]
+    logger.info(f"Parsing pages with {name}")
+
+
+def parse(content: str) -> Selection:
+    return _parser.parse(content)
@@ -0,0 +1,145 @@
+from dataclasses import dataclass, field
+from typing import Callable, Literal
+
+from pydantic import BaseModel
+
+from extractor.core import ExtractionResult
+from extractor.html import Selection, parse
+
+
+def strip(value: str) -> str:
+    return value.strip()
+
+
+def sentence_case(value: str) -> str:
+    """Headlines written in capitals become `Sentence case` on a single line"""
+    return value.replace("\n", " ").lower().capitalize()
+
+
+def prefix(start: str) -> Callable[[str | None], str | None]:
+    def transform(value: str | None) -> str | None:
+        return f"{start}{value}" if value else value
+
+    return transform
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    """How one field is read from an item of a layout.
+
+    The selector is applied to the item, to every root match (`selection`)
+    or to the whole page (`document`), no selector reads the scope itself.
+    The text is read unless an attribute or the node's own text is asked
+    for, `index` picks one of the selected nodes and `child` one of their
+    children. An empty value falls back to the `fallback` field."""
+
+    selector: str | None = None
+    attr: str | None = None
+    scope: Literal["item", "selection", "document"] = "item"
+    index: int | None = None
+    child: int | None = None
+    own_text: bool = False
+    transforms: tuple[Callable, ...] = ()
+    fallback: "FieldSpec | None" = None
+
+    def read(self, item: Selection, selection: Selection, document: Selection):
+        target = {"item": item, "selection": selection, "document": document}[
+            self.scope
+        ]
+        if self.selector:
+            target = target(self.selector)
+        if self.index is not None:
+            target = target.eq(self.index)
+        if self.child is not None:
+            target = target.children().eq(self.child)
+
+        if self.own_text:
+            value = target.own_text()
+        elif self.attr:
+            value = target.attr(self.attr)
+        else:
+            value = target.text()
+
+        if not value and self.fallback:
+            return self.fallback.read(item, selection, document)
+        for transform in self.transforms:
+            value = transform(value)
+        return value
+
+
+@dataclass(frozen=True)
+class LayoutSpec:
+    """A page layout of a source, the root selector of its items and how to
+    read the fields of each item.
+
+    With `each` every root match is an item, up to `limit`, otherwise all the
+    matches together are a single item. Items missing a `required` field, or
+    rejected by `item_filter`, produce no result."""
+
+    name: str
+    example: str
+    root: str
+    fields: dict[str, FieldSpec]
+    required: tuple[str, ...]
+    each: bool = True
+    limit: int | None = None
+    item_filter: Callable[[Selection], bool] | None = None
+
+
+@dataclass
+class LayoutPlan:
+    """The layouts of a source evaluated over a single parse of each page,
+    building the content and accessory models of every item found"""
+
+    layouts: list[LayoutSpec]
+    content: type[BaseModel]
+    accessory: type[BaseModel] | None = None
+    content_fields: tuple[str, ...] = field(init=False)
+    accessory_fields: tuple[str, ...] = field(init=False)
+
+    def __post_init__(self):
+        self.content_fields = tuple(self.content.__fields__)
+        self.accessory_fields = tuple(
+            self.accessory.__fields__ if self.accessory else ()
+        )
+
+    def extract(self, content: str) -> list[ExtractionResult]:
+        document = parse(content)
+        return [
+            result
+            for layout in self.layouts
+            for result in self.extract_layout(layout, document)
+        ]
+
+    def extract_layout(
+        self, layout: LayoutSpec, document: Selection
+    ) -> list[ExtractionResult]:
+        selection = document(layout.root)
+        if not selection:
+            return []
+
+        items = selection[: layout.limit] if layout.each else [selection]
+        results = []
+        for item in items:
+            if layout.item_filter and not layout.item_filter(item):
+                continue
+            values = {
+                name: spec.read(item, selection, document)
+                for name, spec in layout.fields.items()
+            }
+            if all(values.get(name) for name in layout.required):
+                results.append(self.build(values))
+        return results
+
+    def build(self, values: dict) -> ExtractionResult:
+        accessory_content = None
+        if self.accessory:
+            accessory_content = self.accessory(
+                **{name: values.get(name) for name in self.accessory_fields}
+            )
+        return ExtractionResult(
+            content=self.content(
+                **{name: values.get(name, "") for name in self.content_fields}
+            ),
+            accessory_content=accessory_content,
+        )
@@ -3,8 +3,6 @@ import itertools
 import logging
 from typing import Generator
 
-from pyquery import PyQuery as pq
-
 from arquivo import ArchivedURL, VersionEntry
 from data import (
     Fact,
@@ -12,82 +10,55 @@ from data import (
     SourceID,
     NewsHighlight,
     NewsHighlightAccessory,
+    DateDim,
     ExtractorDim,
 )
 from extractor.core import (
     Extractor,
     ExtractionTargetURL,
     arquivo_fact_builder,
-    ExtractionResult,
+)
+from extractor.layout import (
+    FieldSpec,
+    LayoutPlan,
+    LayoutSpec,
 )
 
 logger = logging.getLogger(__name__)
 
 
-def extract_news_highlight_2014(content) -> [ExtractionResult]:
-    """Extracts_news_highlight from layout in this example
-    https://arquivo.pt/wayback/20140427170213/http://www.ojogo.pt/
-    """
-    d = pq(content)
-    results = []
-
-    table = d(".LinkList_3 .LLItem")
-    if table:
-        for item in table[:3]:
-            item_pq = pq(item)
-            title = item_pq("h2").text()
-            link = item_pq("a").attr("href")
-            summary = item_pq(".LLIBLead").text()
-
-            if title and link:
-                results.append(
-                    ExtractionResult(
-                        content=NewsHighlight(
-                            **{
-                                "title": title,
-                                "summary": summary,
-                            }
-                        ),
-                        accessory_content=NewsHighlightAccessory(
-                            **{
-                                "more_link": link,
-                            }
-                        ),
-                    )
-                )
-    return results
-
-
-def extract_news_highlight_2017(content) -> [ExtractionResult]:
-    """Extracts_news_highlight from layout in this example
-    https://arquivo.pt/noFrame/replay/20170101180216/http://www.ojogo.pt/
-    """
-    d = pq(content)
-    results = []
-
-    table = d(".t-g1-featured-1")
-    if table:
-        title = table("h2 a").text()
-        link = table("h2 a").attr("href")
-        summary = ""
-
-        if title and link:
-            results.append(
-                ExtractionResult(
-                    content=NewsHighlight(
-                        **{
-                            "title": title,
-                            "summary": summary,
-                        }
-                    ),
-                    accessory_content=NewsHighlightAccessory(
-                        **{
-                            "more_link": link,
-                        }
-                    ),
-                )
-            )
-    return results
+NEWS_HIGHLIGHT_PLAN = LayoutPlan(
+    [
+        LayoutSpec(
+            name="2014",
+            example="https://arquivo.pt/wayback/20140427170213/http://www.ojogo.pt/",
+            root=".LinkList_3 .LLItem",
+            limit=3,
+            fields={
+                "title": FieldSpec("h2"),
+                "more_link": FieldSpec("a", attr="href"),
+                "summary": FieldSpec(".LLIBLead"),
+            },
+            required=("title", "more_link"),
+        ),
+        LayoutSpec(
+            name="2017",
+            example=(
+                "https://arquivo.pt/noFrame/replay/20170101180216/"
+                "http://www.ojogo.pt/"
+            ),
+            root=".t-g1-featured-1",
+            each=False,
+            fields={
+                "title": FieldSpec("h2 a"),
+                "more_link": FieldSpec("h2 a", attr="href"),
+            },
+            required=("title", "more_link"),
+        ),
+    ],
+    content=NewsHighlight,
+    accessory=NewsHighlightAccessory,
+)
 
 
 class OJOGOV1(Extractor):
@@ -98,21 +69,17 @@ class OJOGOV1(Extractor):
     ]
 
     def extract_news_highlight(
-        self, version_entry: VersionEntry, archived_url: ArchivedURL
+        self,
+        version_entry: VersionEntry,
+        archived_url: ArchivedURL,
+        date_dim: DateDim,
     ) -> Generator[Fact, None, None]:
-        dt = self.repository.fetch_date(
-            version_entry.dt.year, version_entry.dt.month, version_entry.dt.day
-        )
-
         content = archived_url.content
         if not content:
             logger.warning(f"No content for {version_entry.linkToNoFrame}")
 
-        if dt and content:
-            results = itertools.chain(
-                extract_news_highlight_2014(archived_url.content),
-                extract_news_highlight_2017(archived_url.content),
-            )
+        if content:
+            results = NEWS_HIGHLIGHT_PLAN.extract(archived_url.content)
 
             for result in results:
                 yield arquivo_fact_builder(
@@ -121,30 +88,25 @@ class OJOGOV1(Extractor):
                     SourceID.desarquivo,
                     self.version,
                     result,
-                    dt.id,
+                    date_dim.id,
                     self.extractor_dim.id,
                 )
 
     async def extract(self) -> Generator[Fact, None, None]:
         yearly_tasks = [
-            self.arquivo.fetch_url_versions(url.value, str(year), str(year))
-            for year in range(self.params.start_year, self.params.end_year + 1)
-            for url in self.urls
-            if url.applicable(year)
+            self.arquivo.fetch_url_versions(url, since, until)
+            for url, since, until in self.versions_windows(self.params, self.urls)
         ]
         all_resp = await asyncio.gather(*yearly_tasks)
         all_versions = itertools.chain(*all_resp)
 
         for version in all_versions:
-            if (
-                self.params.day is None or version.dt.day == self.params.day
-            ) and version.dt.month == self.params.month:
-                archived_url = await self.arquivo.fetched_archived_url(version)
-                news_facts = self.extract_news_highlight(version, archived_url)
-                for fact in news_facts:
+            if self.params.wants(version.dt):
+                async for fact in self.replayed_facts(
+                    version, self.extract_news_highlight
+                ):
                     yield fact
 
-    def extractor_specification(self) -> ExtractorDim:
-        return ExtractorDim(
-            **{"id": f"ojogo_{self.version}", "name": "O Jogo"}
-        )
+    @classmethod
+    def extractor_specification(cls) -> ExtractorDim:
+        return ExtractorDim(**{"id": f"ojogo_{cls.version}", "name": "O Jogo"})
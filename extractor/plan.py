@@ -0,0 +1,310 @@
+import calendar
+import datetime
+import json
+import logging
+import math
+from dataclasses import dataclass, field
+
+import httpx
+from sqlite_utils import Database
+
+from arquivo import (
+    CDX_FIELDS,
+    CDX_FILTERS,
+    ArquivoApiPath,
+    VersionEntry,
+    VersionsBackend,
+    VersionsResponse,
+    archived_url_path,
+    cdx_params,
+    cdx_version_entry,
+    HOURLY,
+    SamplingPolicy,
+    filter_versions,
+    url_versions_params,
+)
+from data import Repository
+from extractor.core import ExtractionParams, Extractor
+
+logger = logging.getLogger(__name__)
+
+# Assumptions used when the caches have nothing to measure from, hourly
+# collapsed captures of a front page and an average page size
+DEFAULT_VERSIONS_PER_DAY = 6
+DEFAULT_PAGE_BYTES = 150_000
+DEFAULT_LISTING_BYTES = 500_000
+VERSIONS_PAGE_SIZE = 2000
+
+# Seconds per request, version listings run concurrently up to the client
+# semaphore while replay fetches run one after the other
+LISTING_SECONDS = 3.0
+REPLAY_SECONDS = 1.5
+API_SECONDS = 0.5
+CONCURRENCY = 20
+
+
+@dataclass
+class ExtractorPlan:
+    extractor: str
+    listings: int = 0
+    listings_cached: int = 0
+    replays_cached: int = 0
+    replays_network: int = 0
+    api_requests: int = 0
+    days: int = 0
+    days_with_facts: int = 0
+    network_bytes: int = 0
+    seconds: float = 0
+    estimated: bool = False
+
+
+@dataclass
+class ExtractionPlan:
+    extractors: list[ExtractorPlan] = field(default_factory=list)
+
+    @property
+    def network_requests(self) -> int:
+        return sum(
+            p.listings + p.replays_network + p.api_requests for p in self.extractors
+        )
+
+    @property
+    def cached_requests(self) -> int:
+        return sum(p.replays_cached for p in self.extractors)
+
+    @property
+    def network_bytes(self) -> int:
+        return sum(p.network_bytes for p in self.extractors)
+
+    @property
+    def seconds(self) -> float:
+        return sum(p.seconds for p in self.extractors)
+
+
+class ExtractionPlanner:
+    """Estimates the requests, bytes and time an extraction needs without
+    running it.
+
+    Version listings found in the HTTP cache give the exact captures to replay,
+    listings not cached are estimated from the cached ones of the same url or
+    from `DEFAULT_VERSIONS_PER_DAY`. Listings are always requested again, they
+    change as arquivo.pt indexes new captures, replays already in the cache are
+    not."""
+
+    def __init__(
+        self,
+        repository: Repository,
+        http_cache_db: Database,
+        versions_backend: VersionsBackend = VersionsBackend.TEXT_SEARCH,
+        sampling: SamplingPolicy = HOURLY,
+    ):
+        self.repository = repository
+        self.http_cache_db = http_cache_db
+        self.versions_backend = versions_backend
+        self.sampling = sampling
+        self.has_cache = http_cache_db["requests"].exists()
+        self.page_bytes = self.average_bytes(
+            f"{ArquivoApiPath.NO_FRAME_REPLAY}/", DEFAULT_PAGE_BYTES
+        )
+        self.listing_bytes = self.average_bytes(
+            self.listing_path(), DEFAULT_LISTING_BYTES
+        )
+
+    def plan(self, params: ExtractionParams) -> ExtractionPlan:
+        return ExtractionPlan(
+            [self.plan_extractor(cls, params) for cls in params.extractors]
+        )
+
+    def plan_extractor(
+        self, extractor_cls: type[Extractor], params: ExtractionParams
+    ) -> ExtractorPlan:
+        plan = ExtractorPlan(extractor_cls.__name__)
+        plan.api_requests = extractor_cls.api_requests(params)
+        plan.days = days_in_window(
+            str(params.start_year),
+            str(params.end_year),
+            params.month,
+            params.day,
+            params.days,
+        )
+
+        listed: dict[str, list[float]] = {}
+        unknown = []
+        for url, since, until in extractor_cls.versions_windows(params):
+            days = days_in_window(since, until, params.month, params.day, params.days)
+            cached_listing = self.cached_versions(url, since, until)
+            if cached_listing is None:
+                plan.listings += 1
+                unknown.append((url, days))
+                continue
+
+            pages, versions = cached_listing
+            plan.listings += pages
+            plan.listings_cached += 1
+            wanted = [version for version in versions if params.wants(version.dt)]
+            listed.setdefault(url, []).append(len(wanted) / max(days, 1))
+            cached = self.cached_replays(wanted)
+            plan.replays_cached += cached
+            plan.replays_network += len(wanted) - cached
+
+        for url, days in unknown:
+            rates = listed.get(url) or [
+                min(DEFAULT_VERSIONS_PER_DAY, self.sampling.max_per_day() or 24)
+            ]
+            plan.replays_network += round(days * sum(rates) / len(rates))
+            plan.estimated = True
+
+        plan.days_with_facts = self.days_with_facts(extractor_cls, params)
+        plan.network_bytes = (
+            plan.listings * self.listing_bytes + plan.replays_network * self.page_bytes
+        )
+        plan.seconds = (
+            math.ceil(plan.listings / CONCURRENCY) * LISTING_SECONDS
+            + plan.replays_network * REPLAY_SECONDS
+            + plan.api_requests * API_SECONDS
+        )
+        return plan
+
+    def listing_path(self) -> str:
+        if self.versions_backend == VersionsBackend.CDX:
+            return ArquivoApiPath.CDX
+        return ArquivoApiPath.TEXT_SEARCH
+
+    def listing_url(self, url: str, since: str, until: str) -> str:
+        if self.versions_backend == VersionsBackend.CDX:
+            params = cdx_params(
+                url,
+                since,
+                until,
+                CDX_FIELDS,
+                CDX_FILTERS,
+                self.sampling.cdx_collapse(),
+            )
+        else:
+            params = url_versions_params(url, since, until, VERSIONS_PAGE_SIZE)
+        base = httpx.URL(ArquivoApiPath.BASE_URL).join(self.listing_path())
+        return str(base.copy_merge_params(params))
+
+    def cached_content(self, url: str) -> str | None:
+        if not self.has_cache:
+            return None
+        row = self.http_cache_db.execute(
+            "SELECT content FROM requests WHERE url = ?", [url]
+        ).fetchone()
+        return row[0] if row else None
+
+    def cached_versions(
+        self, url: str, since: str, until: str
+    ) -> tuple[int, list[VersionEntry]] | None:
+        """The pages and filtered versions of a cached version listing"""
+        content = self.cached_content(self.listing_url(url, since, until))
+        if content is None:
+            return None
+
+        pages = 1
+        try:
+            if self.versions_backend == VersionsBackend.CDX:
+                entries = sorted(
+                    (
+                        cdx_version_entry(json.loads(line))
+                        for line in content.splitlines()
+                        if line.strip()
+                    ),
+                    key=lambda entry: entry.tstamp,
+                )
+            else:
+                entries = []
+                response = VersionsResponse(**json.loads(content))
+                while True:
+                    entries.extend(response.response_items)
+                    if not response.has_more_data():
+                        break
+                    next_content = self.cached_content(response.next_page)
+                    if next_content is None:
+                        break
+                    response = VersionsResponse(**json.loads(next_content))
+                    pages += 1
+        except ValueError:
+            logger.warning(f"Unreadable cached listing for {url} {since}-{until}")
+            return None
+
+        return pages, list(filter_versions(entries, self.sampling))
+
+    def cached_replays(self, versions: list[VersionEntry]) -> int:
+        if not versions or not self.has_cache:
+            return 0
+        urls = [
+            str(
+                httpx.URL(ArquivoApiPath.BASE_URL).join(
+                    archived_url_path(version.originalURL, version.tstamp)
+                )
+            )
+            for version in versions
+        ]
+        cached = 0
+        for i in range(0, len(urls), 500):
+            chunk = urls[i : i + 500]
+            cached += self.http_cache_db.execute(
+                "SELECT count(*) FROM requests "
+                f"WHERE url IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            ).fetchone()[0]
+        return cached
+
+    def average_bytes(self, path: str, default: int) -> int:
+        if not self.has_cache:
+            return default
+        # A sample is enough and keeps the plan fast on large caches
+        average = self.http_cache_db.execute(
+            "SELECT avg(length(content)) FROM ("
+            "  SELECT content FROM requests WHERE url LIKE ? LIMIT 1000"
+            ")",
+            [f"%{path}%"],
+        ).fetchone()[0]
+        return int(average) if average else default
+
+    def days_with_facts(
+        self, extractor_cls: type[Extractor], params: ExtractionParams
+    ) -> int:
+        covered = self.repository.fetch_covered_days(
+            extractor_cls.extractor_specification().id,
+            params.month,
+            params.day,
+            params.start_year,
+            params.end_year,
+        )
+        # Counted over the days of the plan, only the gaps when given
+        return sum(
+            1
+            for d in covered
+            if params.days is None
+            or datetime.date(d.year, d.month, d.day) in params.day_set
+        )
+
+
+def days_in_window(
+    since: str,
+    until: str,
+    month: int,
+    day: int | None,
+    gaps: list[datetime.date] | None = None,
+) -> int:
+    """Days of the extracted month, or the single day, inside a version
+    listing window, up to today as there are no captures of the future.
+    With `gaps` only those days are extracted"""
+    if gaps is not None:
+        return sum(1 for gap in gaps if int(since[:4]) <= gap.year <= int(until[:4]))
+
+    today = datetime.date.today()
+    days = 0
+    for year in range(int(since[:4]), int(until[:4]) + 1):
+        if (year, month) > (today.year, today.month):
+            break
+        last_day = calendar.monthrange(year, month)[1]
+        if (year, month) == (today.year, today.month):
+            last_day = today.day
+        if day is None:
+            days += last_day
+        elif day <= last_day:
+            days += 1
+    return days
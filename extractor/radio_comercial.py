@@ -3,133 +3,114 @@ import itertools
 import logging
 from typing import Generator
 
-from pyquery import PyQuery as pq
 import pendulum
 
 from arquivo import ArchivedURL, VersionEntry
-from data import Fact, CategoryID, SourceID, HighRotationMusic, ExtractorDim
+from data import (
+    Fact,
+    CategoryID,
+    SourceID,
+    HighRotationMusic,
+    DateDim,
+    ExtractorDim,
+)
 from extractor.core import (
     Extractor,
+    ExtractionParams,
     ExtractionTargetURL,
     arquivo_fact_builder,
-    ExtractionResult,
+)
+from extractor.html import Selection
+from extractor.layout import (
+    FieldSpec,
+    LayoutPlan,
+    LayoutSpec,
 )
 
 logger = logging.getLogger(__name__)
 
 
-def extract_music_circa_2008(content) -> [ExtractionResult]:
-    """Extracts song/artist from layout in this example
-    https://arquivo.pt/noFrame/replay/20081021131315/http://radiocomercial.clix.pt/
-    """
-
-    d = pq(content)
-    selector = "#hp-leftbottom tr table tr .t11-white"
-    elems = d(selector)
-    results = []
-    for elem in elems:
-        artist = d(elem)(".t11-yellow-bold").text()
-        song = d(elem)(".t11-lightgrey").text()
-        if artist and song:
-            results.append(
-                ExtractionResult(
-                    content=HighRotationMusic(**{"artist": artist, "song": song}),
-                    accessory_content=None,
-                )
-            )
-
-    return results
-
-
-def extract_music_circa_2012(content) -> [ExtractionResult]:
-    """Extracts song/artist from layout in this example
-    https://arquivo.pt/noFrame/replay/20120121123254/http://radiocomercial.clix.pt/
-    """
-
-    d = pq(content)
-    selector = ".tnt_hp_list"
-    elems = d(selector)
-    results = []
-    for elem in elems:
-        artist = pq(elem)(".tnt_hp_artist").text()
-        song = pq(elem)(".tnt_hp_song").text()
-        if artist and song:
-            results.append(
-                ExtractionResult(
-                    content=HighRotationMusic(**{"artist": artist, "song": song}),
-                    accessory_content=None,
-                )
-            )
-
-    return results
-
-
-def extract_music_circa_2016(content) -> [ExtractionResult]:
-    """Extracts song/artist from layout in this example
-    https://arquivo.pt/wayback/20160226180211/http://radiocomercial.iol.pt/
-    """
-    d = pq(content)
-    results = []
-    for i in range(1, 4):
-        selector = f"#panel-{i}"
-        matches = d(selector).children()
-        if len(matches) == 5:
-            (artist_elem, song_elem) = d(selector).children()[2:4]
-            artist = artist_elem.text
-            song = song_elem.text
-            if artist and song:
-                results.append(
-                    ExtractionResult(
-                        content=HighRotationMusic(**{"artist": artist, "song": song}),
-                        accessory_content=None,
-                    )
-                )
-
-    return results
-
-
-def extract_music_circa_2019(content) -> [ExtractionResult]:
-    """Extracts song/artist from layout in this example
-    https://arquivo.pt/noFrame/replay/20190101051253/https://radiocomercial.iol.pt/programas/8/todos-no-top-semana
-    """
-    d = pq(content)
-    selector = ".media-box-title.votes"
-    elems = d(selector)
-    results = []
-    for elem in d(elems)[:10]:
-        artist = d(elem)("span").text()
-        song = d(elem)("p").text()
-        if artist and song:
-            results.append(
-                ExtractionResult(
-                    content=HighRotationMusic(**{"artist": artist, "song": song}),
-                    accessory_content=None,
-                )
-            )
-
-    return results
-
-
-def extract_music_circa_2020(content) -> [ExtractionResult]:
-    """Extracts song/artist from layout in this example
-    https://arquivo.pt/noFrame/replay/20200313185844/https://radiocomercial.iol.pt/programas/tnt-todos-no-top
-    """
-    d = pq(content)
-    selector = ".song-info"
-    elems = d(selector)
-    results = []
-    for elem in d(elems)[:10]:
-        artist = d(elem)(".songArtist").text()
-        song = d(elem)(".songTitle").text()
-        if artist and song:
-            results.append(
-                ExtractionResult(
-                    content=HighRotationMusic(**{"artist": artist, "song": song}),
-                    accessory_content=None,
-                )
+def has_five_children(item: Selection) -> bool:
+    return len(item.children()) == 5
+
+
+MUSIC_HIGH_ROTATION_PLAN = LayoutPlan(
+    [
+        LayoutSpec(
+            name="circa_2008",
+            example=(
+                "https://arquivo.pt/noFrame/replay/20081021131315/"
+                "http://radiocomercial.clix.pt/"
+            ),
+            root="#hp-leftbottom tr table tr .t11-white",
+            fields={
+                "artist": FieldSpec(".t11-yellow-bold"),
+                "song": FieldSpec(".t11-lightgrey"),
+            },
+            required=("artist", "song"),
+        ),
+        LayoutSpec(
+            name="circa_2012",
+            example=(
+                "https://arquivo.pt/noFrame/replay/20120121123254/"
+                "http://radiocomercial.clix.pt/"
+            ),
+            root=".tnt_hp_list",
+            fields={
+                "artist": FieldSpec(".tnt_hp_artist"),
+                "song": FieldSpec(".tnt_hp_song"),
+            },
+            required=("artist", "song"),
+        ),
+        *(
+            LayoutSpec(
+                name=f"circa_2016_panel_{panel}",
+                example=(
+                    "https://arquivo.pt/wayback/20160226180211/"
+                    "http://radiocomercial.iol.pt/"
+                ),
+                root=f"#panel-{panel}",
+                each=False,
+                item_filter=has_five_children,
+                fields={
+                    "artist": FieldSpec(child=2, own_text=True),
+                    "song": FieldSpec(child=3, own_text=True),
+                },
+                required=("artist", "song"),
             )
-
-    return results
+            for panel in range(1, 4)
+        ),
+        LayoutSpec(
+            name="circa_2019",
+            example=(
+                "https://arquivo.pt/noFrame/replay/20190101051253/"
+                "https://radiocomercial.iol.pt/programas/8/todos-no-top-semana"
+            ),
+            root=".media-box-title.votes",
+            limit=10,
+            fields={
+                "artist": FieldSpec("span"),
+                "song": FieldSpec("p"),
+            },
+            required=("artist", "song"),
+        ),
+        LayoutSpec(
+            name="circa_2020",
+            example=(
+                "https://arquivo.pt/noFrame/replay/20200313185844/"
+                "https://radiocomercial.iol.pt/programas/tnt-todos-no-top"
+            ),
+            root=".song-info",
+            limit=10,
+            fields={
+                "artist": FieldSpec(".songArtist"),
+                "song": FieldSpec(".songTitle"),
+            },
+            required=("artist", "song"),
+        ),
+    ],
+    content=HighRotationMusic,
+)
 
 
 class RadioComercialV1(Extractor):
@@ -148,55 +129,56 @@ class RadioComercialV1(Extractor):
     ]
 
     def extract_music_high_rotation(
-        self, version_entry: VersionEntry, archived_url: ArchivedURL
+        self,
+        version_entry: VersionEntry,
+        archived_url: ArchivedURL,
+        date_dim: DateDim,
     ) -> Generator[Fact, None, None]:
-        dt = self.repository.fetch_date(
-            version_entry.dt.year, version_entry.dt.month, version_entry.dt.day
-        )
-
-        if dt:
-            results = itertools.chain(
-                extract_music_circa_2008(archived_url.content),
-                extract_music_circa_2012(archived_url.content),
-                extract_music_circa_2016(archived_url.content),
-                extract_music_circa_2019(archived_url.content),
-                extract_music_circa_2020(archived_url.content),
+        results = MUSIC_HIGH_ROTATION_PLAN.extract(archived_url.content)
+
+        for result in results:
+            yield arquivo_fact_builder(
+                version_entry,
+                CategoryID.music_high_rotation,
+                SourceID.desarquivo,
+                self.version,
+                result,
+                date_dim.id,
+                self.extractor_dim.id,
             )
 
-            for result in results:
-                yield arquivo_fact_builder(
-                    version_entry,
-                    CategoryID.music_high_rotation,
-                    SourceID.desarquivo,
-                    self.version,
-                    result,
-                    dt.id,
-                    self.extractor_dim.id,
-                )
+    @classmethod
+    def versions_windows(
+        cls,
+        params: ExtractionParams,
+        urls: list[ExtractionTargetURL] | None = None,
+    ) -> list[tuple[str, str, str]]:
+        if urls is None:
+            urls = cls.urls
+        return [
+            (url.value, str(year), str(year + 1))
+            for year in params.years()
+            for url in urls
+            if url.applicable(year)
+        ]
 
     async def extract(self) -> Generator[Fact, None, None]:
         yearly_tasks = [
-            self.arquivo.fetch_url_versions(url.value, str(year), str(year + 1))
-            for year in range(self.params.start_year, self.params.end_year + 1)
-            for url in self.urls
-            if url.applicable(year)
+            self.arquivo.fetch_url_versions(url, since, until)
+            for url, since, until in self.versions_windows(self.params, self.urls)
         ]
         all_resp = await asyncio.gather(*yearly_tasks)
         all_versions = itertools.chain(*all_resp)
 
         for version in all_versions:
-            if (
-                self.params.day is None or version.dt.day == self.params.day
-            ) and version.dt.month == self.params.month:
-                archived_url = await self.arquivo.fetched_archived_url(version)
-                if archived_url is not None:
-                    music_facts = (
-                        version, archived_url
-                    )
-                    for fact in music_facts:
-                        yield fact
-
-    def extractor_specification(self) -> ExtractorDim:
+            if self.params.wants(version.dt):
+                async for fact in self.replayed_facts(
+                    version, self.extract_music_high_rotation
+                ):
+                    yield fact
+
+    @classmethod
+    def extractor_specification(cls) -> ExtractorDim:
         return ExtractorDim(
-            **{"id": f"radio_comercial_{self.version}", "name": "Rádio Comercial"}
+            **{"id": f"radio_comercial_{cls.version}", "name": "Rádio Comercial"}
         )
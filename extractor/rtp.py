@@ -3,8 +3,6 @@ import itertools
 import logging
 from typing import Generator
 
-from pyquery import PyQuery as pq
-
 from arquivo import ArchivedURL, VersionEntry
 from data import (
     Fact,
@@ -12,166 +10,96 @@ from data import (
     SourceID,
     NewsHighlight,
     NewsHighlightAccessory,
+    DateDim,
     ExtractorDim,
 )
 from extractor.core import (
     Extractor,
     ExtractionTargetURL,
     arquivo_fact_builder,
-    ExtractionResult,
+)
+from extractor.layout import (
+    FieldSpec,
+    LayoutPlan,
+    LayoutSpec,
 )
 
 logger = logging.getLogger(__name__)
 
 
-def extract_news_highlight_2008(content) -> [ExtractionResult]:
-    """Extracts_news_highlight from layout in this example
-    https://arquivo.pt/wayback/20081021163216/http://ww1.rtp.pt/homepage/
-    """
-    d = pq(content)
-    selector = "#NoticiasArea .DestkManchete a"
-    title = d(selector).text()
-    more_link = d(selector).attr("href")
-    results = []
-    if title and more_link:
-        ExtractionResult(
-            content=NewsHighlight(
-                **{
-                    "title": title,
-                    "summary": "",
-                }
+NEWS_HIGHLIGHT_PLAN = LayoutPlan(
+    [
+        LayoutSpec(
+            name="2008",
+            example=(
+                "https://arquivo.pt/wayback/20081021163216/"
+                "http://ww1.rtp.pt/homepage/"
             ),
-            accessory_content=NewsHighlightAccessory(
-                **{
-                    "more_link": more_link,
-                }
+            root="#NoticiasArea .DestkManchete a",
+            each=False,
+            fields={
+                "title": FieldSpec(),
+                "more_link": FieldSpec(attr="href"),
+            },
+            required=("title", "more_link"),
+        ),
+        LayoutSpec(
+            name="2011",
+            example=(
+                "https://arquivo.pt/wayback/20110121145922/"
+                "http://ww1.rtp.pt/homepage/"
             ),
-        )
-
-    return results
-
-
-def extract_news_highlight_2011(content) -> [ExtractionResult]:
-    """Extracts_news_highlight from layout in this example
-    https://arquivo.pt/wayback/20110121145922/http://ww1.rtp.pt/homepage/
-    """
-    d = pq(content)
-    selector = "#NewsContent .DestkPrincipal .Elemento .Text"
-    elems = d(selector)
-    results = []
-    for elem in elems:
-        title = d(elem)("h2").text()
-        more_link = d(elem)("a").attr("href")
-        if title and more_link:
-            results.append(
-                ExtractionResult(
-                    content=NewsHighlight(
-                        **{
-                            "title": title,
-                            "summary": "",
-                        }
-                    ),
-                    accessory_content=NewsHighlightAccessory(
-                        **{
-                            "more_link": more_link,
-                        }
-                    ),
-                )
-            )
-
-    return results
-
-
-def extract_news_highlight_2012(content) -> [ExtractionResult]:
-    """Extracts_news_highlight from layout in this example
-    https://arquivo.pt/wayback/20120121192742/http://ww1.rtp.pt/homepage/
-    """
-    d = pq(content)
-    selector = ".DestkAllNews .Elemento.DestkNews.Separador .Text"
-    results = []
-    title = d(selector)("h3 a").text()
-    more_link = d(selector)("h3 a").attr("href")
-    subtitle = d(selector)("p").text()
-    if title and more_link and subtitle:
-        results.append(
-            ExtractionResult(
-                content=NewsHighlight(
-                    **{
-                        "title": title,
-                        "summary": subtitle,
-                    }
-                ),
-                accessory_content=NewsHighlightAccessory(
-                    **{
-                        "more_link": more_link,
-                    }
-                ),
-            )
-        )
-
-    return results
-
-
-def extract_news_highlight_2016(content) -> [ExtractionResult]:
-    """Extracts_news_highlight from layout in this example
-    https://arquivo.pt/wayback/20160301180236/http://www.rtp.pt/homepage/
-    """
-    d = pq(content)
-    selector = ".EmDestk .Area div"
-    elems = d(selector)
-    results = []
-    for elem in elems:
-        title = d(elem)("a").text()
-        more_link = d(elem)("a").attr("href")
-        subtitle = d(elem)("p").text()
-        if title and more_link and subtitle:
-            results.append(
-                ExtractionResult(
-                    content=NewsHighlight(
-                        **{
-                            "title": title,
-                            "summary": subtitle,
-                        }
-                    ),
-                    accessory_content=NewsHighlightAccessory(
-                        **{
-                            "more_link": more_link,
-                        }
-                    ),
-                )
-            )
-
-    return results
-
-
-def extract_news_highlight_2017(content) -> [ExtractionResult]:
-    """Extracts_news_highlight from layout in this example
-    https://arquivo.pt/wayback/20170201180213/http://www.rtp.pt/
-    """
-    d = pq(content)
-    selector = ".page-cover-content"
-    results = []
-    title = d(selector).text()
-    more_link = d(selector).attr("href")
-    subtitle = ""
-    if title and more_link:
-        results.append(
-            ExtractionResult(
-                content=NewsHighlight(
-                    **{
-                        "title": title,
-                        "summary": subtitle,
-                    }
-                ),
-                accessory_content=NewsHighlightAccessory(
-                    **{
-                        "more_link": more_link,
-                    }
-                ),
-            )
-        )
-
-    return results
+            root="#NewsContent .DestkPrincipal .Elemento .Text",
+            fields={
+                "title": FieldSpec("h2"),
+                "more_link": FieldSpec("a", attr="href"),
+            },
+            required=("title", "more_link"),
+        ),
+        LayoutSpec(
+            name="2012",
+            example=(
+                "https://arquivo.pt/wayback/20120121192742/"
+                "http://ww1.rtp.pt/homepage/"
+            ),
+            root=".DestkAllNews .Elemento.DestkNews.Separador .Text",
+            each=False,
+            fields={
+                "title": FieldSpec("h3 a"),
+                "more_link": FieldSpec("h3 a", attr="href"),
+                "summary": FieldSpec("p"),
+            },
+            required=("title", "more_link", "summary"),
+        ),
+        LayoutSpec(
+            name="2016",
+            example=(
+                "https://arquivo.pt/wayback/20160301180236/"
+                "http://www.rtp.pt/homepage/"
+            ),
+            root=".EmDestk .Area div",
+            fields={
+                "title": FieldSpec("a"),
+                "more_link": FieldSpec("a", attr="href"),
+                "summary": FieldSpec("p"),
+            },
+            required=("title", "more_link", "summary"),
+        ),
+        LayoutSpec(
+            name="2017",
+            example="https://arquivo.pt/wayback/20170201180213/http://www.rtp.pt/",
+            root=".page-cover-content",
+            each=False,
+            fields={
+                "title": FieldSpec(),
+                "more_link": FieldSpec(attr="href"),
+            },
+            required=("title", "more_link"),
+        ),
+    ],
+    content=NewsHighlight,
+    accessory=NewsHighlightAccessory,
+)
 
 
 class RTPV1(Extractor):
@@ -183,24 +111,17 @@ class RTPV1(Extractor):
     ]
 
     def extract_news_highlight(
-        self, version_entry: VersionEntry, archived_url: ArchivedURL
+        self,
+        version_entry: VersionEntry,
+        archived_url: ArchivedURL,
+        date_dim: DateDim,
     ) -> Generator[Fact, None, None]:
-        dt = self.repository.fetch_date(
-            version_entry.dt.year, version_entry.dt.month, version_entry.dt.day
-        )
-
         content = archived_url.content
         if not content:
             logger.warning(f"No content for {version_entry.linkToNoFrame}")
 
-        if dt and content:
-            results = itertools.chain(
-                extract_news_highlight_2008(archived_url.content),
-                extract_news_highlight_2011(archived_url.content),
-                extract_news_highlight_2012(archived_url.content),
-                extract_news_highlight_2016(archived_url.content),
-                extract_news_highlight_2017(archived_url.content),
-            )
+        if content:
+            results = NEWS_HIGHLIGHT_PLAN.extract(archived_url.content)
 
             for result in results:
                 yield arquivo_fact_builder(
@@ -209,30 +130,27 @@ class RTPV1(Extractor):
                     SourceID.desarquivo,
                     self.version,
                     result,
-                    dt.id,
+                    date_dim.id,
                     self.extractor_dim.id,
                 )
 
     async def extract(self) -> Generator[Fact, None, None]:
         yearly_tasks = [
-            self.arquivo.fetch_url_versions(url.value, str(year), str(year))
-            for year in range(self.params.start_year, self.params.end_year + 1)
-            for url in self.urls
-            if url.applicable(year)
+            self.arquivo.fetch_url_versions(url, since, until)
+            for url, since, until in self.versions_windows(self.params, self.urls)
         ]
         all_resp = await asyncio.gather(*yearly_tasks)
         all_versions = itertools.chain(*all_resp)
 
         for version in all_versions:
-            if (
-                self.params.day is None or version.dt.day == self.params.day
-            ) and version.dt.month == self.params.month:
-                archived_url = await self.arquivo.fetched_archived_url(version)
-                news_facts = self.extract_news_highlight(version, archived_url)
-                for fact in news_facts:
+            if self.params.wants(version.dt):
+                async for fact in self.replayed_facts(
+                    version, self.extract_news_highlight
+                ):
                     yield fact
 
-    def extractor_specification(self) -> ExtractorDim:
+    @classmethod
+    def extractor_specification(cls) -> ExtractorDim:
         return ExtractorDim(
-            **{"id": f"rtp_noticias_{self.version}", "name": "RTP Notícias"}
+            **{"id": f"rtp_noticias_{cls.version}", "name": "RTP Notícias"}
         )
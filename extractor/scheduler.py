@@ -0,0 +1,155 @@
+import asyncio
+import datetime
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Callable
+
+from arquivo import Arquivo
+from data import InsertStats, Repository
+from extractor.core import ExtractionJob, ExtractionParams
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class JobRun:
+    """One extractor run for a calendar day, as reported by the status"""
+
+    extractor: str
+    month: int
+    day: int
+    started_at: float
+    finished_at: float | None = None
+    stats: InsertStats | None = None
+    error: str | None = None
+
+    def status(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class SchedulerStatus:
+    started_at: float = field(default_factory=time.time)
+    runs: int = 0
+    failures: int = 0
+    totals: InsertStats = field(default_factory=InsertStats)
+    next_run: datetime.datetime | None = None
+    running: list[JobRun] = field(default_factory=list)
+    recent: deque[JobRun] = field(default_factory=lambda: deque(maxlen=50))
+
+
+class Scheduler:
+    """Runs an extraction of the current calendar day every day at the given
+    times, for the past `years`, one job per extractor and at most
+    `max_concurrent` of them at once.
+
+    Each run is delayed by a random jitter of up to `jitter` seconds, so many
+    daemons do not hit arquivo.pt at the same second. The arquivo client,
+    repository and their caches are shared by every run. `refresh` is
+    called before each run, to extend the date dimension to the new day."""
+
+    def __init__(
+        self,
+        arquivo: Arquivo,
+        repository: Repository,
+        extractors: list,
+        times: list[datetime.time],
+        years: int = 20,
+        jitter: float = 300,
+        max_concurrent: int = 2,
+        refresh: Callable[[], None] | None = None,
+    ):
+        self.arquivo = arquivo
+        self.repository = repository
+        self.extractors = extractors
+        self.times = sorted(times)
+        self.years = years
+        self.jitter = jitter
+        self.refresh = refresh
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.stopped = asyncio.Event()
+        self.state = SchedulerStatus()
+
+    def next_run(self, now: datetime.datetime) -> datetime.datetime:
+        for day in (now.date(), now.date() + datetime.timedelta(days=1)):
+            for at in self.times:
+                candidate = datetime.datetime.combine(day, at)
+                if candidate > now:
+                    return candidate
+        raise ValueError("No run times scheduled")
+
+    async def serve(self, run_now: bool = False):
+        """Runs the calendar until `stop` is called"""
+        if run_now:
+            await self.run_day(datetime.date.today())
+
+        while not self.stopped.is_set():
+            now = datetime.datetime.now()
+            self.state.next_run = self.next_run(now)
+            delay = (self.state.next_run - now).total_seconds()
+            delay += random.uniform(0, self.jitter)
+            logger.info(
+                f"Next extraction at {self.state.next_run} (+{delay:.0f}s from now)"
+            )
+            try:
+                await asyncio.wait_for(self.stopped.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                await self.run_day(datetime.date.today())
+
+    def stop(self):
+        self.stopped.set()
+
+    async def run_day(self, today: datetime.date):
+        if self.refresh:
+            self.refresh()
+        await asyncio.gather(
+            *(self.run_job(extractor_cls, today) for extractor_cls in self.extractors)
+        )
+
+    async def run_job(self, extractor_cls, today: datetime.date):
+        params = ExtractionParams(
+            month=today.month,
+            day=today.day,
+            start_year=today.year - self.years,
+            end_year=today.year - 1,
+            extractors=[extractor_cls],
+        )
+        async with self.semaphore:
+            job_run = JobRun(
+                extractor=extractor_cls.__name__,
+                month=today.month,
+                day=today.day,
+                started_at=time.time(),
+            )
+            self.state.running.append(job_run)
+            try:
+                job_run.stats = await ExtractionJob(
+                    self.arquivo, self.repository, params
+                ).run()
+                self.state.totals += job_run.stats
+            except Exception as e:
+                logger.exception(f"Scheduled {job_run.extractor} run failed")
+                job_run.error = repr(e)
+                self.state.failures += 1
+            finally:
+                job_run.finished_at = time.time()
+                self.state.running.remove(job_run)
+                self.state.recent.append(job_run)
+                self.state.runs += 1
+
+    def status(self) -> dict:
+        state = self.state
+        return {
+            "started_at": state.started_at,
+            "uptime": time.time() - state.started_at,
+            "next_run": state.next_run and state.next_run.isoformat(),
+            "extractors": [extractor.__name__ for extractor in self.extractors],
+            "runs": state.runs,
+            "failures": state.failures,
+            "facts": asdict(state.totals),
+            "running": [job_run.status() for job_run in state.running],
+            "recent": [job_run.status() for job_run in reversed(state.recent)],
+        }
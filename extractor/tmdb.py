@@ -1,4 +1,5 @@
 import asyncio
+import datetime
 import itertools
 import logging
 import os
@@ -20,6 +21,7 @@ from data import (
 )
 from extractor.core import (
     Extractor,
+    ExtractionParams,
 )
 
 logger = logging.getLogger(__name__)
@@ -103,7 +105,9 @@ class TMDBClient:
             )
 
 
-def intervals_for(year, month, day=None) -> Generator[tuple[DateTime, DateTime], None, None]:
+def intervals_for(
+    year, month, day=None
+) -> Generator[tuple[DateTime, DateTime], None, None]:
     if day is None:
         dt = pendulum.datetime(year, month, 1)
     else:
@@ -117,14 +121,25 @@ def intervals_for(year, month, day=None) -> Generator[tuple[DateTime, DateTime],
         yield dt, dt.next(pendulum.WEDNESDAY)
 
 
+def interval_containing(day: datetime.date) -> tuple[DateTime, DateTime]:
+    """The Thursday to Wednesday release week of a day"""
+    dt = pendulum.datetime(day.year, day.month, day.day)
+    if dt.day_of_week != pendulum.THURSDAY:
+        dt = dt.previous(pendulum.THURSDAY)
+    return dt, dt.next(pendulum.WEDNESDAY)
+
+
 class TMDBV1(Extractor):
     version = "v1"
+    # Set by long running processes to reuse one client across extractions,
+    # its owner closes it
+    shared_client: TMDBClient | None = None
 
     def __init__(self, *args, **kwargs):
         super(TMDBV1, self).__init__(*args, **kwargs)
 
     async def extract_movie_releases(
-            self, tmdb_client: TMDBClient, start: DateTime, end: DateTime
+        self, tmdb_client: TMDBClient, start: DateTime, end: DateTime
     ) -> Generator[Fact, None, None]:
         params = {
             "sort_by": "popularity.desc",
@@ -133,6 +148,10 @@ class TMDBV1(Extractor):
             "release_date.gte": start,
             "release_date.lte": end,
         }
+        dates = self.repository.fetch_dates(start.date(), end.date())
+        if not dates:
+            return
+
         resp = await tmdb_client.fetch_url("/discover/movie", params=params)
         result_page = TMDBResultPage(**resp.json())
 
@@ -147,23 +166,40 @@ class TMDBV1(Extractor):
             else:
                 accessory_content = None
 
-            for dt in pendulum.period(start, end):
-                dt = self.repository.fetch_date(dt.year, dt.month, dt.day)
-                if dt is not None:
-                    data = {
-                        "content": content.dict(),
-                        "accessory_content": accessory_content,
-                        "source_url": result.link,
-                        "arquivo_url": result.link,
-                        "screenshot_url": None,
-                        "canonical_url": result.link,
-                        "version": self.version,
-                        "date_id": dt.id,
-                        "category_id": CategoryID.cinema_on_theaters,
-                        "source_id": SourceID.tmdb,
-                        "extractor_id": self.extractor_dim.id,
-                    }
-                    yield Fact(**data)
+            yield Fact.build(
+                **{
+                    "content": content.dict(),
+                    "accessory_content": accessory_content,
+                    "source_url": result.link,
+                    "arquivo_url": result.link,
+                    "screenshot_url": None,
+                    "canonical_url": result.link,
+                    "version": self.version,
+                    "date_id": dates[0].id,
+                    "date_to_id": dates[-1].id,
+                    "category_id": CategoryID.cinema_on_theaters,
+                    "source_id": SourceID.tmdb,
+                    "extractor_id": self.extractor_dim.id,
+                }
+            )
+
+    @classmethod
+    def release_intervals(
+        cls, params: ExtractionParams
+    ) -> list[tuple[DateTime, DateTime]]:
+        """The release weeks extracted, those of the month or day of every
+        year, or the weeks containing the gap days"""
+        if params.days is not None:
+            return list(dict.fromkeys(interval_containing(day) for day in params.days))
+        return [
+            interval
+            for year in params.years()
+            for interval in intervals_for(year, params.month, params.day)
+        ]
+
+    @classmethod
+    def api_requests(cls, params: ExtractionParams) -> int:
+        return len(cls.release_intervals(params))
 
     async def extract(self) -> Generator[Fact, None, None]:
         tmdb_key = os.environ.get("TMDB_KEY")
@@ -173,20 +209,27 @@ class TMDBV1(Extractor):
             )
             return
 
-        day = self.params.day
-        month = self.params.month
+        if self.shared_client is not None:
+            async for fact in self.extract_releases(self.shared_client):
+                yield fact
+            return
 
         async with TMDBClient(api_key=tmdb_key) as tmdb_client:
-            for year in range(self.params.start_year, self.params.end_year + 1):
+            async for fact in self.extract_releases(tmdb_client):
+                yield fact
 
-                for start, end in intervals_for(year, month, day):
-                    movie_releases_facts = self.extract_movie_releases(
-                        tmdb_client, start=start, end=end
-                    )
-                    async for fact in movie_releases_facts:
-                        yield fact
+    async def extract_releases(
+        self, tmdb_client: TMDBClient
+    ) -> Generator[Fact, None, None]:
+        for start, end in self.release_intervals(self.params):
+            movie_releases_facts = self.extract_movie_releases(
+                tmdb_client, start=start, end=end
+            )
+            async for fact in movie_releases_facts:
+                yield fact
 
-    def extractor_specification(self) -> ExtractorDim:
+    @classmethod
+    def extractor_specification(cls) -> ExtractorDim:
         return ExtractorDim(
-            **{"id": f"tmdb_{self.version}", "name": "The Movie Database"}
+            **{"id": f"tmdb_{cls.version}", "name": "The Movie Database"}
         )
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from typing import Iterable
+
+from arquivo import Arquivo
+from data import Fact, JobQueue, JobUnit, Repository
+from extractor.core import ExtractionParams, Extractor
+
+logger = logging.getLogger(__name__)
+
+
+def job_units(params: ExtractionParams) -> Iterable[JobUnit]:
+    """Splits an extraction into (extractor, url, year, month) units"""
+    for extractor_cls in params.extractors:
+        urls = getattr(extractor_cls, "urls", None)
+        for year in range(params.start_year, params.end_year + 1):
+            if urls:
+                values = [url.value for url in urls if url.applicable(year)]
+            else:
+                values = [""]
+            for value in values:
+                yield JobUnit(
+                    extractor=extractor_cls.__name__,
+                    url=value,
+                    year=year,
+                    month=params.month,
+                    day=params.day or 0,
+                )
+
+
+class Coordinator:
+    """Queues the units of an extraction and is the single writer of the facts
+    the workers produce, until every unit is done or failed."""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        repository: Repository,
+        params: ExtractionParams,
+        poll_interval: float = 1,
+    ):
+        self.queue = queue
+        self.repository = repository
+        self.params = params
+        self.poll_interval = poll_interval
+
+    def run(self):
+        for extractor_cls in self.params.extractors:
+            # Registers the extractor dimension before workers read it
+            extractor_cls(None, self.repository, self.params)
+
+        queued = self.queue.enqueue(job_units(self.params))
+        logger.info(f"Queued units for {self.params}: {queued}")
+        if queued.skipped:
+            logger.warning(
+                f"{queued.skipped} units were already pending or leased, "
+                "left to the run that queued them"
+            )
+
+        started = time.monotonic()
+        inserted = 0
+        while True:
+            open_jobs = self.queue.has_open_jobs()
+            inserted += self.drain()
+            self.queue.expire_exhausted()
+            if not open_jobs:
+                break
+            elapsed = time.monotonic() - started
+            logger.info(
+                f"Jobs {self.queue.counts()}, {inserted} new facts "
+                f"({inserted / max(elapsed, 1e-6):.1f} facts/s)"
+            )
+            time.sleep(self.poll_interval)
+
+        return self.queue.counts()
+
+    def drain(self) -> int:
+        inserted = 0
+        while True:
+            last_id, facts = self.queue.take_facts()
+            if last_id is None:
+                return inserted
+            inserted += self.repository.insert_facts(
+                Fact.parse_obj(fact) for fact in facts
+            ).new
+            self.queue.ack_facts(last_id)
+
+
+class Worker:
+    """Leases units from the queue and runs the unchanged extractor classes on
+    them, handing the facts back to the queue for the coordinator."""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        arquivo: Arquivo,
+        repository: Repository,
+        extractors: list,
+        worker_id: str | None = None,
+        idle_wait: float = 5,
+    ):
+        self.queue = queue
+        self.arquivo = arquivo
+        self.repository = repository
+        self.extractors = {cls.__name__: cls for cls in extractors}
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.idle_wait = idle_wait
+
+    async def run(self):
+        processed = 0
+        while True:
+            unit = self.queue.lease(self.worker_id)
+            if unit is None:
+                if not self.queue.has_open_jobs():
+                    break
+                await asyncio.sleep(self.idle_wait)
+                continue
+
+            heartbeat = asyncio.create_task(self.heartbeat(unit))
+            try:
+                facts = await self.extract(unit)
+                if self.queue.complete(unit, self.worker_id, facts):
+                    processed += 1
+                else:
+                    logger.warning(f"Lost lease of {unit}, discarding its facts")
+            except Exception as e:
+                logger.exception(f"Failed {unit}")
+                self.queue.fail(unit, self.worker_id, repr(e))
+            finally:
+                heartbeat.cancel()
+
+        logger.info(f"Worker {self.worker_id} processed {processed} units")
+
+    async def extract(self, unit: JobUnit) -> list[str]:
+        extractor_cls = self.extractors[unit.extractor]
+        params = ExtractionParams(
+            unit.month, unit.day or None, unit.year, unit.year, [extractor_cls]
+        )
+        extractor: Extractor = extractor_cls(self.arquivo, self.repository, params)
+        if unit.url:
+            extractor.urls = [url for url in extractor.urls if url.value == unit.url]
+
+        return [fact.json() async for fact in extractor.extract()]
+
+    async def heartbeat(self, unit: JobUnit):
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            if not self.queue.heartbeat(unit, self.worker_id):
+                logger.warning(f"Heartbeat for {unit} rejected")
+                return
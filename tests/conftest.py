@@ -0,0 +1,54 @@
+from pathlib import Path
+
+import pytest
+
+from data import CategoryID, DesarquivoDb, Fact, Repository, SourceID
+
+
+@pytest.fixture
+def facts_db(tmp_path, monkeypatch):
+    """A new facts database, the schema scripts are read from the repository
+    root"""
+    monkeypatch.chdir(Path(__file__).parent.parent)
+    with DesarquivoDb(True, path=str(tmp_path / "facts.db")) as db:
+        yield db
+
+
+@pytest.fixture
+def repository(facts_db) -> Repository:
+    return Repository(facts_db)
+
+
+@pytest.fixture
+def insert_news():
+    """Inserts a news highlight valid for `days` days into a repository"""
+
+    def insert(
+        repository: Repository,
+        year: int,
+        month: int,
+        day: int,
+        title: str,
+        days: int = 1,
+    ):
+        extractor = repository.fetch_extractor(_id="jornal_publico_v1", name="Público")
+        date_id = repository.fetch_date(year, month, day).id
+        tstamp = f"{year}{month:02d}{day:02d}"
+        fact = Fact(
+            content={"title": title, "summary": ""},
+            accessory_content={"more_link": f"https://www.publico.pt/{title}"},
+            source_url=f"https://arquivo.pt/wayback/{tstamp}/",
+            arquivo_url=f"https://arquivo.pt/noFrame/replay/{tstamp}/",
+            canonical_url="https://www.publico.pt/",
+            screenshot_url=None,
+            version="v1",
+            date_id=date_id,
+            date_to_id=date_id + days - 1,
+            category_id=CategoryID.news_highlight,
+            source_id=SourceID.desarquivo,
+            extractor_id=extractor.id,
+        )
+        repository.insert_facts([fact])
+        return fact
+
+    return insert
@@ -0,0 +1,29 @@
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+from data.export import ParquetExporter  # noqa: E402
+
+
+def test_export_replaces_partitions_of_earlier_exports(
+    facts_db, repository, insert_news, tmp_path
+):
+    output = tmp_path / "facts_parquet"
+    output.mkdir()
+    (output / "README").write_text("kept")
+    insert_news(repository, 2009, 5, 20, "Removida")
+    insert_news(repository, 2010, 5, 20, "Mantida")
+    ParquetExporter(facts_db, output).export()
+    assert (output / "year=2009").is_dir()
+
+    facts_db["fact"].delete_where(
+        "date_id = ?", [repository.fetch_date(2009, 5, 20).id]
+    )
+    result = ParquetExporter(facts_db, output).export()
+
+    assert (result.rows, result.files) == (1, 1)
+    assert sorted(p.name for p in output.iterdir()) == ["README", "year=2010"]
+    assert pq.read_table(output / "year=2010").column("title").to_pylist() == [
+        "Mantida"
+    ]
+    assert [p.name for p in tmp_path.iterdir() if p.name.startswith(".")] == []
@@ -0,0 +1,54 @@
+import asyncio
+from pathlib import Path
+
+from arquivo import ArchivedURL, VersionEntry
+from extractor.core import ExtractionParams
+from extractor.publico import PublicoV1
+
+PAGE = Path(__file__).parent / "fixtures" / "pages" / "publico_2010.html"
+
+
+class ReplayingArquivo:
+    """Lists one capture of a day and replays it as a fixture page"""
+
+    negative_cache = None
+
+    def __init__(self, tstamp: str, content: str):
+        self.tstamp = tstamp
+        self.content = content
+
+    async def fetch_url_versions(self, url: str, since: str, until: str):
+        if not since <= self.tstamp[:4] <= until:
+            return []
+        return [
+            VersionEntry.from_capture(
+                url=url,
+                tstamp=self.tstamp,
+                status_code=200,
+                digest="A1",
+                mime_type="text/html",
+                length=len(self.content),
+                offset=0,
+                file_name="AWP-20100502.warc.gz",
+            )
+        ]
+
+    async def fetch_replay(self, version: VersionEntry) -> ArchivedURL:
+        return ArchivedURL(headers=[], content=self.content)
+
+
+async def extract(extractor: PublicoV1) -> list:
+    return [fact async for fact in extractor.extract()]
+
+
+def test_facts_are_dated_by_their_capture(repository):
+    params = ExtractionParams(5, 2, 2010, 2010, [PublicoV1])
+    arquivo = ReplayingArquivo("20100502143105", PAGE.read_text())
+
+    facts = asyncio.run(extract(PublicoV1(arquivo, repository, params)))
+
+    assert [fact.content["title"] for fact in facts] == [
+        "Cinzas do vulcão islandês voltam a fechar aeroportos",
+        "Zona euro aprova ajuda de 110 mil milhões à Grécia",
+    ]
+    assert {fact.date_id for fact in facts} == {repository.fetch_date(2010, 5, 2).id}
@@ -0,0 +1,41 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from extractor import layout_plans
+from extractor.html import PARSERS, use_parser
+
+# One page per source and layout generation, trimmed to the markup the
+# layouts read, the 2005 Público and 2016 Rádio Comercial pages hold several.
+# The results expected from each page are in the JSON file of the same name
+PAGES = sorted((Path(__file__).parent / "fixtures" / "pages").glob("*.html"))
+
+
+def extract(content: str) -> list[dict]:
+    return [
+        {
+            "content": result.content.dict(),
+            "accessory_content": result.accessory_content
+            and result.accessory_content.dict(),
+        }
+        for plan in layout_plans()
+        for result in plan.extract(content)
+    ]
+
+
+@pytest.fixture(params=list(PARSERS))
+def parser(request):
+    if request.param == "selectolax":
+        pytest.importorskip("selectolax")
+    use_parser(request.param)
+    yield request.param
+    use_parser("pyquery")
+
+
+@pytest.mark.parametrize("page", PAGES, ids=[page.stem for page in PAGES])
+def test_parser_extracts_the_expected_results(page, parser):
+    expected = json.loads(page.with_suffix(".json").read_text())
+
+    assert expected
+    assert extract(page.read_text()) == expected
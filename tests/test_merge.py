@@ -0,0 +1,30 @@
+import json
+
+from data import DesarquivoDb, Repository
+from data.merge import FactsMerger
+from data.shards import DayShardBuilder
+
+
+def test_incremental_shards_include_merged_facts(
+    tmp_path, facts_db, repository, insert_news
+):
+    insert_news(repository, 2010, 3, 1, "Local")
+    facts_db.execute("UPDATE fact SET inserted_at = '2021-06-01 00:00:00'")
+    facts_db.conn.commit()
+    source = tmp_path / "source.db"
+    with DesarquivoDb(True, path=str(source)) as source_db:
+        insert_news(Repository(source_db), 2010, 5, 20, "Merged")
+        # Extracted long before this database was last built
+        source_db.execute("UPDATE fact SET inserted_at = '2020-01-01 00:00:00'")
+        source_db.conn.commit()
+    shards = DayShardBuilder(facts_db, tmp_path / "shards")
+    shards.build()
+
+    FactsMerger(facts_db).merge(source)
+    result = shards.build()
+
+    # 05-20 and 03-01, whose fact is from the second of the watermark
+    assert result.days == 2
+    shard = json.loads((tmp_path / "shards" / "05-20.json").read_text())
+    [fact] = shard["years"]["2010"]["news_highlight"]
+    assert fact["title"] == "Merged"
@@ -0,0 +1,51 @@
+import datetime
+
+from sqlite_utils import Database
+
+from extractor.core import ExtractionParams
+from extractor.gaps import gap_extractions
+from extractor.plan import ExtractionPlanner
+from extractor.publico import PublicoV1
+
+
+def test_days_of_a_fact_interval_have_facts(repository, insert_news):
+    insert_news(repository, 2010, 5, 20, "Uma semana", days=7)
+    params = ExtractionParams(5, None, 2010, 2010, [PublicoV1])
+    extractor_id = PublicoV1.extractor_specification().id
+
+    covered = repository.fetch_covered_days(extractor_id, 5, None, 2010, 2010)
+    missing = repository.fetch_missing_days(extractor_id, 5, None, 2010, 2010)
+    plan = ExtractionPlanner(repository, Database(memory=True)).plan(params)
+
+    assert [d.day for d in covered] == list(range(20, 27))
+    assert len(missing) == 31 - 7
+    assert plan.extractors[0].days_with_facts == 7
+
+
+def test_gap_plan_counts_days_with_facts_among_its_days(repository, insert_news):
+    insert_news(repository, 2010, 5, 20, "Uma semana", days=7)
+    params = ExtractionParams(
+        5,
+        None,
+        2010,
+        2010,
+        [PublicoV1],
+        [datetime.date(2010, 5, 1), datetime.date(2010, 5, 21)],
+    )
+
+    [plan] = (
+        ExtractionPlanner(repository, Database(memory=True)).plan(params).extractors
+    )
+
+    assert (plan.days_with_facts, plan.days) == (1, 2)
+
+
+def test_gap_plan_registers_no_extractor(facts_db, repository):
+    params = ExtractionParams(5, None, 2010, 2010, [PublicoV1])
+    planner = ExtractionPlanner(repository, Database(memory=True))
+
+    [gaps] = gap_extractions(repository, params)
+    [plan] = planner.plan(gaps).extractors
+
+    assert (plan.days_with_facts, plan.days) == (0, 31)
+    assert facts_db["extractor_dim"].count == 0
@@ -0,0 +1,29 @@
+import pytest
+
+from data.query import FactQueries, fts_query
+
+
+def test_fts_query_matches_every_word():
+    assert fts_query('Benfica vence* "Braga"') == '"Benfica" "vence"* """Braga"""'
+
+
+@pytest.mark.parametrize("text", ["*", '"', '" *', "- !!"])
+def test_search_without_words_filters_nothing(text, facts_db, repository, insert_news):
+    insert_news(repository, 2010, 5, 20, "Benfica vence em Braga")
+    insert_news(repository, 2011, 5, 20, "Porto empata")
+
+    facts = FactQueries(facts_db).search(text)
+
+    assert [fact["content"]["title"] for fact in facts] == [
+        "Benfica vence em Braga",
+        "Porto empata",
+    ]
+
+
+def test_search_matches_words_and_prefixes(facts_db, repository, insert_news):
+    insert_news(repository, 2010, 5, 20, "Benfica vence em Braga")
+    insert_news(repository, 2011, 5, 20, "Porto empata")
+
+    facts = FactQueries(facts_db).search("benf* braga")
+
+    assert [fact["content"]["title"] for fact in facts] == ["Benfica vence em Braga"]
@@ -0,0 +1,165 @@
+import asyncio
+import datetime
+import json
+
+import httpx
+import pytest
+
+from arquivo import (
+    HOURLY,
+    Arquivo,
+    ArquivoApiPath,
+    ArquivoClient,
+    ClosestTo,
+    DistinctDigests,
+    PerDay,
+    SamplingPolicy,
+    VersionEntry,
+    VersionsBackend,
+)
+
+URL = "https://www.publico.pt/"
+
+# (timestamp, status, digest) of the captures arquivo.pt holds for URL
+CAPTURES = [
+    ("20100301080512", 200, "A1"),
+    ("20100301081533", 200, "A2"),
+    ("20100301093000", 302, "R1"),
+    ("20100301094500", 200, "A3"),
+    ("20100301120000", 404, "E1"),
+    ("20100302000001", 200, "B1"),
+    ("20100302235959", 200, "B2"),
+    ("20100303101010", 500, "E2"),
+]
+
+PAGE_SIZE = 3
+
+
+def capture(tstamp: str, status: int, digest: str) -> VersionEntry:
+    return VersionEntry.from_capture(
+        url=URL,
+        tstamp=tstamp,
+        status_code=status,
+        digest=digest,
+        mime_type="text/html",
+        length=1000 + status,
+        offset=int(tstamp[-6:]),
+        file_name=f"AWP-{tstamp[:8]}.warc.gz",
+    )
+
+
+def text_search(request: httpx.Request) -> httpx.Response:
+    """/textsearch lists every capture, paged, with the title and collection
+    the CDX server does not have"""
+    assert request.url.params["versionHistory"] == URL
+    page = int(request.url.params.get("page", 0))
+    items = [
+        capture(*c).copy(update={"title": "PÚBLICO", "collection": "AWP"}).dict()
+        for c in CAPTURES[page * PAGE_SIZE : (page + 1) * PAGE_SIZE]
+    ]
+    return httpx.Response(
+        200,
+        json={
+            "serviceName": "Arquivo.pt - versionHistory",
+            "linkToService": "https://arquivo.pt/textsearch",
+            "next_page": f"/textsearch?versionHistory={URL}&page={page + 1}",
+            "estimated_nr_results": len(CAPTURES),
+            "response_items": items,
+        },
+    )
+
+
+def cdx(request: httpx.Request) -> httpx.Response:
+    """/wayback/cdx applies the status filter and the hourly collapse, when
+    asked for, on the server side, one JSON object per line"""
+    params = request.url.params
+    assert params["url"] == URL
+    assert params.get_list("filter") == ["status:2.."]
+    collapse = params.get("collapse")
+    assert collapse in (None, "timestamp:10")
+    fields = params["fl"].split(",")
+    lines = []
+    hours = set()
+    for tstamp, status, digest in CAPTURES:
+        if not 200 <= status < 300 or (collapse and tstamp[:10] in hours):
+            continue
+        hours.add(tstamp[:10])
+        entry = capture(tstamp, status, digest)
+        record = {
+            "url": URL,
+            "timestamp": tstamp,
+            "status": str(status),
+            "digest": digest,
+            "mime": entry.mimeType,
+            "length": str(entry.contentLength),
+            "offset": str(entry.offset),
+            "filename": entry.fileName,
+        }
+        lines.append(json.dumps({field: record[field] for field in fields}))
+    return httpx.Response(200, text="\n".join(lines) + "\n")
+
+
+def arquivo_stand_in(request: httpx.Request) -> httpx.Response:
+    if request.url.path == ArquivoApiPath.TEXT_SEARCH:
+        return text_search(request)
+    if request.url.path == ArquivoApiPath.CDX:
+        return cdx(request)
+    return httpx.Response(404)
+
+
+async def fetch_versions(
+    backend: VersionsBackend, sampling: SamplingPolicy = HOURLY
+) -> list[VersionEntry]:
+    arquivo_client = ArquivoClient()
+    await arquivo_client.client.aclose()
+    arquivo_client.client = httpx.AsyncClient(
+        transport=httpx.MockTransport(arquivo_stand_in),
+        base_url=ArquivoApiPath.BASE_URL,
+    )
+    async with arquivo_client:
+        arquivo = Arquivo(arquivo_client, versions_backend=backend, sampling=sampling)
+        return list(
+            await arquivo.fetch_url_versions(URL, "20100301000000", "20100331235959")
+        )
+
+
+def comparable(entry: VersionEntry) -> dict:
+    """The fields both listings have, the CDX server has no titles"""
+    return entry.dict(exclude={"title", "collection"})
+
+
+@pytest.mark.parametrize("backend", list(VersionsBackend))
+def test_backend_keeps_one_successful_capture_per_hour(backend):
+    versions = asyncio.run(fetch_versions(backend))
+
+    assert [(v.tstamp, v.digest) for v in versions] == [
+        ("20100301080512", "A1"),
+        ("20100301094500", "A3"),
+        ("20100302000001", "B1"),
+        ("20100302235959", "B2"),
+    ]
+
+
+def test_backends_list_the_same_versions():
+    text_search_versions = asyncio.run(fetch_versions(VersionsBackend.TEXT_SEARCH))
+    cdx_versions = asyncio.run(fetch_versions(VersionsBackend.CDX))
+
+    assert [comparable(v) for v in cdx_versions] == [
+        comparable(v) for v in text_search_versions
+    ]
+
+
+@pytest.mark.parametrize(
+    "sampling, expected",
+    [
+        (PerDay(2), ["A1", "A3", "B1", "B2"]),
+        (ClosestTo(datetime.time(8, 15)), ["A2", "B1"]),
+        (DistinctDigests(), ["A1", "A2", "A3", "B1", "B2"]),
+    ],
+    ids=["per-day", "closest", "distinct-digest"],
+)
+@pytest.mark.parametrize("backend", list(VersionsBackend))
+def test_backend_samples_every_successful_capture(backend, sampling, expected):
+    versions = asyncio.run(fetch_versions(backend, sampling))
+
+    assert [v.digest for v in versions] == expected
@@ -0,0 +1,31 @@
+import asyncio
+
+from extractor.core import ExtractionParams
+from extractor.radio_comercial import RadioComercialV1
+from extractor.worker import Worker, job_units
+
+
+class ListingArquivo:
+    """Lists no versions and records the version histories asked for"""
+
+    negative_cache = None
+
+    def __init__(self):
+        self.listed = []
+
+    async def fetch_url_versions(self, url: str, since: str, until: str):
+        self.listed.append(url)
+        return []
+
+
+def test_unit_lists_only_its_url(repository):
+    params = ExtractionParams(1, None, 2017, 2017, [RadioComercialV1])
+    units = list(job_units(params))
+    arquivo = ListingArquivo()
+    worker = Worker(None, arquivo, repository, [RadioComercialV1])
+
+    for unit in units:
+        asyncio.run(worker.extract(unit))
+
+    assert len(units) == 3
+    assert arquivo.listed == [unit.url for unit in units]